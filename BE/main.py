@@ -1,8 +1,14 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from BE.settings import UPLOAD_DIR
 from BE.routers import project, inference
+from BE.services.ml_service import get_ml_service, ml_service
+from BE.services.queue_index import review_queue_index
+from BE.services.review_prefetcher import review_prefetcher
+from ML.utils.image_dims import dimension_cache
 # retaining old routers for reference or backward compat if needed
 from BE.routers.pipeline import router as pipeline_router
 from BE.routers.uploads import router as uploads_router
@@ -13,7 +19,21 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build the service, then load + warm up the model in the background so uvicorn
+    # accepts requests immediately
+    get_ml_service().start_warmup()
+    # keep the review queue index in sync with the folder and persisted (independent of prefetching)
+    review_queue_index.start()
+    # score the review queue ahead of the reviewer while the server is idle
+    review_prefetcher.start()
+    yield
+    review_queue_index.save()
+    dimension_cache.save()  # sizes probed since the last timed save
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,3 +60,16 @@ app.include_router(pipeline_router, prefix="/pipeline", tags=["pipeline_legacy"]
 @app.get("/")
 def root():
     return {"msg": "PlantPilotAI Backend Running"}
+
+@app.get("/healthz")
+def healthz():
+    """Process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Model is loaded and warmed up; 503 until then."""
+    status = ml_service.readiness()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
@@ -1,37 +1,178 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-import shutil
+from typing import List, Optional
+import json
 import uuid
-from BE.settings import UPLOAD_DIR
+from BE.settings import UPLOAD_DIR, UPLOAD_MAX_MB
 from BE.services.ml_service import ml_service
+from BE.services.queue_index import review_queue_index
+from BE.services.upload_store import UploadTooLarge, copy_upload
+from ML.config_loader import TEMP_DIR
+from ML.utils.blob_store import blob_store
+from ML.utils.dataset_catalog import catalog
 
 router = APIRouter()
 
+
+def _persist_upload(file_path: Path, data: bytes):
+    """
+    Write the uploaded bytes into the review queue after the response is sent.
+    The bytes are stored once in the blob store and linked into the queue.
+    """
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    sha256 = blob_store.write_bytes(file_path, data)
+    _register_upload(file_path, sha256)
+
+
+def _register_upload(file_path: Path, sha256: str):
+    review_queue_index.add(file_path.name, sha256=sha256)
+    catalog.upsert(file_path.name, status="queued", sha256=sha256, path=file_path)
+
+
 @router.post("/predict")
-def predict_image(file: UploadFile = File(...), conf: float = Form(0.25)):
+def predict_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    conf: float = Form(0.25),
+    persist: bool = Form(True),
+    shape: str = Form("rows"),
+    tiled: bool = Form(False),
+    tile_overlap: float = Form(0.2),
+    imgsz: Optional[int] = Form(None),
+):
     """
     Upload an image and get predictions.
+
+    The image is decoded straight from the request buffer (or answered from the
+    prediction cache when the same bytes were seen before); it is only written to
+    the review queue (in the background, after the response) when persist is true.
+    shape="columnar" returns detections as parallel arrays instead of one object per box.
+    tiled=true slices large images into overlapping model-sized tiles instead of downscaling.
+    imgsz overrides the model's calibrated inference resolution.
     """
     # Validate image
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
 
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    # read at most one byte past the limit instead of buffering an oversized upload
+    max_bytes = UPLOAD_MAX_MB * 1024 * 1024
+    data = file.file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"{file.filename} exceeds {UPLOAD_MAX_MB} MB limit")
+
     # Use UUID to avoid collisions
     filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = UPLOAD_DIR / filename
-    
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
 
     try:
-        detections = ml_service.predict(file_path, conf=conf)
-        return {
-            "filename": filename,
-            "url": f"/uploads/{filename}", 
-            "detections": detections
-        }
+        detections, model_version = ml_service.predict_bytes_versioned(
+            data, conf=conf, tiled=tiled, tile_overlap=tile_overlap, imgsz=imgsz
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         error_detail = f"{str(e)}\n{traceback.format_exc()}"
         raise HTTPException(status_code=500, detail=error_detail)
+
+    if persist:
+        background_tasks.add_task(_persist_upload, UPLOAD_DIR / filename, data)
+
+    return {
+        "filename": filename if persist else None,
+        "url": f"/uploads/{filename}" if persist else None,
+        "detections": ml_service.to_columnar(detections) if shape == "columnar" else detections,
+        "model_version": model_version,
+    }
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters and size of the prediction cache."""
+    stats = ml_service.cache.stats()
+    stats["modelVersion"] = ml_service.model_version
+    return stats
+
+
+@router.post("/predict/batch")
+def predict_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    filenames: Optional[List[str]] = Form(None),
+    conf: float = Form(0.25),
+    persist: bool = Form(True),
+    tiled: bool = Form(False),
+    imgsz: Optional[int] = Form(None),
+):
+    """
+    Predict many images in one request and stream one NDJSON line per image.
+
+    Accepts uploaded files and/or names of images already in the review queue.
+    Images run through the micro-batched inference path and each line is sent
+    as soon as that image is done, so the first result renders immediately.
+
+    Uploads are streamed to disk before streaming starts (into the review queue
+    when persist is true, else to temp files) and read back one at a time, so only
+    the in-flight window of images is held in memory. A reported filename always
+    refers to an image that is already in the review queue.
+    """
+    items = []
+    urls = {}
+    spooled = []  # temp copies of non-persisted uploads, removed once read (or when the stream ends)
+
+    def cleanup():
+        for path in spooled:
+            path.unlink(missing_ok=True)
+
+    def read_once(path: Path):
+        try:
+            return path.read_bytes()
+        finally:
+            path.unlink(missing_ok=True)
+
+    for f in files or []:
+        if not (f.content_type or "").startswith("image/"):
+            cleanup()
+            raise HTTPException(status_code=400, detail=f"{f.filename} is not an image")
+        filename = f"{uuid.uuid4()}_{Path(f.filename or 'image').name}"
+        # copy now, in chunks: upload buffers are closed once the handler returns
+        path = UPLOAD_DIR / filename if persist else TEMP_DIR / f".batch-{filename}"
+        try:
+            _, sha256 = copy_upload(f, path, dedupe=persist)
+        except UploadTooLarge as e:
+            cleanup()
+            raise HTTPException(status_code=413, detail=f"{f.filename} {e}")
+        if persist:
+            _register_upload(path, sha256)
+            urls[filename] = f"/uploads/{filename}"
+            items.append((filename, path.read_bytes))
+        else:
+            spooled.append(path)
+            urls[f.filename] = None
+            items.append((f.filename, lambda path=path: read_once(path)))
+
+    for name in filenames or []:
+        path = UPLOAD_DIR / Path(name).name
+        if not path.exists():
+            cleanup()
+            raise HTTPException(status_code=404, detail=f"{name} not found in review queue")
+        urls[path.name] = f"/uploads/{path.name}"
+        items.append((path.name, path.read_bytes))
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No files or filenames given")
+
+    def stream():
+        try:
+            for name, detections, version, error in ml_service.predict_stream(items, conf=conf, tiled=tiled, imgsz=imgsz):
+                line = {"filename": name}
+                if error is not None:
+                    line["error"] = error
+                else:
+                    line["url"] = urls.get(name)
+                    line["detections"] = detections
+                    line["model_version"] = version
+                yield json.dumps(line) + "\n"
+        finally:
+            cleanup()  # client went away mid-stream: drop the temp copies not read yet
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -5,6 +5,7 @@ from datetime import datetime
 import subprocess, sys
 from pathlib import Path
 from BE.services.runs_catalog import list_runs, rollback_to, read_manifest
+from ML.utils.model_registry import load_registry
 
 router = APIRouter()
 
@@ -12,15 +13,18 @@ router = APIRouter()
 ML_DIR = Path(__file__).resolve().parents[2] / "ML"
 
 
-import torch
-
 @router.get("/system/info")
 def get_system_info():
     """Return system capabilities (CUDA, etc.) natively from the unified checker"""
     from BE.services.ml_service import ml_service
     info = ml_service.check_hardware_acceleration(alert_terminal=False)
     info["status"] = "online"
+    info["modelPool"] = ml_service.pool_info()
+    info["modelVersion"] = ml_service.model_version
+    info["inferenceBackend"] = ml_service.serving_backend  # what is loaded, not what was asked for
+    info["configuredBackend"] = ml_service.backend
     # Attach torch version just in case FE wants it later
+    import torch  # deferred so importing the router does not load torch
     info["torch_version"] = torch.__version__
     return info
 
@@ -86,9 +90,24 @@ def get_runs():
         "count": len(runs),
         "runs": runs,
         "manifest": read_manifest(),
+        "registry": load_registry(),
     }
 
 
+@router.post("/model/reload")
+def reload_model(backend: str | None = Query(None, description="torch | onnx | onnx-int8 | torchscript")):
+    """reload the active model, optionally switching the serving backend (e.g. to INT8)"""
+    from BE.services.ml_service import BackendUnavailable, ml_service
+    try:
+        ml_service.load_model(backend=backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BackendUnavailable as e:
+        # requested backend has no exported artifact for the active model; nothing was swapped
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "success", "backend": ml_service.serving_backend, "modelVersion": ml_service.model_version}
+
+
 @router.post("/rollback")
 def rollback(run: str = Query(..., description="archive run name like train_YYYYmmdd_HHMMSS")):
     """rollback current train to a selected archived version"""
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, HTTPException
 from fastapi.responses import JSONResponse  # return proper http status codes
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
-import shutil
 import subprocess, sys
 
-from BE.settings import UPLOAD_DIR, LABEL_STUDIO_DIR
+from BE.settings import UPLOAD_DIR, LABEL_STUDIO_DIR, UPLOAD_MAX_MB, UPLOAD_ZIP_MAX_MB
+from BE.services.upload_store import register_queued, save_upload
 from BE.services.active_learning_runner import (
     import_labelstudio_export,
     run_active_learning_pipeline,
@@ -35,15 +36,19 @@ async def upload_files(background_tasks: BackgroundTasks, file: UploadFile = Fil
     dst = (LABEL_STUDIO_DIR / filename) if ext == "zip" else (UPLOAD_DIR / filename)
     dst.parent.mkdir(parents=True, exist_ok=True)
 
-    with dst.open("wb") as buf:
-        shutil.copyfileobj(file.file, buf)
+    saved = await save_upload(
+        file, dst, max_mb=UPLOAD_ZIP_MAX_MB if ext == "zip" else UPLOAD_MAX_MB, dedupe=ext != "zip"
+    )
+    if saved["status"] != "ok":
+        raise HTTPException(status_code=413 if saved["status"] == "too_large" else 400, detail=saved["error"])
 
     if ext == "zip":
         # import runs in background so the api stays responsive
         background_tasks.add_task(import_labelstudio_export, dst)
-        return {"status": "uploaded", "type": "labelstudio_zip", "import": "queued"}
+        return {"status": "uploaded", "type": "labelstudio_zip", "import": "queued", "sha256": saved["sha256"]}
 
-    return {"status": "uploaded", "type": "image"}
+    await run_in_threadpool(register_queued, [saved], UPLOAD_DIR)
+    return {"status": "uploaded", "type": "image", "bytes": saved["bytes"], "sha256": saved["sha256"]}
 
 
 @router.post("/run-pipeline")
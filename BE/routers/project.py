@@ -1,12 +1,16 @@
 import os
-import shutil
-from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, File, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 from BE.services.ml_service import ml_service
-from ML.config_loader import REVIEW_QUEUE_DIR, TEMP_DIR
+from BE.services.queue_index import review_queue_index
+from BE.services.review_prefetcher import review_prefetcher
+from BE.services.upload_store import register_queued, save_uploads
+from BE.settings import UPLOAD_ZIP_MAX_MB
+from ML.config_loader import REVIEW_QUEUE_DIR
+from ML.utils.dataset_catalog import catalog
 
 router = APIRouter()
 
@@ -18,20 +22,19 @@ async def upload_images(files: List[UploadFile] = File(...)):
     Accepts raw images from the User Interface, bypasses immediate YOLO parsing
     to dump securely into the staging directory for the queue system.
 
+    Files are written concurrently off the event loop (hashed while streaming,
+    size limited) and registered in the queue index and catalog from a worker
+    thread, so large drag-and-drop batches do not stall inference traffic.
+
     Writes to:
     - ML/data/test_images/ (Managed by REVIEW_QUEUE_DIR configuration)
     """
-    uploaded_paths = []
-    temp_dir = REVIEW_QUEUE_DIR
-    temp_dir.mkdir(parents=True, exist_ok=True)
-    
-    for file in files:
-        file_path = temp_dir / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        uploaded_paths.append(file.filename)
-    
-    return {"status": "success", "files": uploaded_paths}
+    results = await save_uploads(files, REVIEW_QUEUE_DIR)
+    uploaded_paths = await run_in_threadpool(register_queued, results, REVIEW_QUEUE_DIR)
+    if uploaded_paths:
+        review_prefetcher.notify()
+    status = "success" if len(uploaded_paths) == len(results) else ("partial" if uploaded_paths else "error")
+    return {"status": status, "files": uploaded_paths, "results": results}
 
 @router.post("/init")
 async def init_project(
@@ -48,15 +51,16 @@ async def init_project(
     components securely, normalizes all annotations into internal schema, and
     triggers the primary foundational model training loop in the background.
     """
-    # Save zip
-    temp_zip = TEMP_DIR / file.filename
-    temp_zip.parent.mkdir(parents=True, exist_ok=True)
-    with temp_zip.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+    # Import straight from the spooled upload: no copy in TEMP_DIR, no extract folder
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    if size > UPLOAD_ZIP_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"ZIP exceeds {UPLOAD_ZIP_MAX_MB} MB")
+
     # Run sync import then background training
     try:
-        ml_service.run_import_zip(temp_zip)
+        await run_in_threadpool(ml_service.import_zip_upload, file.file, file.filename or "dataset.zip")
         background_tasks.add_task(ml_service.run_training, epochs=epochs, imgsz=imgsz, model=model)
         return {"status": "success", "message": "Import successful. Training started in background."}
     except Exception as e:
@@ -96,8 +100,8 @@ async def save_annotation(data: dict):
         ml_service.save_annotation(
             filename=data['filename'],
             detections=data['detections'],
-            width=data['width'],
-            height=data['height']
+            width=data.get('width'),
+            height=data.get('height')
         )
         return {"status": "success"}
     except Exception as e:
@@ -127,17 +131,81 @@ def get_staged_stats():
     return ml_service.get_staged_stats()
 
 @router.get("/pending-images")
-def get_pending_images():
+def get_pending_images(
+    order: str = Query("name", description="name | uncertainty"),
+    k: int = Query(50, ge=1, le=1000, description="top-K size for order=uncertainty"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="page size (all when omitted)"),
+    q: Optional[str] = Query(None, description="filename substring filter"),
+    ext: Optional[str] = Query(None, description="extension filter, e.g. jpg"),
+):
     """
     List filenames currently in the test queue awaiting manual review.
-    
-    Scans the UPLOADS/REVIEW target folders for pending structural files 
-    that safely identify as renderable images.
+
+    Served from the review queue index (kept up to date by the upload, skip and
+    reject paths and a periodic os.scandir reconciliation) instead of globbing
+    the folder per request. Pages are in name order; pass next_cursor back as
+    cursor to continue.
+
+    order=uncertainty returns the K most informative images (by the uncertainty of
+    their prefetched predictions) from the ranking index, most uncertain first.
+    Without a ranking (prefetching disabled or nothing scored yet) the first K images
+    in name order are returned with "ranked": 0.
+    """
+    if order == "uncertainty":
+        ranking = review_prefetcher.ranking
+        if not (review_prefetcher.running and len(ranking)):
+            return {
+                "files": review_queue_index.names_after(None, k),
+                "scores": [],
+                "method": "name",
+                "ranked": 0,
+            }
+        ranked = ranking.top(k)
+        return {
+            "files": [r["filename"] for r in ranked],
+            "scores": ranked,
+            "method": ranking.method,
+            "ranked": len(ranking),
+        }
+
+    page = review_queue_index.page(cursor=cursor, limit=limit, q=q, ext=ext)
+    page["files"] = [item["filename"] for item in page["items"]]
+    return page
+
+@router.get("/review/next")
+def get_next_review_items(
+    n: int = Query(10, ge=1, le=100),
+    after: Optional[str] = Query(None, description="filename of the item currently shown"),
+    conf: float = Query(0.25, ge=0.0, le=1.0),
+):
+    """
+    Next N review items with image URL and detections in one round trip.
+
+    Detections come from the background prefetcher's sidecar store when it
+    already scored the image with the active model; others are predicted inline.
     """
-    temp_dir = REVIEW_QUEUE_DIR
-    if not temp_dir.exists(): return {"files": []}
-    files = [f.name for f in temp_dir.glob("*") if f.suffix.lower() in [".jpg", ".jpeg", ".png"]]
-    return {"files": files}
+    return {
+        "items": review_prefetcher.next_items(n=n, after=after, conf=conf),
+        "prefetch": review_prefetcher.stats(),
+    }
+
+@router.get("/catalog")
+def get_catalog(
+    status: Optional[str] = Query(None, description="queued | reviewed | negative | skipped | rejected | imported | staged"),
+    after: Optional[str] = Query(None, description="last filename of the previous page"),
+    limit: int = Query(100, ge=1, le=5000),
+):
+    """
+    Image lifecycle state from the dataset catalog (indexed lookups, no folder scans).
+    Without status only the per-status counts are returned.
+    """
+    out = {"counts": catalog.counts()}
+    if status:
+        rows = catalog.by_status(status, limit=limit, after=after)
+        out["items"] = rows
+        out["next_cursor"] = rows[-1]["name"] if len(rows) == limit else None
+    return out
 
 @router.get("/classes")
 def get_classes():
@@ -159,8 +227,12 @@ def get_classes():
     if ml_service.model and hasattr(ml_service.model, 'names'):
         for val in ml_service.model.names.values():
             classes.add(str(val))
-            
-    return {"classes": list(classes)}
+
+    # 3. Add classes present in the staged labels (columnar store, no label file reads)
+    counts = ml_service.get_dataset_classes()
+    classes.update(counts)
+
+    return {"classes": list(classes), "counts": counts}
 
 @router.post("/classes")
 def add_new_class(data: dict):
@@ -200,13 +272,14 @@ async def queue_annotation(data: dict):
         "height": 960,
         "label_type": "correct" | "false_positive" | "false_negative" | "low_confidence"
     }
+    width/height are optional; when omitted they are read from the image header.
     """
     try:
         result = ml_service.queue_annotation(
             filename=data["filename"],
             detections=data["detections"],
-            width=data["width"],
-            height=data["height"],
+            width=data.get("width"),
+            height=data.get("height"),
             label_type=data.get("label_type", "correct"),
         )
         return result
@@ -1,17 +1,39 @@
+import hashlib
 import logging
+import math
+import queue
 import shutil
 import subprocess
 import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
-from ultralytics import YOLO
+import numpy as np
 
-from BE.settings import IMPORT_ZIP_SCRIPT, ML_PIPELINE
+from BE.services.model_pool import ModelHandle, ModelPool
+from BE.services.prediction_cache import PredictionCache
+from BE.services.queue_index import review_queue_index
+from BE.services.tiling import tile_grid, merge_tile_detections
+from BE.settings import (
+    IMPORT_ZIP_SCRIPT, ML_PIPELINE, INFER_MAX_BATCH, INFER_MAX_WAIT_MS,
+    MODEL_REPLICAS, REPLICA_THREADS, INFERENCE_BACKEND, QUANTIZE_MODE,
+    PREDICT_CACHE_MB, PREDICT_CACHE_FLOOR_CONF, TILE_BATCH, TILE_NMS_THRESHOLD
+)
 from ML.config_loader import (
     RUNS_DIR, IMPORT_DATA_DIR, TRAINING_DATA_DIR, REVIEW_QUEUE_DIR,
-    REVIEWED_DATA_DIR, TEMP_DIR, ML_ROOT, MODEL_HISTORY_DIR, SKIPPED_DIR
+    REVIEWED_DATA_DIR, TEMP_DIR, ML_ROOT, MODEL_HISTORY_DIR, SKIPPED_DIR, IMPORT_WORKERS
 )
+from ML.utils.model_registry import active_entry
+from ML.utils.blob_store import blob_store
+from ML.utils.dataset_catalog import catalog
+from ML.utils.image_dims import dimension_cache
+from ML.utils.label_store import LabelStore
+from ML.utils.staged_stats import StagedStats
+from ML.utils.zip_import import import_labelstudio_zip
 
 logger = logging.getLogger("plantpilot")
 
@@ -20,30 +42,208 @@ import threading
 from collections import deque
 
 
+def letterbox_bucket(height: int, width: int, imgsz: int, stride: int = 32):
+    """
+    Shape an image of (height, width) is padded to by ultralytics' LetterBox.
+    Images in the same bucket can share one rectangular batch without extra padding.
+    """
+    r = min(imgsz / height, imgsz / width)
+    new_h, new_w = round(height * r), round(width * r)
+    return (math.ceil(new_h / stride) * stride, math.ceil(new_w / stride) * stride)
+
+
+def _to_numpy(x):
+    """Tensor (any device) or array-like -> numpy array, in one transfer."""
+    return x.cpu().numpy() if hasattr(x, "cpu") else np.asarray(x)
+
+
+def decode_image(data: bytes):
+    """Decode encoded image bytes (jpg/png/...) into a BGR array without touching disk."""
+    import cv2  # deferred: keeps OpenCV off the startup path
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image bytes")
+    return image
+
+
+class InferenceBatcher:
+    """
+    Micro-batching scheduler for concurrent predict calls.
+
+    Requests are collected for up to ``max_wait_ms`` (or until ``max_batch`` of
+    them share a letterbox bucket), grouped by bucket and run as one batched
+    forward pass. Each caller gets a Future resolved with its own YOLO result.
+    Up to ``workers`` batches run at once (one per model replica). Requests are
+    only batched with others holding the same model handle and imgsz.
+    """
+
+    def __init__(self, run_batch, max_batch: int = 8, max_wait_ms: float = 5.0, workers: int = 1):
+        self._run_batch = run_batch  # callable(handle, images: list, conf: float, imgsz: int) -> list of results
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="inference")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, handle, image, conf: float, bucket, imgsz: int) -> Future:
+        """Queue one decoded image for the next batch on the given model handle."""
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put(((handle.version, imgsz, bucket), handle, image, conf, fut))
+        return fut
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the wait window closes."""
+        first = self._queue.get()
+        pending = {first[0]: [first]}
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            if any(len(group) >= self.max_batch for group in pending.values()):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.setdefault(item[0], []).append(item)
+        return pending
+
+    def _loop(self):
+        while True:
+            pending = self._collect()
+            for group in pending.values():
+                for start in range(0, len(group), self.max_batch):
+                    self._executor.submit(self._dispatch, group[start:start + self.max_batch])
+
+    def _dispatch(self, chunk):
+        # run at the loosest threshold of the chunk; callers re-filter to their own conf
+        conf = min(item[3] for item in chunk)
+        try:
+            results = self._run_batch(chunk[0][1], [item[2] for item in chunk], conf, chunk[0][0][1])
+        except Exception as e:
+            for item in chunk:
+                item[4].set_exception(e)
+            return
+        for item, result in zip(chunk, results):
+            item[4].set_result(result)
+
+
+class BackendUnavailable(Exception):
+    """The requested serving backend has no exported artifact for the active model."""
+
+
 class MLService:
     def __init__(self):
-        self.model = None
-        self.model_path = None
+        self._handle = None  # active ModelHandle; swapped atomically on reload
+        self._swap_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.backend = INFERENCE_BACKEND
+        self._hw_info = None
+        self._hw_lock = threading.Lock()
+        self.warmup_state = "pending"  # pending -> loading -> ready | no_model | failed
+        self._warmup_thread = None
+        self._model_listeners = []  # callables(version) run after every model swap
+        self.last_foreground = 0.0  # monotonic time of the last user-facing predict
+        self.staged_stats = StagedStats(TRAINING_DATA_DIR)  # loaded + reconciled on first use
+        # columnar copy of the staged labels for box statistics and class discovery
+        self.label_store = LabelStore(TRAINING_DATA_DIR / "labels" / "train", name="staged")
         self.logs = deque(maxlen=500)
         self.batch_queue = (
             {}
         )  # {filename: {detections, width, height, label_type, timestamp}}
-        self.check_hardware_acceleration()
-        self.load_model()
+        self.cache = PredictionCache(max_bytes=PREDICT_CACHE_MB * 1024 * 1024)
+        self.batcher = InferenceBatcher(
+            self._predict_batch,
+            max_batch=INFER_MAX_BATCH,
+            max_wait_ms=INFER_MAX_WAIT_MS,
+            workers=MODEL_REPLICAS,
+        )
+        # torch/ultralytics are imported and the model loaded by start_warmup(), not here,
+        # so importing BE.main stays cheap
 
-    def check_hardware_acceleration(self, alert_terminal=True):
-        """Helper to verify actual PyTorch CUDA availability and output colors to terminal."""
-        import torch
-        cuda_ok = torch.cuda.is_available()
-        gpu_name = torch.cuda.get_device_name(0) if cuda_ok else None
-        
-        info = {
-            "device": "cuda" if cuda_ok else "cpu",
-            "cudaAvailable": cuda_ok,
-            "gpuName": gpu_name,
-            "warning": None if cuda_ok else "CUDA is not active. Running on CPU. Training and prediction will be slow."
+    def start_warmup(self):
+        """Load and warm up the model on a background thread; /readyz reports progress."""
+        if self._warmup_thread and self._warmup_thread.is_alive():
+            return
+        self._warmup_thread = threading.Thread(target=self._warmup, name="model-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def _warmup(self):
+        self.warmup_state = "loading"
+        try:
+            self.staged_stats.ensure_loaded()  # mtime-based reconcile of yolo_merged
+            self.label_store.refresh()
+        except Exception as e:
+            self.log_message(f"⚠️ Staged stats reconcile failed: {e}")
+        try:
+            self._adopt_existing_files()
+        except Exception as e:
+            self.log_message(f"⚠️ Dataset catalog bootstrap failed: {e}")
+        try:
+            self.check_hardware_acceleration()
+            self.load_model()
+            self.warmup_state = "ready" if self._handle else "no_model"
+        except Exception as e:
+            self.warmup_state = f"failed: {e}"
+            self.log_message(f"🚨 Model warm-up failed: {e}")
+
+    def _adopt_existing_files(self):
+        """First start with the catalog: register files already on disk (one scandir per folder)."""
+        if not catalog.is_empty():
+            return
+        adopted = catalog.sync_folder(REVIEW_QUEUE_DIR, "queued")
+        adopted += catalog.sync_folder(
+            TRAINING_DATA_DIR / "images" / "train", "staged", TRAINING_DATA_DIR / "labels" / "train"
+        )
+        adopted += catalog.sync_folder(
+            IMPORT_DATA_DIR / "images" / "train", "imported", IMPORT_DATA_DIR / "labels" / "train", "labelstudio"
+        )
+        adopted += catalog.sync_folder(SKIPPED_DIR, "skipped")
+        if adopted:
+            self.log_message(f"Dataset catalog: adopted {adopted} existing images")
+
+    def readiness(self):
+        handle = self._handle
+        return {
+            "ready": handle is not None,
+            "state": "ready" if handle is not None else self.warmup_state,
+            "modelVersion": handle.version if handle else None,
         }
-        
+
+    def check_hardware_acceleration(self, alert_terminal=True):
+        """
+        Helper to verify actual PyTorch CUDA availability and output colors to terminal.
+        Probed once per process; later calls return the cached result without re-alerting.
+        """
+        with self._hw_lock:
+            if self._hw_info is not None:
+                return dict(self._hw_info)
+
+            import torch
+            cuda_ok = torch.cuda.is_available()
+            gpu_name = torch.cuda.get_device_name(0) if cuda_ok else None
+
+            info = {
+                "device": "cuda" if cuda_ok else "cpu",
+                "cudaAvailable": cuda_ok,
+                "gpuName": gpu_name,
+                "warning": None if cuda_ok else "CUDA is not active. Running on CPU. Training and prediction will be slow."
+            }
+            self._hw_info = info
+
         if alert_terminal:
             if cuda_ok:
                 print(f"\033[92m[ACCELERATION OK] CUDA is active. Using GPU: {gpu_name}\033[0m")
@@ -51,9 +251,76 @@ class MLService:
             else:
                 print(f"\033[91m[ACCELERATION WARNING] CUDA is not active. Running on CPU. Training will be slow.\033[0m")
                 self.log_message("⚠️ [ACCELERATION WARNING] CUDA is not active. Running on CPU. Training will be slow.")
-                
+
+        return dict(info)
+
+    # ========== ACTIVE MODEL ==========
+
+    @property
+    def model(self):
+        handle = self._handle
+        return handle.model if handle else None
+
+    @property
+    def model_path(self):
+        handle = self._handle
+        return handle.weights if handle else None
+
+    @property
+    def model_version(self):
+        handle = self._handle
+        return handle.version if handle else None
+
+    @property
+    def serving_backend(self):
+        """Backend of the loaded artifact (may differ from the configured one after a fallback)."""
+        handle = self._handle
+        return self.backend_of(handle.artifact) if handle else None
+
+    @property
+    def model_imgsz(self):
+        handle = self._handle
+        return handle.imgsz if handle else 640
+
+    def pool_info(self):
+        handle = self._handle
+        info = {"size": MODEL_REPLICAS, "loaded": 0, "threadsPerReplica": None}
+        if handle:
+            info.update(handle.pool.info())
         return info
 
+    @contextmanager
+    def acquire_model(self):
+        """Hold a reference to the active model version for the duration of one request."""
+        if self._handle is None:
+            self.load_model()
+        with self._swap_lock:
+            handle = self._handle
+            if handle is None:
+                raise RuntimeError("No model loaded")
+            handle.acquire()
+        try:
+            yield handle
+        finally:
+            handle.release()
+
+    def _install(self, handle):
+        """Atomically make handle the active model; the old one retires once its requests finish."""
+        with self._swap_lock:
+            old, self._handle = self._handle, handle
+        if old is not None:
+            old.release()
+        self.cache.clear()
+        for listener in list(self._model_listeners):
+            try:
+                listener(handle.version if handle else None)
+            except Exception as e:
+                logger.warning(f"Model listener failed: {e}")
+
+    def add_model_listener(self, listener):
+        """Register listener(version) to be called whenever the served model changes."""
+        self._model_listeners.append(listener)
+
     def log_message(self, msg: str):
         logger.info(msg)
         self.logs.append(msg)
@@ -65,8 +332,8 @@ class MLService:
         """Reset project data, optionally archiving instead of wiping."""
         self.log_message(f"Resetting project data (archive={archive})...")
 
-        # 1. Force release of model from memory
-        self.model = None
+        # 1. Force release of model from memory (in-flight requests finish first)
+        self._install(None)
         import gc
         gc.collect()
         self.log_message("Model cleared from memory.")
@@ -108,26 +375,54 @@ class MLService:
         IMPORT_DATA_DIR.mkdir(parents=True, exist_ok=True)
         TRAINING_DATA_DIR.mkdir(parents=True, exist_ok=True)
         (ML_ROOT / "datasets").mkdir(exist_ok=True)
+        review_queue_index.refresh(hash_new=False)
+        self.staged_stats.reconcile()
+        self.label_store.refresh()
+        catalog.clear()
+        blob_store.gc()
 
         # 4. Final reload
         self.load_model()
         self.log_message("Project reset successful.")
 
-    def load_model(self):
-        """Load the newest best.pt or fallback to base model."""
+    def load_model(self, backend=None):
+        """
+        Load the newest best.pt or fallback to base model.
+        The new version is loaded and warmed up while the current one keeps serving,
+        then swapped in atomically. Concurrent callers share a single load.
+        backend switches the serving backend (e.g. "onnx-int8") for this and later loads;
+        an explicitly requested backend without an exported artifact raises BackendUnavailable
+        (and keeps the previous backend) instead of silently serving the .pt.
+        """
+        if backend is not None and backend != "torch" and backend not in self.BACKEND_SUFFIXES:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        with self._load_lock:
+            previous = self.backend
+            if backend is not None:
+                self.backend = backend
+            try:
+                self._load_model_locked(strict=backend is not None)
+            except BackendUnavailable:
+                self.backend = previous
+                raise
+
+    def _load_model_locked(self, strict: bool = False):
+        # Active version from the model registry (O(1), no directory scan)
+        entry = active_entry()
+        if entry:
+            self.log_message(f"🧠 Loading trained brain: {entry['id']} ({entry['source']})")
+            self._activate_model(Path(entry["path"]), imgsz=entry.get("recommendedImgsz"), strict=strict)
+            return
+
         runs_dir = RUNS_DIR / "detect"
 
-        # Look for the absolute latest best.pt across ALL subfolders
+        # Legacy runs without a registry entry: latest best.pt across ALL subfolders
         all_weights = list(runs_dir.rglob("weights/best.pt")) if runs_dir.exists() else []
         if all_weights:
             # Sort by modification time, newest first
             newest_weight = max(all_weights, key=lambda p: p.stat().st_mtime)
             self.log_message(f"🧠 Loading trained brain: {newest_weight.parent.parent.name}")
-            self.model = YOLO(str(newest_weight))
-            import torch
-            if torch.cuda.is_available():
-                self.model.to('cuda')
-                self.log_message("⚡ GPU Acceleration Activated (CUDA)")
+            self._activate_model(newest_weight, strict=strict)
             return
 
         # Fallback to base models
@@ -136,39 +431,170 @@ class MLService:
             path = ML_ROOT / opt
             if path.exists():
                 self.log_message(f"ℹ️ Training not run yet. Using base model: {opt}")
-                self.model = YOLO(str(path))
-                import torch
-                if torch.cuda.is_available():
-                    self.model.to('cuda')
+                self._activate_model(path, strict=strict)
                 return
 
         self.log_message("⚠️ CRITICAL: No model found! ZIP upload required.")
-        self.model = None
+        self._install(None)
+
+    # exported artifact suffix per serving backend; "torch" serves the .pt directly
+    BACKEND_SUFFIXES = {"onnx": ".onnx", "onnx-int8": ".int8.onnx", "torchscript": ".torchscript"}
+
+    @classmethod
+    def backend_of(cls, artifact: Path) -> str:
+        """Serving backend of an artifact, from its suffix ("torch" for the .pt)."""
+        name = Path(artifact).name
+        # longest suffix first: .int8.onnx before .onnx
+        for backend, suffix in sorted(cls.BACKEND_SUFFIXES.items(), key=lambda kv: -len(kv[1])):
+            if name.endswith(suffix):
+                return backend
+        return "torch"
+
+    def _serving_artifact(self, weights: Path, strict: bool = False) -> Path:
+        """
+        Pick the exported artifact for the configured backend, falling back to the .pt
+        (strict: raise BackendUnavailable instead of falling back).
+        """
+        suffix = self.BACKEND_SUFFIXES.get(self.backend)
+        if suffix:
+            artifact = Path(weights).with_suffix(suffix)
+            if artifact.exists():
+                return artifact
+            if strict:
+                raise BackendUnavailable(f"No {self.backend} export next to {Path(weights).name}")
+            self.log_message(f"⚠️ No {self.backend} export next to {Path(weights).name}; serving PyTorch weights.")
+        return Path(weights)
+
+    def _build_model(self, weights: Path):
+        """Instantiate one YOLO replica on the best available device."""
+        from ultralytics import YOLO  # deferred: pulls in torch
+        model = YOLO(str(weights))
+        if Path(weights).suffix != ".pt":
+            # exported backends (ONNX Runtime / TorchScript) are served on CPU as exported
+            return model
+        if self.check_hardware_acceleration(alert_terminal=False)["cudaAvailable"]:
+            model.to('cuda')
+        return model
+
+    @staticmethod
+    def _version_of(weights: Path) -> str:
+        """Short stable id for a weights file (path + mtime), used to key cached predictions."""
+        weights = Path(weights)
+        stamp = f"{weights.resolve()}:{weights.stat().st_mtime_ns}"
+        return hashlib.sha1(stamp.encode("utf-8")).hexdigest()[:12]
+
+    def _resolve_imgsz(self, weights: Path, model) -> int:
+        """Training imgsz from the checkpoint, else the run's args.yaml, else 640."""
+        imgsz = getattr(model, "overrides", {}).get("imgsz")
+        args_yaml = Path(weights).parent.parent / "args.yaml"
+        if imgsz is None and args_yaml.exists():
+            try:
+                import yaml
+                imgsz = (yaml.safe_load(args_yaml.read_text(encoding="utf-8")) or {}).get("imgsz")
+            except Exception:
+                imgsz = None
+        if isinstance(imgsz, (list, tuple)):
+            imgsz = max(imgsz)
+        return int(imgsz) if imgsz else 640
+
+    def _activate_model(self, weights: Path, imgsz=None, strict: bool = False):
+        """
+        Load weights into a new versioned handle, warm it up, then swap it in.
+        imgsz is the calibrated serving resolution (calibrate_imgsz.py), else the training one.
+        """
+        artifact = self._serving_artifact(weights, strict)
+        version = self._version_of(artifact)
+        current = self._handle
+        if current is not None and current.version == version and (imgsz is None or current.imgsz == imgsz):
+            return
+        if artifact.suffix != ".pt":
+            self.log_message(f"Serving {artifact.name} via {self.backend_of(artifact)} backend")
+
+        primary = self._build_model(artifact)
+        pool = ModelPool(size=MODEL_REPLICAS, threads_per_replica=REPLICA_THREADS)
+        pool.load(lambda: self._build_model(artifact), primary=primary)
+        handle = ModelHandle(
+            version=version,
+            weights=Path(weights),
+            artifact=artifact,
+            model=primary,
+            pool=pool,
+            imgsz=int(imgsz) if imgsz else self._resolve_imgsz(weights, primary),
+        )
+        self._warm_up(handle)
+        self._install(handle)
+        self.log_message(
+            f"Model version {version} active at imgsz {handle.imgsz}: "
+            f"{pool.size} replica(s) x {pool.threads_per_replica} threads"
+        )
+
+    def _warm_up(self, handle):
+        """One dummy inference per replica so the first real request does not pay for lazy init."""
+        dummy = np.zeros((handle.imgsz, handle.imgsz, 3), dtype=np.uint8)
+        for replica in handle.pool.replicas:
+            try:
+                replica.predict(source=[dummy], imgsz=handle.imgsz, verbose=False)
+            except Exception as e:
+                self.log_message(f"⚠️ Warm-up failed for version {handle.version}: {e}")
+                return
 
     def run_import_zip(self, zip_path: Path):
-        """Run the import script for a Label Studio ZIP."""
+        """Run the import script for a Label Studio ZIP, streaming its progress into the logs."""
         cmd = [sys.executable, str(IMPORT_ZIP_SCRIPT), str(zip_path)]
         self.log_message(f"Importing Label Studio zip from {zip_path}")
 
         # Run from ML directory since script uses relative paths
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
-            text=True, 
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
             encoding="utf-8",
+            bufsize=1,
             cwd=str(ML_ROOT)  # CRITICAL: Run from ML directory
         )
+        output = []
+        for line in process.stdout:
+            line = line.strip()
+            if line:
+                output.append(line)
+                self.log_message(line)
+        process.wait()
 
-        if result.returncode != 0:
-            self.log_message(f"Import failed: {result.stderr}")
-            raise RuntimeError(f"Import failed: {result.stderr}")
+        if process.returncode != 0:
+            tail = "\n".join(output[-20:])
+            self.log_message("Import failed.")
+            raise RuntimeError(f"Import failed: {tail}")
 
         self.log_message("Import completed.")
-        return result.stdout
+        return "\n".join(output)
+
+    def import_zip_upload(self, fileobj, name: str = "dataset.zip") -> dict:
+        """
+        Import a Label Studio ZIP straight from an uploaded (seekable) file object.
+        why: saving the upload to TEMP_DIR first, then extracting, wrote the dataset to disk three times.
+        """
+        self.log_message(f"Importing Label Studio zip {name}")
+        # SpooledTemporaryFile has no seekable() before Python 3.11; zipfile needs it
+        fileobj = getattr(fileobj, "_file", fileobj)
+        try:
+            result = import_labelstudio_zip(fileobj, IMPORT_DATA_DIR, workers=IMPORT_WORKERS,
+                                            progress=self.log_message)
+        except (ValueError, zipfile.BadZipFile) as e:
+            self.log_message(f"Import failed: {e}")
+            raise RuntimeError(f"Import failed: {e}")
+        if result["failed"]:
+            raise RuntimeError(f"Import failed: {result['failed']} files could not be written")
+        self.log_message(
+            f"Import completed: {result['written']} written, {result['skipped']} unchanged, "
+            f"{result['registered']} images registered."
+        )
+        return result
 
     def run_training(self, epochs=100, imgsz=960, model="yolov8n.pt"):
         """Run the active learning pipeline with streaming output."""
         self.check_hardware_acceleration()
+        dimension_cache.save()  # the pipeline's merge reads sizes probed by annotations
         self.logs.clear()
         self.log_message("🚀 NEURAL ENGINE IGNITION: Preparing refinement pipeline...")
         cmd = [
@@ -176,7 +602,9 @@ class MLService:
             "--no-interactive", 
             f"--epochs={epochs}", 
             f"--imgsz={imgsz}",
-            f"--model={model}"
+            f"--model={model}",
+            f"--export={'onnx,torchscript' if self.backend == 'torchscript' else 'onnx'}",
+            f"--quantize={QUANTIZE_MODE if self.backend == 'onnx-int8' else 'none'}",
         ]
         self.log_message(f"Starting training command: {' '.join(cmd)}")
 
@@ -201,69 +629,213 @@ class MLService:
             raise RuntimeError(f"Training failed")
 
         self.log_message("Training completed successfully.")
+        # boost_merge_labels.py moved reviewed images out of the queue and into yolo_merged
+        review_queue_index.refresh(hash_new=False)
+        self.staged_stats.reconcile()
+        self.label_store.refresh()
         self.log_message("Reloading model...")
         self.load_model()
         return "Success"
 
-    def predict(self, image_path: Path, conf=0.25):
-        """Run inference on a single image with fusing error protection."""
-        self.check_hardware_acceleration()
-        if not self.model: self.load_model()
-        if not self.model: raise RuntimeError("No model loaded")
+    def predict(self, image_path: Path, conf=0.25, imgsz=None):
+        """Run inference on a single image file."""
+        return self.predict_bytes(Path(image_path).read_bytes(), conf=conf, imgsz=imgsz)
+
+    def predict_bytes(self, data: bytes, conf=0.25, tiled=False, tile_overlap=0.2, imgsz=None):
+        """Run inference on encoded image bytes (see predict_bytes_versioned)."""
+        return self.predict_bytes_versioned(
+            data, conf=conf, tiled=tiled, tile_overlap=tile_overlap, imgsz=imgsz
+        )[0]
+
+    def predict_bytes_versioned(self, data: bytes, conf=0.25, tiled=False, tile_overlap=0.2, imgsz=None,
+                                background=False):
+        """
+        Run inference on encoded image bytes through the prediction cache.
+        Detections are cached at PREDICT_CACHE_FLOOR_CONF and re-thresholded per call,
+        so a cache hit skips both decoding and the network.
+        imgsz overrides the model's calibrated serving resolution for this call.
+        background=True marks prefetch work, which yields to user-facing requests.
+        Returns (detections, model_version) for the version that produced them.
+        """
+        if not background:
+            self.last_foreground = time.monotonic()
+        with self.acquire_model() as handle:
+            size = int(imgsz) if imgsz else handle.imgsz
+
+            def run(threshold):
+                image = decode_image(data)
+                if tiled:
+                    return self._predict_tiled(handle, image, threshold, tile_overlap, size)
+                return self._predict_image(handle, image, threshold, size)
+
+            if not self.cache.enabled or conf < PREDICT_CACHE_FLOOR_CONF:
+                return run(conf), handle.version
+
+            key = (
+                hashlib.blake2b(data, digest_size=16).hexdigest(),
+                handle.version,
+                size,
+                ("tiled", tile_overlap) if tiled else None,
+            )
+            detections = self.cache.get_or_compute(key, lambda: run(PREDICT_CACHE_FLOOR_CONF))
+            return [d for d in detections if d["confidence"] >= conf], handle.version
 
+    def predict_stream(self, items, conf=0.25, tiled=False, imgsz=None):
+        """
+        Predict many images concurrently and yield (name, detections, model_version, error)
+        as each finishes.
+        items: iterable of (name, load) where load() returns the encoded image bytes.
+        Enough images are kept in flight to fill every replica's micro-batches, while
+        only that window (not the whole request) is held in memory.
+        """
+        window = max(1, self.batcher.max_batch * MODEL_REPLICAS * 2)
+        items = iter(items)
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=window, thread_name_prefix="predict-stream") as executor:
+            def submit_next():
+                for name, load in items:
+                    fut = executor.submit(
+                        lambda load=load: self.predict_bytes_versioned(load(), conf=conf, tiled=tiled, imgsz=imgsz)
+                    )
+                    pending[fut] = name
+                    return True
+                return False
+
+            for _ in range(window):
+                if not submit_next():
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = pending.pop(fut)
+                    try:
+                        detections, version = fut.result()
+                        yield name, detections, version, None
+                    except Exception as e:
+                        yield name, None, None, str(e)
+                    submit_next()
+
+    def predict_tiled(self, image, conf=0.25, overlap=0.2, imgsz=None):
+        """Sliced inference on an already decoded BGR image (see _predict_tiled)."""
+        with self.acquire_model() as handle:
+            return self._predict_tiled(handle, image, conf, overlap, int(imgsz) if imgsz else handle.imgsz)
+
+    def predict_array(self, image, conf=0.25, imgsz=None):
+        """Run inference on an already decoded BGR image."""
+        with self.acquire_model() as handle:
+            return self._predict_image(handle, image, conf, int(imgsz) if imgsz else handle.imgsz)
+
+    def _predict_tiled(self, handle, image, conf, overlap, imgsz):
+        """
+        Sliced inference for high-resolution images.
+        The image is cut into overlapping model-sized tiles (no downscaling), the
+        tiles run as batches of TILE_BATCH, and boxes / OBB / mask polygons are
+        mapped back to full-image coordinates with seam duplicates merged by NMS.
+        """
+        height, width = image.shape[:2]
+        windows = tile_grid(height, width, imgsz, overlap)
+        if len(windows) == 1:
+            return self._predict_image(handle, image, conf, imgsz)
+
+        crops = [np.ascontiguousarray(image[y0:y1, x0:x1]) for x0, y0, x1, y1 in windows]
+        tile_detections = []
+        for start in range(0, len(crops), TILE_BATCH):
+            results = self._predict_batch(handle, crops[start:start + TILE_BATCH], conf, imgsz)
+            tile_detections += [self._extract_result(r) for r in results]
+        return merge_tile_detections(tile_detections, windows, width, height, threshold=TILE_NMS_THRESHOLD)
+
+    def _predict_image(self, handle, image, conf, imgsz):
+        """
+        Run inference on one decoded image with the given model handle.
+        Concurrent calls are micro-batched by the InferenceBatcher when INFER_MAX_BATCH > 1.
+        """
         try:
-            results = self.model.predict(source=str(image_path), conf=conf, verbose=False)
-            return self._extract_detections(results)
-        except AttributeError as e:
-            if "bn" in str(e):
-                self.log_message("⚠️ Fusing error detected. Applying bypass...")
-                # Try prediction without automatic fusion
-                try:
-                    results = self.model.predict(source=str(image_path), conf=conf, verbose=False, fuse=False)
-                    return self._extract_detections(results)
-                except Exception as inner_e:
-                    self.log_message(f"🚨 Bypass failed: {inner_e}")
-            raise e
+            if self.batcher.max_batch > 1:
+                bucket = letterbox_bucket(*image.shape[:2], imgsz)
+                result = self.batcher.submit(handle, image, conf, bucket, imgsz).result()
+            else:
+                result = self._predict_batch(handle, [image], conf, imgsz)[0]
         except Exception as e:
             logger.error(f"Prediction failed: {e}")
             raise e
+        return [d for d in self._extract_result(result) if d["confidence"] >= conf]
+
+    def _predict_batch(self, handle, images: list, conf=0.25, imgsz=None):
+        """Run one batched forward pass on a pooled replica with fusing error protection."""
+        imgsz = imgsz or handle.imgsz
+        with handle.pool.checkout() as model:
+            try:
+                return model.predict(source=images, conf=conf, imgsz=imgsz, verbose=False)
+            except AttributeError as e:
+                if "bn" in str(e):
+                    self.log_message("⚠️ Fusing error detected. Applying bypass...")
+                    # Try prediction without automatic fusion
+                    try:
+                        return model.predict(
+                            source=images, conf=conf, imgsz=imgsz, verbose=False, fuse=False
+                        )
+                    except Exception as inner_e:
+                        self.log_message(f"🚨 Bypass failed: {inner_e}")
+                raise e
 
     def _extract_detections(self, results):
         """Helper to safely extract detections from YOLO results."""
         if not results: return []
-        result = results[0]
-        detections = []
+        return self._extract_result(results[0])
+
+    def _extract_result(self, result):
+        """
+        Extract detections from a single YOLO result.
+        Each result tensor is moved to numpy once and converted with a single tolist().
+        """
+        polys = None
 
         # Check for OBB (Oriented Bounding Boxes)
         if getattr(result, 'obb', None) is not None:
-            for i in range(len(result.obb.cls)):
-                detections.append({
-                    "class": result.names[int(result.obb.cls[i])],
-                    "confidence": float(result.obb.conf[i]),
-                    "box": result.obb.xyxy[i].tolist(),
-                    "poly": result.obb.xyxyxyxyn[i].tolist()
-                })
+            obb = result.obb
+            cls, conf, boxes = obb.cls, obb.conf, obb.xyxy
+            polys = _to_numpy(obb.xyxyxyxyn).tolist()
         # Check for Segmentation Masks
         elif getattr(result, 'masks', None) is not None:
-            for i in range(len(result.masks.cls)):
-                detections.append({
-                    "class": result.names[int(result.boxes[i].cls)],
-                    "confidence": float(result.boxes[i].conf),
-                    "box": result.boxes.xyxy[i].tolist(),
-                    "poly": result.masks.xyn[i].tolist()
-                })
+            cls, conf, boxes = result.boxes.cls, result.boxes.conf, result.boxes.xyxy
+            polys = [seg.tolist() for seg in result.masks.xyn]  # ragged, already numpy
         # Standard Bounding Boxes
+        elif getattr(result, 'boxes', None) is not None:
+            cls, conf, boxes = result.boxes.cls, result.boxes.conf, result.boxes.xyxy
         else:
-            for box in result.boxes:
-                # Handle box.cls being a tensor
-                cls_id = int(box.cls[0]) if hasattr(box.cls, "__len__") else int(box.cls)
-                conf_val = float(box.conf[0]) if hasattr(box.conf, "__len__") else float(box.conf)
-                detections.append({
-                    "class": result.names[cls_id],
-                    "confidence": conf_val,
-                    "box": box.xyxy[0].tolist() if hasattr(box.xyxy[0], "tolist") else box.xyxy.tolist()
-                })
-        return detections
+            return []
+
+        names = result.names
+        cls = _to_numpy(cls).astype(int).tolist()
+        conf = _to_numpy(conf).astype(float).tolist()
+        boxes = _to_numpy(boxes).reshape(-1, 4).tolist()
+
+        if polys is None:
+            return [
+                {"class": names[c], "confidence": s, "box": b}
+                for c, s, b in zip(cls, conf, boxes)
+            ]
+        return [
+            {"class": names[c], "confidence": s, "box": b, "poly": p}
+            for c, s, b, p in zip(cls, conf, boxes, polys)
+        ]
+
+    def to_columnar(self, detections: list):
+        """
+        Columnar response shape: parallel arrays of class ids, scores and boxes
+        (plus polys for OBB/seg models) and the id -> name table they refer to.
+        """
+        names = dict(self.model.names) if self.model and hasattr(self.model, 'names') else {}
+        ids = {str(nm): int(idx) for idx, nm in names.items()}
+        return {
+            "names": names,
+            "classIds": [ids.get(d["class"], -1) for d in detections],
+            "scores": [d["confidence"] for d in detections],
+            "boxes": [d["box"] for d in detections],
+            "polys": [d["poly"] for d in detections] if detections and "poly" in detections[0] else None,
+        }
 
     def _get_or_create_class_id(self, class_name: str) -> int:
         from ML.config_loader import CLASS_FILE
@@ -301,10 +873,25 @@ class MLService:
         self.log_message(f"✨ New class '{class_name}' appended to dataset mapping (ID: {len(classes)-1})")
         return len(classes) - 1
 
-    def save_annotation(self, filename: str, detections: list, width: int, height: int):
+    def _image_size(self, filename: str, width: int | None, height: int | None):
+        """
+        Size of a queued image: as sent by the client, else read from the image header.
+        why: annotating must not decode the image only to learn its size.
+        """
+        if width and height:
+            return width, height
+        wh = dimension_cache.get(REVIEW_QUEUE_DIR / filename)
+        if wh is None:
+            raise FileNotFoundError(f"Cannot read image size of {filename}")
+        dimension_cache.save_soon()  # batched: a rewrite of image_dims.json per annotation is O(dataset)
+        return wh
+
+    def save_annotation(self, filename: str, detections: list, width: int | None = None,
+                        height: int | None = None):
         """
         Save a user-verified annotation to the training set.
         Moves image from uploads to dataset and creates .txt label.
+        width/height may be omitted; they are then read from the image header.
         """
         uploads_file = REVIEW_QUEUE_DIR / filename
 
@@ -314,6 +901,7 @@ class MLService:
 
         if not uploads_file.exists():
             raise FileNotFoundError(f"Source file {filename} not found in uploads")
+        width, height = self._image_size(filename, width, height)
 
         # Image stays in test_images; boost_merge_labels.py will pick it up and move it to yolo_merged.
 
@@ -327,6 +915,7 @@ class MLService:
         if not self.model:
             self.load_model()
 
+        class_counts = {}
         with label_path.open("w") as f:
             for det in detections:
                 class_name = str(det['class']).strip()
@@ -334,6 +923,7 @@ class MLService:
                     continue
 
                 cid = self._get_or_create_class_id(class_name)
+                class_counts[str(cid)] = class_counts.get(str(cid), 0) + 1
 
                 if 'poly' in det and det['poly']:
                     # OBB/Seg Format: class x1 y1 x2 y2 ... (normalized)
@@ -359,32 +949,42 @@ class MLService:
 
                     f.write(f"{cid} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
 
+        catalog.upsert(
+            filename, status="reviewed", label_source="review", path=uploads_file,
+            width=width, height=height, class_counts=class_counts,
+        )
         self.log_message(f"Saved annotation for {filename} with {len(detections)} labels")
         return True
 
     def get_staged_stats(self):
-        """Count images and classes currently in yolo_merged (staged for next train)."""
-        merged_images = TRAINING_DATA_DIR / "images" / "train"
-        merged_labels = TRAINING_DATA_DIR / "labels" / "train"
-
-        images = list(merged_images.glob("*")) if merged_images.exists() else []
-        labels = list(merged_labels.glob("*.txt")) if merged_labels.exists() else []
-
-        classes = set()
-        for lab in labels:
-            if lab.stat().st_size > 0:
-                try:
-                    for line in lab.read_text().splitlines():
-                        if line.strip():
-                            classes.add(line.split()[0])
-                except:
-                    pass
+        """
+        Stats of yolo_merged (staged for next train): images, classes, per-class
+        instances / images / box-size histograms and negatives, plus per-class box
+        width / height / area / aspect distributions from the columnar label store.
+        Maintained incrementally by the write paths; no rescan per call (box distributions
+        are cached per label-store generation).
+        """
+        names = self._class_names()
+        summary = self.staged_stats.summary(names)
+        summary["boxStats"] = {
+            (names[cid] if 0 <= cid < len(names) else str(cid)): stats
+            for cid, stats in self.label_store.box_stats().items()
+        }
+        return summary
 
+    def get_dataset_classes(self) -> dict:
+        """{class name (or id without a name): instances} of the classes present in the staged labels."""
+        names = self._class_names()
         return {
-            "images": len(images),
-            "classes": len(classes)
+            (names[cid] if 0 <= cid < len(names) else str(cid)): n
+            for cid, n in self.label_store.class_histogram().items()
         }
 
+    def _class_names(self) -> list:
+        from ML.config_loader import CLASS_FILE
+        names = CLASS_FILE.read_text(encoding="utf-8").splitlines() if CLASS_FILE.exists() else []
+        return [n.strip() for n in names]
+
 
 
     def skip_annotation(self, filename: str):
@@ -398,6 +998,8 @@ class MLService:
         if source_file.exists():
             target_file = SKIPPED_DIR / filename
             shutil.move(str(source_file), str(target_file))
+            catalog.upsert(filename, status="skipped", path=target_file)
+            review_queue_index.remove(filename)
             self.log_message(f"Moved {filename} to skipped directory.")
             return True
         self.log_message(f"Could not skip {filename}: File not found in queue.")
@@ -415,6 +1017,10 @@ class MLService:
         if merged_labels.exists():
             shutil.rmtree(merged_labels)
             merged_labels.mkdir(parents=True, exist_ok=True)
+        self.staged_stats.clear()
+        self.label_store.refresh()
+        catalog.delete_status("staged")
+        blob_store.gc()
 
         self.log_message("🧼 Staged data flushed successfully.")
         return True
@@ -425,14 +1031,15 @@ class MLService:
         self,
         filename: str,
         detections: list,
-        width: int,
-        height: int,
+        width: int | None = None,
+        height: int | None = None,
         label_type: str = "correct",
     ):
         """
         Add annotation to batch queue instead of training immediately.
         label_type: "correct", "false_positive", "false_negative", "low_confidence"
         """
+        width, height = self._image_size(filename, width, height)
         if filename not in self.batch_queue:
             self.batch_queue[filename] = {
                 "detections": detections,
@@ -466,6 +1073,8 @@ class MLService:
         test_image = REVIEW_QUEUE_DIR / filename
         if test_image.exists():
             test_image.unlink()
+            catalog.upsert(filename, status="rejected", path=None)
+            review_queue_index.remove(filename)
             self.log_message(f"🗑️ Deleted {filename} from test_images")
 
         return {"status": "rejected", "queue_size": len(self.batch_queue)}
@@ -493,6 +1102,7 @@ class MLService:
             return {"status": "error", "message": "Batch queue is empty"}
 
         saved_count = 0
+        staged_labels = []
         try:
             for filename, info in self.batch_queue.items():
                 detections = info["detections"]
@@ -514,11 +1124,18 @@ class MLService:
                         merged_images.mkdir(parents=True, exist_ok=True)
                         merged_labels.mkdir(parents=True, exist_ok=True)
 
-                        # Copy image
-                        shutil.copy2(test_image, merged_images / filename)
+                        # Link image through the blob store (no byte copy)
+                        sha = blob_store.materialize(test_image, merged_images / filename)
                         # Create empty label file (negative sample)
                         label_path = merged_labels / f"{Path(filename).stem}.txt"
                         label_path.write_text("")
+                        self.staged_stats.update_image(merged_images / filename)
+                        self.staged_stats.update_label(label_path)
+                        staged_labels.append(label_path)
+                        catalog.upsert(
+                            filename, status="staged", label_source="negative", sha256=sha,
+                            path=merged_images / filename, width=width, height=height, class_counts={},
+                        )
                         self.log_message(
                             f"✓ Saved {filename} as negative sample (false positive)"
                         )
@@ -532,6 +1149,8 @@ class MLService:
                     self.save_annotation(filename, detections, width, height)
                     saved_count += 1
 
+            self.staged_stats.save()
+            self.label_store.update(staged_labels)
             self.log_message(
                 f"✅ Batch accepted: {saved_count}/{len(self.batch_queue)} annotations saved"
             )
@@ -547,5 +1166,33 @@ class MLService:
             return {"status": "error", "message": str(e)}
 
 
-# Singleton instance
-ml_service = MLService()
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_ml_service() -> MLService:
+    """The process-wide MLService, constructed on first use."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = MLService()
+    return _instance
+
+
+class _LazyService:
+    """
+    Module-level stand-in for the singleton: attribute access constructs it on first use.
+    why: routers import ml_service at import time; building it there put the service
+    (and its caches, stats and batcher) on the startup path of every import of BE.main.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_ml_service(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_ml_service(), name, value)
+
+
+# Singleton instance (built lazily; the lifespan hook builds it at startup)
+ml_service = _LazyService()
@@ -0,0 +1,119 @@
+# services/model_pool.py
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class ModelPool:
+    """
+    Fixed set of model replicas for parallel CPU inference.
+    why: one YOLO object shared by every request thread scales poorly; several
+    replicas with a few intra-op threads each keep all cores busy.
+    """
+
+    def __init__(self, size: int = 1, threads_per_replica: int = 0):
+        self.size = max(1, int(size))
+        cpus = os.cpu_count() or 1
+        self.threads_per_replica = int(threads_per_replica) or max(1, cpus // self.size)
+        self._idle = queue.Queue()
+        self._replicas = []
+        self._lock = threading.Lock()
+
+    def load(self, factory, primary=None):
+        """Build `size` replicas with factory(); primary (if given) is reused as replica 0."""
+        self._set_thread_budget()
+        replicas = [primary if primary is not None else factory()]
+        replicas += [factory() for _ in range(self.size - 1)]
+        idle = queue.Queue()
+        for model in replicas:
+            idle.put(model)
+        with self._lock:
+            self._idle, self._replicas = idle, replicas
+
+    def _set_thread_budget(self):
+        """
+        torch's intra-op thread count is process-wide, so it is set once per pool
+        (replicas x threads ~ cores), not per checkout where concurrent replicas
+        overwrote each other's setting.
+        """
+        try:
+            import torch
+        except ImportError:  # onnx-only deployments
+            return
+        if torch.get_num_threads() != self.threads_per_replica:
+            torch.set_num_threads(self.threads_per_replica)
+
+    def clear(self):
+        """Drop all replicas; checked-out ones are released to the discarded queue."""
+        with self._lock:
+            self._idle, self._replicas = queue.Queue(), []
+
+    @property
+    def loaded(self) -> int:
+        return len(self._replicas)
+
+    @property
+    def replicas(self) -> list:
+        return list(self._replicas)
+
+    @contextmanager
+    def checkout(self, timeout: float | None = None):
+        """Borrow one idle replica (blocks until one is returned)."""
+        with self._lock:
+            idle, loaded = self._idle, bool(self._replicas)
+        if not loaded:
+            raise RuntimeError("No model loaded")
+        try:
+            model = idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No model replica available")
+        try:
+            yield model
+        finally:
+            # return to the queue it came from so a reload never receives stale replicas
+            idle.put(model)
+
+    def info(self) -> dict:
+        return {
+            "size": self.size,
+            "loaded": self.loaded,
+            "threadsPerReplica": self.threads_per_replica,
+        }
+
+
+class ModelHandle:
+    """
+    One loaded model version: primary model, replica pool and a reference count.
+    why: a reload swaps the active handle atomically; requests that already hold
+    the old handle finish on it, and its replicas are freed when the last one returns.
+    """
+
+    def __init__(self, version: str, weights, artifact, model, pool: ModelPool, imgsz: int):
+        self.version = version
+        self.weights = weights
+        self.artifact = artifact
+        self.model = model
+        self.pool = pool
+        self.imgsz = imgsz
+        self._refs = 1  # held by the service while this handle is active
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._refs <= 0:
+                raise RuntimeError(f"Model version {self.version} already released")
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            last = self._refs == 0
+        if last:
+            self.pool.clear()
+            self.model = None
+
+    @property
+    def refs(self) -> int:
+        return self._refs
@@ -0,0 +1,91 @@
+# services/prediction_cache.py
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class PredictionCache:
+    """
+    LRU cache of raw detections keyed by (image hash, model version, imgsz).
+    why: the review UI asks for the same image at several conf values; storing
+    detections at a low floor lets any higher conf be answered by filtering.
+    Identical concurrent misses coalesce onto one in-flight computation.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries = OrderedDict()  # key -> (detections, size)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_or_compute(self, key, compute):
+        """Return cached detections for key, or run compute() once for all concurrent callers."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return fut.result()
+
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value)
+        fut.set_result(value)
+        return value
+
+    def _store(self, key, value):
+        # serialized size is a good proxy for what the entry costs to keep around
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self.bytes -= old_size
+
+    def clear(self):
+        """Drop every entry (called when the served weights change)."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hitRate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
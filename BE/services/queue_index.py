@@ -0,0 +1,266 @@
+# services/queue_index.py
+import bisect
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from BE.settings import QUEUE_INDEX_PATH, QUEUE_INDEX_RESCAN_S
+from ML.config_loader import REVIEW_QUEUE_DIR
+
+logger = logging.getLogger("plantpilot")
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReviewQueueIndex:
+    """
+    In-memory, persisted index of the review queue: name -> size, mtime, sha256.
+    why: listing the queue used to glob the whole folder per request. Writers in
+    the backend update the index directly (write-through); changes made by other
+    processes (boost_merge_labels.py, manual copies) are picked up by refresh(),
+    a single os.scandir diff that keeps hashes of unchanged files.
+    Names are kept sorted so a page is a bisect plus a slice.
+
+    start() runs the index's own maintenance thread: a refresh every rescan_s and a
+    save save_delay seconds after a write-through change (a burst of changes is
+    written once). Without the thread, changes are saved immediately.
+    """
+
+    def __init__(self, root: Path = REVIEW_QUEUE_DIR, store_path: Path = QUEUE_INDEX_PATH,
+                 rescan_s: float = QUEUE_INDEX_RESCAN_S, save_delay: float = 1.0):
+        self.root = Path(root)
+        self.store_path = Path(store_path)
+        self.rescan_s = rescan_s
+        self.save_delay = save_delay
+        self._save_due = threading.Event()
+        self._thread = None
+        self._entries = {}  # name -> [size, mtime_ns, sha256 | None]
+        self._names = []  # sorted
+        self._lock = threading.Lock()
+        self._remove_listeners = []
+        self._loaded = False
+        self._dirty = False
+
+    def add_remove_listener(self, listener):
+        """listener(name) runs whenever an image leaves the queue."""
+        self._remove_listeners.append(listener)
+
+    # --- write-through ---
+
+    def add(self, name: str, size: int | None = None, mtime_ns: int | None = None, sha256: str | None = None):
+        """Record a file just written into the queue (hash is free when the writer computed it)."""
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTS:
+            return
+        self.ensure_loaded()
+        if size is None or mtime_ns is None:
+            try:
+                st = (self.root / name).stat()
+            except OSError:
+                return
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        with self._lock:
+            if name not in self._entries:
+                bisect.insort(self._names, name)
+            self._entries[name] = [size, mtime_ns, sha256]
+            self._dirty = True
+        self._changed()
+
+    def remove(self, name: str):
+        """Drop a file that was moved or deleted out of the queue."""
+        with self._lock:
+            if self._entries.pop(name, None) is None:
+                return
+            i = bisect.bisect_left(self._names, name)
+            if i < len(self._names) and self._names[i] == name:
+                del self._names[i]
+            self._dirty = True
+        self._changed()
+        self._notify_removed([name])
+
+    def _changed(self):
+        """Persist a write-through change: debounced by the maintenance thread, else right away."""
+        if self._thread and self._thread.is_alive():
+            self._save_due.set()
+        else:
+            self.save()
+
+    def _notify_removed(self, names):
+        for listener in list(self._remove_listeners):
+            for name in names:
+                try:
+                    listener(name)
+                except Exception as e:
+                    logger.warning(f"Queue index listener failed for {name}: {e}")
+
+    # --- maintenance ---
+
+    def start(self):
+        """Start the maintenance thread (periodic rescans, debounced saves)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="queue-index", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        try:
+            self.ensure_loaded()
+        except Exception as e:
+            logger.warning(f"Loading review queue index failed: {e}")
+        next_rescan = time.monotonic() + self.rescan_s
+        while True:
+            try:
+                if self._save_due.wait(max(0.0, next_rescan - time.monotonic())):
+                    time.sleep(self.save_delay)  # coalesce a burst of changes into one write
+                    self._save_due.clear()
+                    self.save()
+                if time.monotonic() >= next_rescan:
+                    # pick up changes made outside the backend (boost_merge_labels.py, manual copies)
+                    self.refresh()
+                    next_rescan = time.monotonic() + self.rescan_s
+            except Exception as e:
+                logger.warning(f"Review queue index maintenance failed: {e}")
+
+    # --- reconciliation ---
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        """Read the persisted index, then reconcile it with the folder."""
+        try:
+            stored = json.loads(self.store_path.read_text(encoding="utf-8"))
+            if not isinstance(stored, dict):
+                stored = {}
+        except (OSError, ValueError):
+            stored = {}
+        with self._lock:
+            self._entries = {k: list(v) for k, v in stored.items()}
+            self._names = sorted(self._entries)
+            self._loaded = True
+        # hashes of new files are filled in by the next background refresh
+        self.refresh(hash_new=False)
+
+    def refresh(self, hash_new: bool = True):
+        """One os.scandir pass: add new/changed files, drop vanished ones, keep known hashes."""
+        if not self._loaded:
+            return self.load()
+        seen = {}
+        if self.root.exists():
+            with os.scandir(self.root) as it:
+                for e in it:
+                    if e.is_file() and os.path.splitext(e.name)[1].lower() in IMAGE_EXTS:
+                        st = e.stat()
+                        seen[e.name] = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            removed = [n for n in self._entries if n not in seen]
+            changed = False
+            for name in removed:
+                del self._entries[name]
+            for name, (size, mtime_ns) in seen.items():
+                old = self._entries.get(name)
+                if old is None or old[0] != size or old[1] != mtime_ns:
+                    self._entries[name] = [size, mtime_ns, None]
+                    changed = True
+            if removed or changed:
+                self._names = sorted(self._entries)
+                self._dirty = True
+        if removed:
+            self._notify_removed(removed)
+        if hash_new:
+            self.hash_missing()
+        self.save()
+
+    def hash_missing(self, limit: int | None = None):
+        """Compute sha256 for entries added without one (e.g. files dropped in by other processes)."""
+        with self._lock:
+            todo = [n for n, e in self._entries.items() if e[2] is None]
+        for name in todo[:limit]:
+            try:
+                sha = file_sha256(self.root / name)
+            except OSError:
+                continue
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    entry[2] = sha
+                    self._dirty = True
+
+    def save(self):
+        """Persist (only when something changed) via temp file + rename."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries)
+            self._dirty = False
+        try:
+            self.store_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.store_path.with_suffix(".json.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.store_path)
+        except OSError as e:
+            logger.warning(f"Saving review queue index failed: {e}")
+
+    # --- queries ---
+
+    def snapshot(self) -> dict:
+        """{name: (size, mtime_ns)} of every queued image."""
+        self.ensure_loaded()
+        with self._lock:
+            return {n: (e[0], e[1]) for n, e in self._entries.items()}
+
+    def names_after(self, after: str | None, limit: int) -> list:
+        self.ensure_loaded()
+        with self._lock:
+            start = bisect.bisect_right(self._names, after) if after else 0
+            return self._names[start:start + limit]
+
+    def page(self, cursor: str | None = None, limit: int | None = None, q: str | None = None,
+             ext: str | None = None) -> dict:
+        """
+        One page of the queue in name order, starting after cursor (the last name of
+        the previous page). q filters by case-insensitive substring, ext by extension.
+        """
+        self.ensure_loaded()
+        q = q.lower() if q else None
+        ext = ("." + ext.lower().lstrip(".")) if ext else None
+        items = []
+        more = False
+        with self._lock:
+            start = bisect.bisect_right(self._names, cursor) if cursor else 0
+            for i in range(start, len(self._names)):
+                name = self._names[i]
+                if q and q not in name.lower():
+                    continue
+                if ext and os.path.splitext(name)[1].lower() != ext:
+                    continue
+                if limit and len(items) >= limit:
+                    more = True  # one match past the page: only then is there a next page
+                    break
+                size, mtime_ns, sha = self._entries[name]
+                items.append({"filename": name, "size": size, "mtime": mtime_ns / 1e9, "sha256": sha})
+            total = len(self._names)
+        return {
+            "items": items,
+            "next_cursor": items[-1]["filename"] if more else None,
+            "total": total,
+        }
+
+    def __len__(self) -> int:
+        self.ensure_loaded()
+        return len(self._entries)
+
+
+review_queue_index = ReviewQueueIndex()
@@ -0,0 +1,223 @@
+# services/review_prefetcher.py
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from BE.settings import (
+    PREDICT_CACHE_FLOOR_CONF, PREFETCH_DIR, PREFETCH_ENABLED, PREFETCH_IDLE_MS, PREFETCH_POLL_S,
+    REVIEW_RANK_CONF, REVIEW_RANK_METHOD,
+)
+from BE.services.ml_service import ml_service
+from BE.services.queue_index import review_queue_index
+from BE.services.review_ranking import ReviewRanking
+from ML.config_loader import REVIEW_QUEUE_DIR
+
+logger = logging.getLogger("plantpilot")
+
+
+class ReviewPrefetcher:
+    """
+    Background worker that precomputes predictions for every image in the review queue.
+    why: the reviewer otherwise waits for a full inference on each "next"; the server
+    is idle between reviews, so that time is spent scoring the queue ahead of them.
+
+    Results live in one sidecar JSON per image (detections at the cache floor conf,
+    plus the model version and file stamp they belong to). A model swap marks every
+    sidecar stale and the queue is re-scored. Work only runs while no user-facing
+    predict happened for PREFETCH_IDLE_MS. Every stored result also feeds the
+    uncertainty ranking used to order the review queue.
+    """
+
+    def __init__(self, service, index, queue_dir: Path = REVIEW_QUEUE_DIR, store_dir: Path = PREFETCH_DIR):
+        self.service = service
+        self.index = index
+        self.queue_dir = Path(queue_dir)
+        self.store_dir = Path(store_dir)
+        self.idle_s = PREFETCH_IDLE_MS / 1000.0
+        self._wake = threading.Event()
+        self._thread = None
+        self.ranking = ReviewRanking(REVIEW_RANK_METHOD, min_conf=REVIEW_RANK_CONF)
+        self._ranked_version = None  # model version the ranking was seeded for
+        self.scored = 0
+        self.failed = 0
+        index.add_remove_listener(self._forget)
+
+    def start(self):
+        if not PREFETCH_ENABLED or (self._thread and self._thread.is_alive()):
+            return
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.service.add_model_listener(lambda version: self.notify())
+        self._thread = threading.Thread(target=self._loop, name="review-prefetch", daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def notify(self):
+        """New files arrived or the model changed: rescan now instead of at the next poll."""
+        self._wake.set()
+
+    # --- sidecar store ---
+
+    def _sidecar(self, name: str) -> Path:
+        return self.store_dir / f"{name}.json"
+
+    def _forget(self, name: str):
+        """An image left the queue: drop its sidecar and ranking entry right away."""
+        self.ranking.remove(name)
+        try:
+            self._sidecar(name).unlink()
+        except OSError:
+            pass
+
+    def read(self, name: str, stamp=None):
+        """
+        Stored prediction for name if it matches the file (size, mtime_ns) and the
+        active model, else None.
+        """
+        try:
+            entry = json.loads(self._sidecar(name).read_text(encoding="utf-8"))
+            if stamp is None:
+                st = (self.queue_dir / name).stat()
+                stamp = (st.st_size, st.st_mtime_ns)
+        except (OSError, ValueError):
+            return None
+        if entry.get("stamp") != list(stamp) or entry.get("version") != self.service.model_version:
+            return None
+        return entry
+
+    def _write(self, name: str, stamp: list, version: str, detections: list):
+        entry = {"stamp": stamp, "version": version, "detections": detections}
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.store_dir / f".{name}.json.tmp"
+        tmp.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(tmp, self._sidecar(name))
+        self.ranking.update(name, detections)
+        return entry
+
+    def _load_ranking(self, queued: dict, version: str):
+        """
+        Seed the ranking from stored sidecars (one vectorized pass). Only sidecars of the
+        given model version whose stamp matches the queued file count; the rest are
+        re-scored by the pass instead of ordering the queue with an old model's scores.
+        """
+        stored = {}
+        with os.scandir(self.store_dir) as it:
+            for e in it:
+                name = e.name[:-5]
+                if not e.name.endswith(".json") or e.name.startswith(".") or name not in queued:
+                    continue
+                try:
+                    with open(e.path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    if entry.get("version") == version and entry.get("stamp") == list(queued[name]):
+                        stored[name] = entry["detections"]
+                except (OSError, ValueError, KeyError):
+                    continue
+        self.ranking.rebuild(stored)
+        self._ranked_version = version
+
+    def score(self, name: str, background: bool = True):
+        """Predict one queued image and store the result; returns the sidecar entry."""
+        path = self.queue_dir / name
+        st = path.stat()
+        detections, version = self.service.predict_bytes_versioned(
+            path.read_bytes(), conf=PREDICT_CACHE_FLOOR_CONF, background=background
+        )
+        return self._write(name, [st.st_size, st.st_mtime_ns], version, detections)
+
+    # --- worker ---
+
+    def _prune(self, queued: dict):
+        """Drop sidecars of images that left the queue (annotated, skipped or deleted)."""
+        with os.scandir(self.store_dir) as it:
+            for e in it:
+                if e.name.endswith(".json") and e.name[:-5] not in queued:
+                    self.ranking.remove(e.name[:-5])
+                    try:
+                        os.unlink(e.path)
+                    except OSError:
+                        pass
+
+    def _wait_idle(self):
+        """Yield to user-facing inference: sleep until none happened for idle_s."""
+        while True:
+            quiet = time.monotonic() - self.service.last_foreground
+            if quiet >= self.idle_s:
+                return
+            time.sleep(self.idle_s - quiet)
+
+    def _pass(self):
+        version = self.service.model_version
+        if version is None:
+            return
+        queued = self.index.snapshot()
+        if version != self._ranked_version:
+            self._load_ranking(queued, version)  # first pass or model swap
+        self._prune(queued)
+        for name in sorted(queued):
+            if self._wake.is_set():
+                return  # rescan: model changed or new files arrived
+            if self.read(name, queued[name]) is not None:
+                continue
+            self.ranking.remove(name)  # file replaced: its old score no longer applies
+            self._wait_idle()
+            try:
+                self.score(name)
+                self.scored += 1
+            except FileNotFoundError:
+                pass  # moved out of the queue meanwhile
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Prefetch failed for {name}: {e}")
+
+    def _loop(self):
+        try:
+            self.index.ensure_loaded()  # rescans and saves are the index's own thread
+        except Exception as e:
+            logger.warning(f"Loading review queue state failed: {e}")
+        while True:
+            self._wake.wait(PREFETCH_POLL_S)
+            self._wake.clear()
+            try:
+                self._pass()
+            except Exception as e:
+                logger.warning(f"Review prefetch pass failed: {e}")
+
+    def next_items(self, n: int = 10, after: str | None = None, conf: float = 0.25) -> list:
+        """
+        The next n queued images (by name, after the given one) with their detections.
+        Prefetched results are served from the sidecar store; missing ones are scored inline.
+        """
+        items = []
+        for name in self.index.names_after(after, max(0, n)):
+            entry = self.read(name)
+            prefetched = entry is not None
+            if entry is None:
+                try:
+                    entry = self.score(name, background=False)
+                except FileNotFoundError:
+                    continue
+            items.append({
+                "filename": name,
+                "url": f"/uploads/{name}",
+                "detections": [d for d in entry["detections"] if d["confidence"] >= conf],
+                "model_version": entry["version"],
+                "prefetched": prefetched,
+            })
+        return items
+
+    def stats(self) -> dict:
+        return {
+            "enabled": bool(PREFETCH_ENABLED),
+            "running": self.running,
+            "scored": self.scored,
+            "failed": self.failed,
+        }
+
+
+review_prefetcher = ReviewPrefetcher(ml_service, review_queue_index)
@@ -0,0 +1,112 @@
+# services/review_ranking.py
+import bisect
+import threading
+
+import numpy as np
+
+from ML.config_loader import UNCERTAIN_THRESHOLD
+
+METHODS = ("least_confidence", "margin", "entropy")
+
+
+def uncertainty_scores(conf: np.ndarray, owner: np.ndarray, n_images: int, min_conf: float = 0.0) -> np.ndarray:
+    """
+    Per-image uncertainty from every detection confidence at once.
+    conf: (N,) confidences of all detections of all images, owner: (N,) image index.
+    Detections below min_conf (the cut the reviewer sees) are ignored: cached predictions
+    go down to the cache floor, where every image has a near-zero detection.
+    Returns (n_images, 3) scores in [0, 1] for METHODS; an image scores as its most
+    uncertain detection, images without detections score 0.
+
+    least_confidence = 1 - p
+    margin           = 1 - |p - t| / max(t, 1 - t), t = UNCERTAIN_THRESHOLD (the review cut-off)
+    entropy          = binary entropy of p in bits
+    """
+    out = np.zeros((n_images, len(METHODS)), dtype=np.float64)
+    keep = conf >= min_conf
+    conf, owner = conf[keep], owner[keep]
+    if conf.size == 0:
+        return out
+    p = np.clip(conf.astype(np.float64), 1e-6, 1 - 1e-6)
+    t = UNCERTAIN_THRESHOLD
+    per_det = np.stack([
+        1.0 - p,
+        1.0 - np.abs(p - t) / max(t, 1.0 - t),
+        -(p * np.log2(p) + (1.0 - p) * np.log2(1.0 - p)),
+    ], axis=1)
+    np.maximum.at(out, owner, per_det)
+    return out
+
+
+class ReviewRanking:
+    """
+    Priority index of queued images by uncertainty of their cached predictions.
+    why: reviewers should spend their time on images the model is unsure about;
+    the index is kept sorted on update so top(k) is a slice, not a sort per request.
+    """
+
+    def __init__(self, method: str = "entropy", min_conf: float = 0.0):
+        self.method = method if method in METHODS else "entropy"
+        self.min_conf = min_conf
+        self._col = METHODS.index(self.method)
+        self._scores = {}  # name -> (least_confidence, margin, entropy)
+        self._order = []  # sorted [(-score, name)]
+        self._lock = threading.Lock()
+
+    def rebuild(self, detections_by_name: dict):
+        """Score every image in one vectorized pass and replace the index."""
+        names = list(detections_by_name)
+        counts = [len(detections_by_name[n]) for n in names]
+        conf = np.fromiter(
+            (d["confidence"] for n in names for d in detections_by_name[n]),
+            dtype=np.float64, count=sum(counts),
+        )
+        owner = np.repeat(np.arange(len(names)), counts)
+        scores = uncertainty_scores(conf, owner, len(names), self.min_conf)
+        table = {name: tuple(row) for name, row in zip(names, scores.tolist())}
+        order = sorted((-row[self._col], name) for name, row in table.items())
+        with self._lock:
+            self._scores, self._order = table, order
+
+    def update(self, name: str, detections: list):
+        conf = np.asarray([d["confidence"] for d in detections], dtype=np.float64)
+        row = tuple(uncertainty_scores(conf, np.zeros(conf.size, dtype=int), 1, self.min_conf)[0].tolist())
+        with self._lock:
+            self._discard(name)
+            self._scores[name] = row
+            bisect.insort(self._order, (-row[self._col], name))
+
+    def remove(self, name: str):
+        with self._lock:
+            self._discard(name)
+
+    def _discard(self, name: str):
+        row = self._scores.pop(name, None)
+        if row is not None:
+            key = (-row[self._col], name)
+            i = bisect.bisect_left(self._order, key)
+            if i < len(self._order) and self._order[i] == key:
+                del self._order[i]
+
+    def top(self, k: int, offset: int = 0) -> list:
+        """The k most informative images as [{filename, score, scores}], most uncertain first."""
+        with self._lock:
+            chunk = self._order[offset:offset + k]
+            return [
+                {
+                    "filename": name,
+                    "score": round(-neg, 4),
+                    "scores": dict(zip(METHODS, (round(v, 4) for v in self._scores[name]))),
+                }
+                for neg, name in chunk
+            ]
+
+    def score_of(self, name: str):
+        row = self._scores.get(name)
+        return None if row is None else round(row[self._col], 4)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._scores
+
+    def __len__(self) -> int:
+        return len(self._scores)
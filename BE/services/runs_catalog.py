@@ -7,6 +7,7 @@ import json
 import re
 
 from BE.settings import ML_DIR
+from ML.utils.model_registry import register_model, relocate
 
 RUNS_DETECT = (ML_DIR / "runs" / "detect").resolve()
 CURRENT = RUNS_DETECT / "train"
@@ -74,6 +75,7 @@ def _read_args(run_dir: Path):
                     k, v = line.split(":", 1)
                     data[k.strip()] = v.strip()
         return {
+            "task": str(data.get("task", "")),
             "data": str(data.get("data", "")),
             "model": str(data.get("model", "")),
             "epochs": _safe_float(data.get("epochs")),
@@ -126,8 +128,15 @@ def rollback_to(run_name: str):
     if CURRENT.exists():
         dst_prev = ARCHIVE / f"train_{ts}_prev"
         shutil.move(str(CURRENT), str(dst_prev))
+        relocate(CURRENT, dst_prev)
 
     shutil.copytree(src, CURRENT)  # recreate stable current
+    register_model(
+        CURRENT / "weights" / "best.pt",
+        task=str(_read_args(CURRENT).get("task") or "detect"),
+        metrics=_read_metrics(CURRENT),
+        source=f"rollback:{run_name}",
+    )
     _append_manifest({
         "event": "rollback",
         "timestamp": ts,
@@ -0,0 +1,80 @@
+# services/tiling.py
+import numpy as np
+
+
+def tile_origins(length: int, tile: int, overlap: float):
+    """Start offsets of overlapping windows covering [0, length); the last one is flush with the edge."""
+    if length <= tile:
+        return [0]
+    stride = max(1, int(tile * (1.0 - overlap)))
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height: int, width: int, tile: int, overlap: float = 0.2):
+    """Windows (x0, y0, x1, y1) of a sliced image. All windows share one shape."""
+    th, tw = min(tile, height), min(tile, width)
+    return [
+        (x0, y0, x0 + tw, y0 + th)
+        for y0 in tile_origins(height, th, overlap)
+        for x0 in tile_origins(width, tw, overlap)
+    ]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, threshold: float = 0.5, metric: str = "ios"):
+    """
+    Class-aware greedy NMS over xyxy boxes, vectorized per kept box.
+    metric="ios" (intersection over the smaller box) also merges the truncated
+    half-boxes a tile seam produces, which plain IoU keeps as separate hits.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=int)
+    # offset boxes per class so different classes never overlap
+    offset = classes.astype(np.float64)[:, None] * (boxes.max() + 1.0)
+    b = boxes.astype(np.float64) + offset
+    x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        iw = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        ih = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = iw * ih
+        if metric == "ios":
+            denom = np.minimum(areas[i], areas[rest])
+        else:
+            denom = areas[i] + areas[rest] - inter
+        overlap = inter / np.maximum(denom, 1e-9)
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=int)
+
+
+def merge_tile_detections(tile_detections: list, windows: list, width: int, height: int, threshold: float = 0.5):
+    """
+    Map per-tile detections (box in tile pixels, poly normalized to the tile)
+    back to full-image coordinates and drop duplicates across tile seams.
+    """
+    merged = []
+    for dets, (x0, y0, x1, y1) in zip(tile_detections, windows):
+        tw, th = x1 - x0, y1 - y0
+        for d in dets:
+            out = dict(d)
+            bx1, by1, bx2, by2 = d["box"]
+            out["box"] = [bx1 + x0, by1 + y0, bx2 + x0, by2 + y0]
+            if d.get("poly"):
+                pts = np.asarray(d["poly"], dtype=np.float64).reshape(-1, 2)
+                pts = (pts * (tw, th) + (x0, y0)) / (width, height)
+                out["poly"] = pts.tolist()
+            merged.append(out)
+
+    if not merged:
+        return []
+    boxes = np.asarray([d["box"] for d in merged], dtype=np.float64)
+    scores = np.asarray([d["confidence"] for d in merged], dtype=np.float64)
+    _, classes = np.unique([d["class"] for d in merged], return_inverse=True)
+    keep = nms(boxes, scores, classes, threshold=threshold)
+    return [merged[i] for i in keep]
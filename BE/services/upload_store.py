@@ -0,0 +1,131 @@
+# services/upload_store.py
+import asyncio
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from BE.services.queue_index import review_queue_index
+from BE.settings import UPLOAD_CHUNK_KB, UPLOAD_CONCURRENCY, UPLOAD_MAX_MB
+from ML.utils.blob_store import blob_store
+from ML.utils.dataset_catalog import catalog
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def safe_filename(name: str) -> str | None:
+    """Basename of a user supplied filename, or None if nothing usable is left."""
+    n = Path(name or "").name
+    return n if n and n not in {".", ".."} else None
+
+
+def _copy_and_hash(src, dst: Path, max_bytes: int, chunk_size: int, dedupe: bool = False):
+    """
+    Stream src into dst in chunks while hashing, via a .part file renamed on success.
+    why: the event loop never touches the disk, a partial file never shows up in the
+    review queue, and the hash costs no extra pass over the data.
+    With dedupe, dst is then swapped for a link to the blob store (one copy per content).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    part = dst.with_name(f".{dst.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        src.seek(0)
+        with part.open("wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"exceeds {max_bytes // (1024 * 1024)} MB limit")
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(part, dst)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    sha256 = digest.hexdigest()
+    if dedupe:
+        blob_store.adopt(dst, sha256)
+    return size, sha256
+
+
+def copy_upload(file: UploadFile, dst: Path, max_mb: int = UPLOAD_MAX_MB, dedupe: bool = False):
+    """
+    Blocking save_upload for sync handlers (already off the event loop).
+    Returns (bytes, sha256); raises UploadTooLarge.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    return _copy_and_hash(file.file, dst, max_mb * 1024 * 1024, UPLOAD_CHUNK_KB * 1024, dedupe)
+
+
+async def save_upload(file: UploadFile, dst: Path, max_mb: int = UPLOAD_MAX_MB, dedupe: bool = False) -> dict:
+    """
+    Write one upload to dst off the event loop (dedupe: share bytes via the blob store).
+    Returns a per-file result with status "ok", "too_large" or "error" (never raises).
+    """
+    result = {"filename": dst.name, "status": "ok"}
+    try:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        size, sha256 = await run_in_threadpool(
+            _copy_and_hash, file.file, dst, max_mb * 1024 * 1024, UPLOAD_CHUNK_KB * 1024, dedupe
+        )
+        result.update(bytes=size, sha256=sha256)
+    except UploadTooLarge as e:
+        result.update(status="too_large", error=f"{dst.name} {e}")
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    finally:
+        await file.close()
+    return result
+
+
+async def save_uploads(files: list, dst_dir: Path, max_mb: int = UPLOAD_MAX_MB,
+                       concurrency: int = UPLOAD_CONCURRENCY, dedupe: bool = True) -> list:
+    """
+    Write many uploads into dst_dir, up to `concurrency` at a time; results keep input order.
+    A name already used earlier in the batch is rejected: both copies would race for the same file.
+    """
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    gate = asyncio.Semaphore(max(1, concurrency))
+    seen = set()
+
+    async def one(file: UploadFile, name: str | None, duplicate: bool):
+        if name is None or duplicate:
+            await file.close()
+            error = "duplicate filename in this upload" if duplicate else "missing or invalid filename"
+            return {"filename": name or file.filename, "status": "error", "error": error}
+        async with gate:
+            return await save_upload(file, dst_dir / name, max_mb=max_mb, dedupe=dedupe)
+
+    jobs = []
+    for f in files:
+        name = safe_filename(f.filename)
+        # case-insensitive: the same file on Windows / macOS volumes
+        key = name.lower() if name else None
+        jobs.append(one(f, name, key in seen))
+        if key:
+            seen.add(key)
+    return await asyncio.gather(*jobs)
+
+
+def register_queued(results: list, dst_dir: Path) -> list:
+    """
+    Record the "ok" results of save_upload(s) in the review queue index and the catalog.
+    Blocking (the index may load / scan the folder, SQLite may wait on its busy timeout):
+    async handlers run it via run_in_threadpool. Returns the registered filenames.
+    """
+    saved = [r for r in results if r["status"] == "ok"]
+    for r in saved:
+        review_queue_index.add(r["filename"], size=r["bytes"], sha256=r["sha256"])
+    catalog.upsert_many([
+        (r["filename"], {"status": "queued", "sha256": r["sha256"], "path": dst_dir / r["filename"]})
+        for r in saved
+    ])
+    return [r["filename"] for r in saved]
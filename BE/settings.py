@@ -1,10 +1,13 @@
 # settings.py
+import os
 from pathlib import Path
 from ML.config_loader import (
     ML_ROOT,
     REVIEW_QUEUE_DIR,
     IMPORT_DATA_DIR,
-    TRAINING_DATA_DIR
+    TRAINING_DATA_DIR,
+    get_int,
+    get_float,
 )
 
 # project root = .../PlantPilotAI-Fullstack
@@ -26,3 +29,45 @@ YOLO_DATASET_LABELS = YOLO_DATASET_ROOT / "labels" / "train"
 YOLO_MERGED_ROOT = TRAINING_DATA_DIR
 YOLO_MERGED_IMAGES = YOLO_MERGED_ROOT / "images" / "train"
 YOLO_MERGED_LABELS = YOLO_MERGED_ROOT / "labels" / "train"
+
+# inference scheduler (micro-batching of concurrent predict calls)
+INFER_MAX_BATCH = get_int("INFER_MAX_BATCH", 8)
+INFER_MAX_WAIT_MS = get_float("INFER_MAX_WAIT_MS", 5.0)
+
+# model replica pool (parallel CPU inference); 0 threads = split cpu cores evenly
+MODEL_REPLICAS = get_int("MODEL_REPLICAS", 1)
+REPLICA_THREADS = get_int("REPLICA_THREADS", 0)
+
+# serving backend: "torch" (best.pt), "onnx" (best.onnx via ONNX Runtime), "onnx-int8"
+# (best.int8.onnx, quantized after training) or "torchscript"
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").strip().lower()
+# INT8 post-training quantization used when training for the "onnx-int8" backend: "dynamic" or "static"
+QUANTIZE_MODE = os.getenv("QUANTIZE_MODE", "dynamic").strip().lower()
+
+# prediction cache: raw detections kept at a floor conf, re-thresholded per request (0 MB disables)
+PREDICT_CACHE_MB = get_int("PREDICT_CACHE_MB", 256)
+PREDICT_CACHE_FLOOR_CONF = get_float("PREDICT_CACHE_FLOOR_CONF", 0.01)
+
+# tiled inference for large field images: tiles per forward pass and seam-merge NMS threshold
+TILE_BATCH = get_int("TILE_BATCH", 16)
+TILE_NMS_THRESHOLD = get_float("TILE_NMS_THRESHOLD", 0.5)
+
+# uploads: per-file size limits, files written in parallel, copy chunk size
+UPLOAD_MAX_MB = get_int("UPLOAD_MAX_MB", 50)
+UPLOAD_ZIP_MAX_MB = get_int("UPLOAD_ZIP_MAX_MB", 4096)
+UPLOAD_CONCURRENCY = get_int("UPLOAD_CONCURRENCY", 8)
+UPLOAD_CHUNK_KB = get_int("UPLOAD_CHUNK_KB", 1024)
+
+# review prefetcher: precomputed predictions for the review queue (sidecar JSON per image)
+PREFETCH_ENABLED = get_int("PREFETCH_ENABLED", 1)
+PREFETCH_DIR = ML_ROOT / "data" / "review_predictions"
+PREFETCH_POLL_S = get_float("PREFETCH_POLL_S", 5.0)
+PREFETCH_IDLE_MS = get_float("PREFETCH_IDLE_MS", 250.0)
+# review queue ordering by uncertainty: "entropy", "least_confidence" or "margin"
+REVIEW_RANK_METHOD = os.getenv("REVIEW_RANK_METHOD", "entropy").strip().lower()
+# detections below this conf are not scored (the review UI's default cut; cached ones go down to the floor)
+REVIEW_RANK_CONF = get_float("REVIEW_RANK_CONF", 0.25)
+
+# review queue index (name -> size, mtime, sha256), reconciled with the folder every QUEUE_INDEX_RESCAN_S
+QUEUE_INDEX_PATH = ML_ROOT / "data" / "review_queue_index.json"
+QUEUE_INDEX_RESCAN_S = get_float("QUEUE_INDEX_RESCAN_S", 30.0)
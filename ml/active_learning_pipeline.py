@@ -19,6 +19,8 @@ Writes to:
 - ML/models/current/
 - ML/models/history/
 - ML/runs/detect/train/
+- ML/data/catalog.db (training run membership)
+- ML/data/label_store/staged/ (columnar copy of the staged labels)
 
 Called by:
 - Flask BE when user clicks Accept and Train from the review UI.
@@ -44,6 +46,12 @@ from config_loader import (
     ML_ROOT
 )
 from ultralytics import YOLO
+from utils.dataset_catalog import catalog
+from utils.label_store import LabelStore
+from utils.model_registry import active_model_path, read_run_metrics, register_model, relocate, update_entry
+
+# Final weights location the backend serves from (MODEL_PATH is reassigned below)
+CONFIG_MODEL_PATH = MODEL_PATH
 
 # Disable emojis for Windows terminal compatibility
 USE_EMOJI = False
@@ -68,6 +76,7 @@ def _archive_existing_train():
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     dst = MODEL_HISTORY_DIR / f"train_{ts}"
     shutil.move(str(TRAIN_STABLE), str(dst))
+    relocate(TRAIN_STABLE, dst)  # keep registry paths valid after the move
     print(f"archived previous train to: {dst}")
     return dst
 
@@ -95,6 +104,66 @@ def _manifest_append(event: str, extra: dict):
         print(f"Manifest append failed: {e}")  # do not break training if manifest fails
 
 
+def _export_artifacts(weights: Path, formats: list, imgsz: int):
+    """
+    Exports serving artifacts (ONNX / TorchScript) next to best.pt so the
+    backend can serve them without eager PyTorch.
+    Never fails the pipeline if an export fails.
+    """
+    for fmt in formats:
+        try:
+            out = YOLO(str(weights)).export(
+                format=fmt,
+                imgsz=imgsz,
+                dynamic=(fmt == "onnx"),  # dynamic batch/shape for micro-batched serving
+                device="cpu",
+            )
+            print(f"Exported {fmt} artifact: {out}")
+        except Exception as e:
+            print(f"Export to {fmt} failed: {e}")  # pytorch weights remain servable
+
+
+def _quantize_artifacts(weights: Path, entry: dict, mode: str, data_yaml: Path, imgsz: int, task: str):
+    """
+    Writes best.int8.onnx from the ONNX export and records the INT8 vs FP32
+    accuracy delta in the registry entry.
+    Never fails the pipeline if quantization fails.
+    """
+    if mode == "none":
+        return
+    try:
+        from utils.quantize_model import quantize_and_report
+        calib_dir = TRAINING_DATA_DIR / "images" / "train"
+        if not calib_dir.exists():
+            calib_dir = IMPORT_DATA_DIR / "images" / "train"  # initial training: merged set not built yet
+        report = quantize_and_report(
+            weights, data_yaml, calib_dir,
+            mode=mode, imgsz=imgsz, task=task,
+        )
+        update_entry(entry["id"], quantization=report)
+        print(f"INT8 ({mode}) mAP50-95 delta vs FP32: {report['delta']['mAP50-95']:+.4f}, "
+              f"latency {report['fp32']['msPerImage']}ms -> {report['int8']['msPerImage']}ms")
+    except Exception as e:
+        print(f"INT8 quantization failed: {e}")  # fp32 artifacts remain servable
+
+
+def _publish_model(weights: Path, export_formats: list, quantize: str, data_yaml: Path, imgsz: int,
+                   task: str, metrics: dict, source: str) -> dict:
+    """
+    Exports, registers and quantizes one weights file as the active version.
+    The backend looks for ONNX / INT8 artifacts next to the registered path,
+    so all three steps use the same file. Artifacts left by the previous model at
+    that path are removed first, so a failed export never serves stale weights.
+    """
+    for suffix in (".onnx", ".int8.onnx", ".torchscript"):
+        weights.with_suffix(suffix).unlink(missing_ok=True)
+    _export_artifacts(weights, export_formats, imgsz)
+    entry = register_model(weights, task=task, metrics=metrics, source=source)
+    print(f"Registered model version {entry['id']} as active")
+    _quantize_artifacts(weights, entry, quantize, data_yaml, imgsz, task)
+    return entry
+
+
 def _sync_yaml(yaml_path: Path, data_path: Path):
     """Update YAML path and names from global CLASS_FILE; data_path relative to ml/"""
     from config_loader import CLASS_FILE
@@ -179,7 +248,18 @@ if __name__ == '__main__':
     parser.add_argument("--epochs", type=int, default=100, help="Number of training epochs")
     parser.add_argument("--imgsz", type=int, default=960, help="Image size for training")
     parser.add_argument("--model", type=str, default="yolov8n.pt", help="Base model (e.g. yolov8n.pt, yolov8s.pt)")
+    parser.add_argument(
+        "--export", type=str, default="onnx",
+        help="Comma separated serving exports written next to best.pt (onnx, torchscript) or 'none'"
+    )
+    parser.add_argument(
+        "--quantize", type=str, default="none", choices=["none", "dynamic", "static"],
+        help="Post-training INT8 quantization of the ONNX export for CPU serving"
+    )
     args = parser.parse_args()
+    export_formats = [f.strip() for f in args.export.split(",") if f.strip() and f.strip() != "none"]
+    if args.quantize != "none" and "onnx" not in export_formats:
+        export_formats.append("onnx")  # INT8 model is derived from the ONNX export
 
     def get_task(model_name: str) -> str:
         if "obb" in model_name:
@@ -276,6 +356,12 @@ if __name__ == '__main__':
             print(f"No training artifacts found at {best}")
             sys.exit(1)
 
+        entry = _publish_model(
+            best, export_formats, args.quantize, Path(dataset_yaml), args.imgsz,
+            task=task_type, metrics=read_run_metrics(best.parent.parent), source="initial_train",
+        )
+        catalog.mark_trained(entry["id"], status="imported")
+
         # record manifest for the one-time initial training
         _manifest_append(
             "initial_train",
@@ -313,10 +399,14 @@ if __name__ == '__main__':
         Returns the model path used for prediction.
 
         Priority:
-        1. Current refined model (best.pt in runs/detect or MODELS_DIR)
-        2. Latest archived model
+        1. Active version in the model registry
+        2. Newest best.pt under runs/detect (legacy runs recorded before the registry)
         3. Base model
         """
+        registered = active_model_path()
+        if registered is not None:
+            return registered
+
         base_dir = Path(base_dir)
         if not base_dir.exists():
             base_dir.mkdir(parents=True, exist_ok=True)
@@ -365,18 +455,28 @@ if __name__ == '__main__':
         print("archived old stable model; ready for new training into runs/detect/train")
 
     # === Step 6: validate labels and images ===
-    valid_labels = [f for f in merged_labels.glob("*.txt") if f.stat().st_size > 0]
+    # labels with at least one row, from the columnar label store (only changed files are re-read)
+    label_store = LabelStore(merged_labels, name="staged")
+    label_store.refresh()
+    valid_labels = [merged_labels / f"{stem}.txt" for stem in label_store.nonempty_stems()]
     print(f"Total potential labels found: {len(valid_labels)}")
 
+    # staged images known to the catalog resolve by stem without probing extensions
+    staged_by_stem = {}
+    for row in catalog.by_status("staged"):
+        staged_by_stem[row["stem"]] = merged_images / row["name"]
+
     final_train_pairs = []
     for label_file in valid_labels:
-        # Check for multiple extensions
-        found_img = None
-        for ext in ['.jpg', '.png', '.jpeg', '.JPG']:
-            img_cand = merged_images / (label_file.stem + ext)
-            if img_cand.exists():
-                found_img = img_cand
-                break
+        found_img = staged_by_stem.get(label_file.stem)
+        if found_img is None or not found_img.exists():
+            # Check for multiple extensions
+            found_img = None
+            for ext in ['.jpg', '.png', '.jpeg', '.JPG']:
+                img_cand = merged_images / (label_file.stem + ext)
+                if img_cand.exists():
+                    found_img = img_cand
+                    break
 
         if found_img:
             final_train_pairs.append((found_img, label_file))
@@ -427,9 +527,9 @@ if __name__ == '__main__':
         if TRAIN_STABLE.exists():
             shutil.rmtree(TRAIN_STABLE, ignore_errors=True)
 
-        MODEL_PATH = get_latest_model_path()
-        print(f"Running YOLO training (Fine-tuning from {MODEL_PATH})...")
-        model = YOLO(str(MODEL_PATH))
+        base_model = get_latest_model_path()
+        print(f"Running YOLO training (Fine-tuning from {base_model})...")
+        model = YOLO(str(base_model))
         device = get_device()
 
         try:
@@ -457,7 +557,8 @@ if __name__ == '__main__':
         # after training, backup old model and update MODEL_PATH with new best
         # Check the trained weights location (absolute path)
         final_best = (RUNS_DETECT / "train" / "weights" / "best.pt").resolve()
-        target_model = MODEL_PATH
+        # never copy over the fine-tune source: it may be an archived version in the registry
+        target_model = CONFIG_MODEL_PATH
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_model = TEMP_DIR / f"last_model_{timestamp}.pt"
 
@@ -491,6 +592,15 @@ if __name__ == '__main__':
                 shutil.rmtree("runs/detect/train", ignore_errors=True)
                 sys.exit(1)
 
+        # export next to the file that gets registered: MODEL_PATH may live outside the run folder
+        served = target_model if target_model.exists() else final_best
+        entry = _publish_model(
+            served, export_formats, args.quantize, Path(dataset_yaml), args.imgsz,
+            task=task_type, metrics=read_run_metrics(final_best.parent.parent), source="active_learning_train",
+        )
+        MODEL_PATH = Path(entry["path"])
+        catalog.mark_trained(entry["id"], status="staged")
+
         _manifest_append(
             "active_learning_train",
             {
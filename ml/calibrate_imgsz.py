@@ -0,0 +1,165 @@
+"""
+File: calibrate_imgsz.py
+
+Purpose:
+Benchmarks the active model at a ladder of inference resolutions on
+held-back images (the review queue by default, which the model was not
+trained on). For every size it records latency and how well detections
+agree with the highest resolution, then stores the smallest size that
+keeps agreement above --min-agreement as the model's recommended imgsz.
+
+Reads from:
+- ML/runs/detect/registry.json (active model)
+- ML/data/test_images/ (or --images)
+
+Writes to:
+- ML/runs/detect/registry.json (recommendedImgsz, imgszCalibration)
+
+Called by:
+- Manually: python calibrate_imgsz.py [--sizes 480,640,800,960] [--samples 50]
+- BE reloads the model (POST /model/reload) to pick up the recommendation.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from config_loader import TEST_IMAGE_FOLDER, TRAINING_DATA_DIR
+from ultralytics import YOLO
+from utils.model_registry import active_entry, update_entry
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def _detections(result):
+    """(classes, scores, xyxy boxes in original pixels) as numpy arrays."""
+    boxes = result.obb if getattr(result, "obb", None) is not None else result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros(0, int), np.zeros(0), np.zeros((0, 4))
+    return (
+        boxes.cls.cpu().numpy().astype(int),
+        boxes.conf.cpu().numpy(),
+        boxes.xyxy.cpu().numpy().reshape(-1, 4),
+    )
+
+
+def _iou_matrix(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def _matches(ref, cand, iou_threshold):
+    """Greedy same-class IoU matching of cand against ref (highest ref score first)."""
+    ref_cls, ref_conf, ref_box = ref
+    cand_cls, _, cand_box = cand
+    if len(ref_cls) == 0 or len(cand_cls) == 0:
+        return 0
+    iou = _iou_matrix(ref_box, cand_box)
+    iou[ref_cls[:, None] != cand_cls[None, :]] = 0.0
+    used = np.zeros(len(cand_cls), dtype=bool)
+    matched = 0
+    for i in np.argsort(-ref_conf):
+        row = np.where(used, 0.0, iou[i])
+        j = int(row.argmax())
+        if row[j] >= iou_threshold:
+            used[j] = True
+            matched += 1
+    return matched
+
+
+def _sample_images(folder: Path, count: int):
+    images = sorted(p for p in Path(folder).glob("*") if p.suffix.lower() in IMAGE_EXTS)
+    random.Random(0).shuffle(images)
+    return images[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=str, default="480,640,800,960,1280", help="Comma separated imgsz ladder")
+    parser.add_argument("--images", type=str, default=None, help="Held-back image folder (default: review queue)")
+    parser.add_argument("--samples", type=int, default=50, help="Number of images to benchmark")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a detection to agree with the reference")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="F1 vs reference required for a size")
+    args = parser.parse_args()
+
+    entry = active_entry()
+    if entry is None:
+        print("No active model in the registry. Train or roll back a model first.")
+        sys.exit(1)
+
+    folder = Path(args.images) if args.images else TEST_IMAGE_FOLDER
+    images = _sample_images(folder, args.samples)
+    if not images:
+        folder = TRAINING_DATA_DIR / "images" / "train"
+        images = _sample_images(folder, args.samples)
+        print("Review queue empty; falling back to training images (agreement will be optimistic)")
+    if not images:
+        print("No images found for calibration.")
+        sys.exit(1)
+
+    sizes = sorted({int(s) for s in args.sizes.split(",") if s.strip()})
+    print(f"Calibrating {entry['id']} on {len(images)} images from {folder} at sizes {sizes}")
+
+    model = YOLO(entry["path"])
+    decoded = [img for img in (cv2.imread(str(p)) for p in images) if img is not None]
+
+    per_size = {}
+    for imgsz in sizes:
+        model.predict(source=decoded[0], imgsz=imgsz, conf=args.conf, verbose=False)  # warm-up
+        latencies, dets = [], []
+        for img in decoded:
+            t0 = time.perf_counter()
+            result = model.predict(source=img, imgsz=imgsz, conf=args.conf, verbose=False)[0]
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            dets.append(_detections(result))
+        per_size[imgsz] = (latencies, dets)
+
+    reference = per_size[sizes[-1]][1]
+    report, recommended = [], sizes[-1]
+    for imgsz in sizes:
+        latencies, dets = per_size[imgsz]
+        n_ref = sum(len(r[0]) for r in reference)
+        n_cand = sum(len(d[0]) for d in dets)
+        matched = sum(_matches(r, d, args.iou) for r, d in zip(reference, dets))
+        f1 = 1.0 if n_ref + n_cand == 0 else 2.0 * matched / (n_ref + n_cand)
+        report.append({
+            "imgsz": imgsz,
+            "msMedian": round(statistics.median(latencies), 2),
+            "detections": n_cand,
+            "agreementF1": round(f1, 4),
+        })
+        print(f"  imgsz={imgsz:5d}  {report[-1]['msMedian']:8.1f} ms  dets={n_cand:5d}  F1={f1:.3f}")
+
+    for row in report:
+        if row["agreementF1"] >= args.min_agreement:
+            recommended = row["imgsz"]
+            break
+
+    update_entry(
+        entry["id"],
+        recommendedImgsz=recommended,
+        imgszCalibration={
+            "images": len(decoded),
+            "source": str(folder),
+            "reference": sizes[-1],
+            "minAgreement": args.min_agreement,
+            "ladder": report,
+        },
+    )
+    print(f"Recommended imgsz for {entry['id']}: {recommended}")
+
+
+if __name__ == "__main__":
+    main()
@@ -73,6 +73,10 @@ ORIGINAL_LABELS = IMPORT_DATA_DIR / "labels" / "train"
 UNCERTAIN_THRESHOLD = get_float("UNCERTAIN_THRESHOLD", 0.35)
 IMG_SIZE = get_int("IMG_SIZE", 960)
 
+# Merge Settings
+MERGE_WORKERS = get_int("MERGE_WORKERS", 8)  # threads for link/copy during boost_merge_labels.py
+IMPORT_WORKERS = get_int("IMPORT_WORKERS", 4)  # threads decompressing Label Studio ZIP members
+
 # Classes
 CLASS_FILE = get_path("CLASS_FILE", "class_names.txt")
 if not CLASS_FILE.exists():
@@ -93,6 +97,6 @@ __all__ = [
     "TRAINING_DATA_DIR", "TEMP_DIR", "IMPORT_DATA_DIR", "MODELS_DIR", "CURRENT_MODEL_DIR",
     "MODEL_HISTORY_DIR", "BASE_MODEL_DIR", "RUNS_DIR", "TEST_IMAGE_FOLDER",
     "ACTIVE_LABEL_DIR", "WRONG_LABEL_DIR", "MERGED_DATASET_ROOT", "YOLO_DATASET_YAML", "MODEL_PATH",
-    "ORIGINAL_IMAGES", "ORIGINAL_LABELS", "UNCERTAIN_THRESHOLD", "IMG_SIZE",
-    "CLASS_FILE", "CLASS_NAMES", "CLASS_MAP", "CLASS_MAP_REVERSE", "SKIPPED_DIR"
+    "ORIGINAL_IMAGES", "ORIGINAL_LABELS", "UNCERTAIN_THRESHOLD", "IMG_SIZE", "MERGE_WORKERS",
+    "IMPORT_WORKERS", "CLASS_FILE", "CLASS_NAMES", "CLASS_MAP", "CLASS_MAP_REVERSE", "SKIPPED_DIR"
 ]
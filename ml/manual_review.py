@@ -18,17 +18,22 @@ if platform.system() == "Windows":
 from config_loader import *
 
 from glob import glob
+from utils.blob_store import blob_store
+from utils.model_registry import active_model_path, recommended_imgsz
+
+model_path = active_model_path()
+if model_path is None:
+    # runs trained before the registry existed
+    detect_weights = sorted(
+        glob("runs/detect/**/weights/best.pt", recursive=True),
+        key=lambda x: Path(x).stat().st_mtime,
+        reverse=True,
+    )
+    if not detect_weights:
+        print(" no trained model found in runs/detect")
+        exit()
+    model_path = Path(detect_weights[0])
 
-detect_weights = sorted(
-    glob("runs/detect/**/weights/best.pt", recursive=True),
-    key=lambda x: Path(x).stat().st_mtime,
-    reverse=True,
-)
-if not detect_weights:
-    print(" no trained model found in runs/detect")
-    exit()
-
-model_path = Path(detect_weights[0])
 print(f" using latest model: {model_path}")
 
 if not model_path.exists():
@@ -73,7 +78,7 @@ while current_index < len(image_paths):
 
     results = model.predict(
         source=str(img_path),
-        imgsz=960,
+        imgsz=recommended_imgsz(IMG_SIZE),
         conf=0.05,
         save=True,
         save_dir=str(SAVE_DIR),
@@ -157,7 +162,7 @@ while current_index < len(image_paths):
         elif ans in ["y", "yes"]:
             with open(ACTIVE_LABEL_DIR / f"{img_path.stem}.txt", "a") as f:
                 f.write(f"{int(cls_id)} {' '.join(map(str, box))}\n")
-            shutil.copy(str(img_path), MERGED_DATASET_ROOT / "images/train")
+            blob_store.materialize(img_path, MERGED_DATASET_ROOT / "images/train" / img_path.name)
             detected_labels.append(f"{label} ")
         elif ans in ["w", "wrong"]:
             detections.pop(idx)
@@ -169,7 +174,7 @@ while current_index < len(image_paths):
                     with open(ACTIVE_LABEL_DIR / f"{img_path.stem}.txt", "a") as f:
                         f.write(f"{int(cid)} {' '.join(map(str, b))}\n")
                     handled.add(i)
-            shutil.copy(str(img_path), MERGED_DATASET_ROOT / "images/train")
+            blob_store.materialize(img_path, MERGED_DATASET_ROOT / "images/train" / img_path.name)
             detected_labels.append(f"{label} class ")
         elif ans == "w1":
             to_remove = []
@@ -194,7 +199,7 @@ while current_index < len(image_paths):
                 for det in detections:
                     cls_id, _, box = det
                     f.write(f"{int(cls_id)} {' '.join(map(str, box))}\n")
-            shutil.copy(str(img_path), MERGED_DATASET_ROOT / "images/train")
+            blob_store.materialize(img_path, MERGED_DATASET_ROOT / "images/train" / img_path.name)
         else:
             print("No valid detections left. Keeping image without label.")
             label_file_path.unlink(missing_ok=True)
@@ -11,7 +11,9 @@ from config_loader import (
     ACTIVE_LABEL_DIR,
     MANUAL_REVIEW_DIR,
     UNCERTAIN_THRESHOLD,
+    IMG_SIZE,
 )
+from utils.model_registry import recommended_imgsz
 
 # === CONFIG ===
 model_path = MODEL_PATH
@@ -19,7 +21,7 @@ image_folder = TEST_IMAGE_FOLDER
 active_label_dir = ACTIVE_LABEL_DIR
 manual_review_dir = MANUAL_REVIEW_DIR
 uncertain_threshold = UNCERTAIN_THRESHOLD
-imgsz = 960  # optional: can move this to env if needed later
+imgsz = recommended_imgsz(IMG_SIZE)  # set by calibrate_imgsz.py, else IMG_SIZE
 
 # === Load model ===
 model = YOLO(model_path)
@@ -0,0 +1,213 @@
+"""
+File: blob_store.py
+
+Purpose:
+Content-addressed store for image bytes. Every image is kept once under
+data/blobs/<sha[:2]>/<sha>; dataset folders (review queue, yolo_merged,
+yolo_dataset) hold hardlinks to those blobs. A merge of N images becomes N
+link operations instead of N copies, and duplicate uploads share one file.
+Across filesystems (where hardlinks are impossible) files are reflinked when
+the filesystem supports it, else copied.
+
+Images are never rewritten in place: every writer replaces the directory
+entry (temp file + rename), so a shared inode is never modified through
+one of its links.
+
+A blob has one link (its own) between being stored and being linked into a
+dataset folder. gc() therefore shares a lock with the writers of this process
+and leaves blobs written within GC_GRACE_S alone (writers in other processes).
+
+Reads/Writes:
+- ML/data/blobs/
+
+Called by:
+- boost_merge_labels.py, manual_review.py, import_yolo_dataset_from_zip.py (materialize)
+- BE/services/ml_service.py (accept_batch negatives, flush/reset gc)
+- BE/services/upload_store.py, BE/routers/inference.py (dedupe uploads)
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+BLOB_DIR = ML_ROOT / "data" / "blobs"
+GC_GRACE_S = 60.0  # blobs written more recently than this are never collected
+
+_FICLONE = 0x40049409  # linux ioctl: share extents with another file (btrfs, xfs)
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tmp_for(dest: Path) -> Path:
+    return dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _clone_or_copy(src: Path, dest: Path):
+    """Reflink src to dest where the filesystem allows it, else a plain copy."""
+    if sys.platform.startswith("linux"):
+        try:
+            import fcntl
+
+            with open(src, "rb") as s, open(dest, "wb") as d:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            shutil.copystat(src, dest)
+            return
+        except (OSError, ImportError):
+            pass
+    shutil.copy2(src, dest)
+
+
+def link_or_copy(src: Path, dest: Path) -> str:
+    """
+    Make dest refer to src's bytes: hardlink, reflink or copy (in that order).
+    dest is replaced atomically. Returns the method used.
+    """
+    src, dest = Path(src), Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_for(dest)
+    try:
+        try:
+            os.link(src, tmp)
+            method = "link"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                raise
+            _clone_or_copy(src, tmp)
+            method = "copy"
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return method
+
+
+class BlobStore:
+    def __init__(self, root: Path = BLOB_DIR, gc_grace_s: float = GC_GRACE_S):
+        self.root = Path(root)
+        self.gc_grace_s = gc_grace_s
+        self._lock = threading.RLock()  # store-and-link of a writer vs. gc's check-and-unlink
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def has(self, sha256: str) -> bool:
+        return self.blob_path(sha256).exists()
+
+    def ingest(self, src: Path, sha256: str | None = None) -> str:
+        """Store src's bytes (linked when possible) and return their hash; no-op if already stored."""
+        src = Path(src)
+        sha256 = sha256 or file_sha256(src)
+        blob = self.blob_path(sha256)
+        with self._lock:
+            if not blob.exists():
+                link_or_copy(src, blob)
+        return sha256
+
+    def materialize(self, src: Path, dest: Path, sha256: str | None = None) -> str:
+        """
+        Place src's bytes at dest as a link to the blob store.
+        Skips the work when dest already is that blob (same inode).
+        """
+        dest = Path(dest)
+        with self._lock:
+            sha256 = self.ingest(src, sha256)
+            blob = self.blob_path(sha256)
+            try:
+                if os.path.samefile(blob, dest):
+                    return sha256
+            except OSError:
+                pass
+            link_or_copy(blob, dest)
+        return sha256
+
+    def adopt(self, path: Path, sha256: str | None = None) -> str:
+        """
+        Deduplicate a file that was just written: if its bytes are already stored,
+        path becomes a link to the existing blob; otherwise it seeds a new blob.
+        """
+        path = Path(path)
+        sha256 = sha256 or file_sha256(path)
+        blob = self.blob_path(sha256)
+        with self._lock:
+            if blob.exists():
+                try:
+                    if not os.path.samefile(blob, path):
+                        link_or_copy(blob, path)
+                except OSError:
+                    pass
+            else:
+                link_or_copy(path, blob)
+        return sha256
+
+    def write_bytes(self, dest: Path, data: bytes) -> str:
+        """Store data once and place it at dest; returns the sha256."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(sha256)
+        with self._lock:
+            if not blob.exists():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                tmp = _tmp_for(blob)
+                try:
+                    tmp.write_bytes(data)
+                    os.replace(tmp, blob)
+                except BaseException:
+                    tmp.unlink(missing_ok=True)
+                    raise
+            link_or_copy(blob, dest)
+        return sha256
+
+    def gc(self) -> int:
+        """
+        Delete blobs no dataset folder links to any more (link count 1).
+        Blobs copied across filesystems always look unreferenced and are
+        dropped too; that only costs a re-ingest on next use.
+        Blobs written within gc_grace_s are kept: another process may be about
+        to link them (mtime, not ctime: removing a dataset folder touches ctime).
+        """
+        removed = 0
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - self.gc_grace_s
+        with os.scandir(self.root) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as it:
+                    for e in it:
+                        if e.name.startswith("."):
+                            continue  # in-flight temp file
+                        try:
+                            with self._lock:
+                                st = e.stat() if e.is_file() else None
+                                if st and st.st_nlink <= 1 and st.st_mtime < cutoff:
+                                    os.unlink(e.path)
+                                    removed += 1
+                        except OSError:
+                            continue
+        return removed
+
+    def stats(self) -> dict:
+        blobs = size = 0
+        if self.root.exists():
+            for shard in self.root.iterdir():
+                if shard.is_dir():
+                    for f in shard.iterdir():
+                        blobs += 1
+                        size += f.stat().st_size
+        return {"blobs": blobs, "bytes": size}
+
+
+blob_store = BlobStore()
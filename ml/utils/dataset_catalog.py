@@ -0,0 +1,246 @@
+"""
+File: dataset_catalog.py
+
+Purpose:
+Embedded SQLite catalog of every image the project has seen: content hash,
+dimensions, lifecycle status, label source, per-class counts and the training
+runs it took part in. Services update it in transactions when they move or
+label files and query it (indexed by stem / status / hash) instead of globbing
+folders and probing extensions.
+
+Status values:
+- queued    ML/data/test_images (awaiting review)
+- reviewed  label saved to ML/active_labels, waiting for the merge
+- negative  marked wrong (ML/wrong_labels), waiting for the merge
+- skipped   ML/skipped_images
+- rejected  deleted from the queue
+- imported  ML/data/yolo_dataset (Label Studio import)
+- staged    ML/data/yolo_merged (next training set)
+
+Reads/Writes:
+- ML/data/catalog.db
+
+Called by:
+- BE/services/ml_service.py, BE/routers/project.py (review actions, uploads)
+- boost_merge_labels.py (merge), active_learning_pipeline.py (training runs)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from .image_dims import dimension_cache
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+CATALOG_PATH = ML_ROOT / "data" / "catalog.db"
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    name         TEXT PRIMARY KEY,
+    stem         TEXT NOT NULL,
+    path         TEXT,
+    sha256       TEXT,
+    width        INTEGER,
+    height       INTEGER,
+    status       TEXT NOT NULL,
+    label_source TEXT,
+    class_counts TEXT,
+    updated      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_stem ON images(stem);
+CREATE INDEX IF NOT EXISTS images_status ON images(status);
+CREATE INDEX IF NOT EXISTS images_sha ON images(sha256);
+CREATE TABLE IF NOT EXISTS image_runs (
+    name   TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    PRIMARY KEY (name, run_id)
+);
+CREATE INDEX IF NOT EXISTS image_runs_run ON image_runs(run_id);
+"""
+
+_FIELDS = ("path", "sha256", "width", "height", "status", "label_source", "class_counts")
+
+
+def label_class_counts(label_path: Path) -> dict:
+    """{class_id: instances} of a YOLO label file ({} for a negative / missing label)."""
+    counts = {}
+    try:
+        text = Path(label_path).read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return counts
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 5:
+            try:
+                cls = str(int(float(parts[0])))
+            except ValueError:
+                continue
+            counts[cls] = counts.get(cls, 0) + 1
+    return counts
+
+
+class DatasetCatalog:
+    """
+    Thread-safe handle on the catalog database.
+    why: WAL mode lets the backend and the pipeline subprocesses read and write
+    the same file; every state change is one transaction, so a crash never
+    leaves an image half-moved in the catalog.
+    """
+
+    def __init__(self, path: Path = CATALOG_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """One atomic unit of work: commits on success, rolls back on error."""
+        conn = self._conn()
+        with conn:
+            yield conn
+
+    # --- writes ---
+
+    def upsert(self, name: str, conn=None, **fields):
+        """
+        Insert or update one image. Only the given fields change; class_counts may be a dict.
+        Pass conn to join an outer transaction.
+        """
+        if "class_counts" in fields and isinstance(fields["class_counts"], dict):
+            fields["class_counts"] = json.dumps(fields["class_counts"])
+        if "path" in fields and fields["path"] is not None:
+            fields["path"] = str(fields["path"])
+        fields = {k: v for k, v in fields.items() if k in _FIELDS}
+        now = datetime.now().isoformat(timespec="seconds")
+        cols = ["name", "stem", "status", "updated"] + [k for k in fields if k != "status"]
+        values = [name, os.path.splitext(name)[0], fields.get("status", "queued"), now]
+        values += [fields[k] for k in cols[4:]]
+        updates = ", ".join(f"{k}=excluded.{k}" for k in ["updated", *fields])
+        sql = (
+            f"INSERT INTO images ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT(name) DO UPDATE SET {updates}"
+        )
+        if conn is not None:
+            conn.execute(sql, values)
+        else:
+            with self.transaction() as c:
+                c.execute(sql, values)
+
+    def upsert_many(self, rows: list):
+        """rows: [(name, {field: value})] in a single transaction."""
+        with self.transaction() as conn:
+            for name, fields in rows:
+                self.upsert(name, conn=conn, **fields)
+
+    def delete_status(self, status: str) -> int:
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM images WHERE status = ?", (status,)).rowcount
+
+    def clear(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM images")
+            conn.execute("DELETE FROM image_runs")
+
+    def mark_trained(self, run_id: str, status: str = "staged") -> int:
+        """Record that every image currently in `status` was part of training run run_id."""
+        with self.transaction() as conn:
+            return conn.execute(
+                "INSERT OR IGNORE INTO image_runs (name, run_id) SELECT name, ? FROM images WHERE status = ?",
+                (run_id, status),
+            ).rowcount
+
+    # --- queries ---
+
+    def get(self, name: str) -> dict | None:
+        row = self._conn().execute("SELECT * FROM images WHERE name = ?", (name,)).fetchone()
+        return self._row(row) if row else None
+
+    def find_stem(self, stem: str, statuses: tuple | None = None) -> dict | None:
+        """The image with this stem (optionally restricted to some statuses), via the stem index."""
+        sql, args = "SELECT * FROM images WHERE stem = ?", [stem]
+        if statuses:
+            sql += f" AND status IN ({', '.join('?' * len(statuses))})"
+            args += list(statuses)
+        row = self._conn().execute(sql + " ORDER BY updated DESC LIMIT 1", args).fetchone()
+        return self._row(row) if row else None
+
+    def by_status(self, status: str, limit: int | None = None, after: str | None = None) -> list:
+        sql, args = "SELECT * FROM images WHERE status = ?", [status]
+        if after:
+            sql += " AND name > ?"
+            args.append(after)
+        sql += " ORDER BY name"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [self._row(r) for r in self._conn().execute(sql, args)]
+
+    def find_hash(self, sha256: str) -> list:
+        return [self._row(r) for r in self._conn().execute("SELECT * FROM images WHERE sha256 = ?", (sha256,))]
+
+    def runs_of(self, name: str) -> list:
+        rows = self._conn().execute("SELECT run_id FROM image_runs WHERE name = ? ORDER BY run_id", (name,))
+        return [r[0] for r in rows]
+
+    def counts(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM images GROUP BY status")
+        return {status: n for status, n in rows}
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM images LIMIT 1").fetchone() is None
+
+    @staticmethod
+    def _row(row) -> dict:
+        out = dict(row)
+        out["class_counts"] = json.loads(out["class_counts"]) if out.get("class_counts") else {}
+        return out
+
+    # --- bootstrap ---
+
+    def sync_folder(self, folder: Path, status: str, labels_dir: Path | None = None,
+                    label_source: str | None = None) -> int:
+        """
+        Register images of a folder that the catalog does not know yet (one os.scandir,
+        one transaction). Used to adopt trees created before the catalog existed.
+        """
+        folder = Path(folder)
+        if not folder.exists():
+            return 0
+        known = {r[0] for r in self._conn().execute("SELECT name FROM images")}
+        rows = []
+        with os.scandir(folder) as it:
+            for e in it:
+                if not e.is_file() or e.name in known or os.path.splitext(e.name)[1].lower() not in IMAGE_EXTS:
+                    continue
+                fields = {"status": status, "path": e.path}
+                wh = dimension_cache.get(e.path)  # header read, no decode
+                if wh:
+                    fields["width"], fields["height"] = wh
+                if labels_dir is not None:
+                    fields["class_counts"] = label_class_counts(Path(labels_dir) / f"{os.path.splitext(e.name)[0]}.txt")
+                    fields["label_source"] = label_source
+                rows.append((e.name, fields))
+        if rows:
+            self.upsert_many(rows)
+            dimension_cache.save()
+        return len(rows)
+
+
+catalog = DatasetCatalog()
@@ -1,57 +1,30 @@
-import cv2
 from pathlib import Path
-import os
-import shutil
 
-def normalize_label_line(line, img_w, img_h):
-    parts = line.strip().split()
-    if len(parts) != 5:
-        return None
-    try:
-        cls, x, y, w, h = map(float, parts)
-        # If any value is > 1.0, it's definitely pixel based
-        if x > 1.0 or y > 1.0 or w > 1.0 or h > 1.0:
-            return f"{int(cls)} {x/img_w:.6f} {y/img_h:.6f} {w/img_w:.6f} {h/img_h:.6f}\n"
-        return line.strip() + "\n" # Already normalized
-    except:
-        return None
+from utils.image_dims import dimension_cache
+from utils.label_processing import process_folder
 
-def normalize_folder(images_dir, labels_dir):
+
+def normalize_folder(images_dir, labels_dir, workers=None):
+    """
+    Validate labels and convert pixel coordinates to normalized ones (see utils/label_processing.py).
+    Files unchanged since the previous pass are skipped; originals of rewritten files go to backup_pre_norm/.
+    """
     images_dir = Path(images_dir)
     labels_dir = Path(labels_dir)
     backup_dir = labels_dir / "backup_pre_norm"
-    backup_dir.mkdir(exist_ok=True)
 
     print(f"Checking coordinates in {labels_dir}...")
-    fixed = 0
-    for label_file in labels_dir.glob("*.txt"):
-        if label_file.name == "classes.txt": continue
-        
-        img_file = images_dir / (label_file.stem + ".jpg")
-        if not img_file.exists(): 
-            img_file = images_dir / (label_file.stem + ".png")
-        if not img_file.exists(): continue
-
-        img = cv2.imread(str(img_file))
-        if img is None: continue
-        h, w = img.shape[:2]
-
-        lines = label_file.read_text().splitlines()
-        new_lines = []
-        needs_fix = False
+    totals = process_folder(labels_dir, images_dir, backup_dir=backup_dir, workers=workers)
+    dimension_cache.prune()  # drop sizes of images that were moved or deleted
+    dimension_cache.save()
+    if totals["unresolved"]:
+        print(f"{totals['unresolved']} pixel-coordinate rows have no readable image and were left as is.")
+    print(
+        f"Finished normalization. Fixed {totals['fixed']} files "
+        f"({totals['skipped']} of {totals['files']} unchanged since the last pass)."
+    )
+    return totals
 
-        for line in lines:
-            norm = normalize_label_line(line, w, h)
-            if norm:
-                if norm != line.strip() + "\n":
-                    needs_fix = True
-                new_lines.append(norm)
 
-        if needs_fix:
-            shutil.copy2(label_file, backup_dir / label_file.name)
-            label_file.write_text("".join(new_lines))
-            fixed += 1
-    
-    print(f"Finished normalization. Fixed {fixed} files.")
 if __name__ == "__main__":
     print("This file contains logic methods and shouldn't be executed directly. Route through fix_non_normalized_labels.py instead.")
@@ -0,0 +1,202 @@
+"""
+File: image_dims.py
+
+Purpose:
+Image width/height without decoding pixels. JPEG, PNG and BMP sizes are read
+from the file header (a few hundred bytes); JPEG EXIF orientation is applied
+the way cv2.imread applies it, so sizes match what training and inference
+see. Other formats fall back to cv2. Results are cached persistently as
+path -> (size, mtime_ns, w, h), so a size is probed once per file version.
+
+Reads/Writes:
+- ML/data/image_dims.json
+
+Called by:
+- utils/label_processing.py (pixel -> normalized coordinates)
+- utils/dataset_catalog.py (image rows)
+- BE/services/ml_service.py (annotations saved without a size)
+"""
+
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+DIMS_PATH = ML_ROOT / "data" / "image_dims.json"
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic); not DHT/JPG/DAC
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _exif_orientation(data: bytes) -> int:
+    """Orientation tag (1-8) from an APP1 Exif payload, 1 if absent."""
+    if not data.startswith(b"Exif\x00\x00") or len(data) < 14:
+        return 1
+    tiff = data[6:]
+    endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if endian is None:
+        return 1
+    try:
+        (ifd,) = struct.unpack(endian + "I", tiff[4:8])
+        (count,) = struct.unpack(endian + "H", tiff[ifd:ifd + 2])
+        for i in range(count):
+            entry = tiff[ifd + 2 + 12 * i: ifd + 14 + 12 * i]
+            tag, typ = struct.unpack(endian + "HH", entry[:4])
+            if tag == 0x0112:
+                return struct.unpack(endian + "H", entry[8:10])[0]
+    except struct.error:
+        pass
+    return 1
+
+
+def _jpeg_size(f):
+    orientation = 1
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0x01, *range(0xD0, 0xD8)):
+            continue  # no payload
+        if marker in (0xD9, 0xDA):
+            return None  # end of image / scan data before any frame header
+        (length,) = struct.unpack(">H", f.read(2))
+        if marker in _SOF:
+            h, w = struct.unpack(">xHH", f.read(5))
+            # orientations 5-8 rotate by 90 degrees: cv2.imread swaps width and height
+            return (h, w) if orientation >= 5 else (w, h)
+        payload = f.read(length - 2)
+        if marker == 0xE1:
+            orientation = _exif_orientation(payload)
+
+
+def probe_size(path):
+    """(width, height) from the header, or via cv2 for formats not parsed here; None if unreadable."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(26)
+            if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:2] == b"\xff\xd8":
+                size = _jpeg_size(f)
+                if size:
+                    return size
+            elif head[:2] == b"BM" and len(head) >= 26:
+                w, h = struct.unpack("<ii", head[18:26])
+                return w, abs(h)
+    except (OSError, struct.error):
+        return None
+    try:
+        import cv2
+
+        img = cv2.imread(str(path))
+    except ImportError:
+        return None
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    return w, h
+
+
+class DimensionCache:
+    """
+    Persistent (path, size, mtime) -> (w, h) cache.
+    why: dimensions were obtained by decoding whole images on every training run.
+    """
+
+    def __init__(self, path: Path = DIMS_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = None  # abs path -> [size, mtime_ns, w, h]
+        self._dirty = False
+        self._timer = None  # pending save_soon()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self._entries = data if isinstance(data, dict) else {}
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+    def cached(self, path):
+        """(w, h) if known for the current file version, else None (no probing)."""
+        try:
+            key, size, mtime = self._stamp(path)
+        except OSError:
+            return None
+        with self._lock:
+            rec = self._load().get(key)
+        if rec and rec[0] == size and rec[1] == mtime:
+            return rec[2], rec[3]
+        return None
+
+    def put(self, path, wh):
+        try:
+            key, size, mtime = self._stamp(path)
+        except OSError:
+            return
+        with self._lock:
+            self._load()[key] = [size, mtime, int(wh[0]), int(wh[1])]
+            self._dirty = True
+
+    def get(self, path):
+        """(w, h) of an image: cached, else probed from its header and cached."""
+        wh = self.cached(path)
+        if wh is None:
+            wh = probe_size(path)
+            if wh:
+                self.put(path, wh)
+        return wh
+
+    def prune(self):
+        """Forget images that no longer exist."""
+        with self._lock:
+            entries = self._load()
+            for key in [k for k in entries if not os.path.exists(k)]:
+                del entries[key]
+                self._dirty = True
+
+    def save_soon(self, delay: float = 30.0):
+        """Save within delay seconds: any number of puts in between cost one write."""
+        with self._lock:
+            if self._timer is not None or not self._dirty:
+                return
+            self._timer = threading.Timer(delay, self._timed_save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_save(self):
+        with self._lock:
+            self._timer = None
+        self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries)
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+dimension_cache = DimensionCache()
@@ -0,0 +1,290 @@
+"""
+File: label_processing.py
+
+Purpose:
+One place for YOLO label validation and normalization. Rows of a file are
+grouped by token count and converted to float arrays in bulk, then checked
+and fixed per group with NumPy:
+- 5 values       box       cls cx cy w h
+- 6 values       OBB       cls cx cy w h angle
+- odd, >= 7      polygon   cls x1 y1 x2 y2 ... (4 points = OBB corners)
+Rows that are not numeric, have a negative / fractional class, a degenerate
+box or an unpaired coordinate are dropped. Pixel coordinates (> 1) are
+divided by the image size, read from the image header (utils/image_dims.py)
+only for files that have such rows. A row counts as pixels only when it is
+clearly pixel-scale (a value > 2 and none in (0, 1)); normalized values slightly
+outside [0, 1] are clipped instead. Optionally 4-point polygons are converted to
+cx cy w h angle.
+
+Only files whose content changed since the previous pass are processed:
+each pass records (size, mtime_ns, blake2b) per file. Files are processed
+in parallel across cores.
+
+Reads/Writes:
+- label folders (rewritten in place only when a row was dropped or fixed)
+- ML/data/label_cache.json
+
+Called by:
+- utils/merge_engine.py (after merging)
+- utils/fix_non_normalized_labels_logic.py (normalize_folder)
+- utils/convert_polygon_to_obb.py (convert_labels)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from utils.image_dims import dimension_cache, probe_size
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+CACHE_PATH = ML_ROOT / "data" / "label_cache.json"
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+PARALLEL_MIN = 64  # below this many files a process pool costs more than it saves
+PIXEL_MIN = 2.0  # a row is pixel-scale only above this value (and with no fraction in (0, 1))
+CLIP_TOL = 0.01  # normalized values this far outside [0, 1] are clipped back
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _to_float(raw: np.ndarray) -> np.ndarray:
+    """Bulk str -> float conversion; tokens that are not numbers become NaN."""
+    try:
+        return raw.astype(np.float64)
+    except ValueError:
+        out = np.full(raw.shape, np.nan)
+        for idx, tok in np.ndenumerate(raw):
+            try:
+                out[idx] = float(tok)
+            except ValueError:
+                pass
+        return out
+
+
+def polygons_to_obb(poly: np.ndarray):
+    """
+    (N, 8) corner points -> (N, 5) cx cy w h angle(deg, in [-90, 90]) and a mask of
+    non-degenerate rows. Width follows the first edge, height the second.
+    """
+    p = poly.reshape(-1, 4, 2)
+    e1 = p[:, 1] - p[:, 0]
+    e2 = p[:, 2] - p[:, 1]
+    w = np.hypot(e1[:, 0], e1[:, 1])
+    h = np.hypot(e2[:, 0], e2[:, 1])
+    ok = (w >= 1e-5) & (h >= 1e-5)
+    c = p.mean(axis=1)
+    angle = np.degrees(np.arctan2(e1[:, 1], e1[:, 0]))
+    angle = np.where(angle < -90, angle + 180, np.where(angle > 90, angle - 180, angle))
+    return np.column_stack([c, w, h, angle]), ok
+
+
+def _fmt(cls: float, values) -> str:
+    return f"{int(cls)} " + " ".join(f"{v:.6f}" for v in values)
+
+
+def process_text(text: str, size=None, to_obb: bool = False, normalize: bool = True):
+    """
+    Validate / normalize one label file's text.
+    size: (width, height) or a callable returning it (only called when pixel rows exist).
+    normalize: convert pixel-scale rows; when False they are kept as they are.
+    Returns (new_text | None if nothing changed, counts).
+    """
+    lines = text.splitlines()
+    groups = {}
+    for i, line in enumerate(lines):
+        toks = line.split()
+        if toks:
+            groups.setdefault(len(toks), []).append((i, toks))
+
+    out = {}  # line index -> text
+    counts = {"rows": 0, "dropped": 0, "normalized": 0, "clipped": 0, "converted": 0, "unresolved": 0}
+    changed = any(not line.strip() for line in lines)
+    for n, rows in groups.items():
+        counts["rows"] += len(rows)
+        is_box, is_obb, is_poly = n == 5, n == 6, n >= 7 and n % 2 == 1
+        if not (is_box or is_obb or is_poly) or (to_obb and not (is_obb or n == 9)):
+            counts["dropped"] += len(rows)
+            changed = True
+            continue
+        idx = np.fromiter((i for i, _ in rows), dtype=np.int64, count=len(rows))
+        vals = _to_float(np.array([t for _, t in rows]))
+        cls = vals[:, 0]
+        coords = vals[:, 1:5] if not is_poly else vals[:, 1:]
+        valid = np.isfinite(vals).all(axis=1) & (cls >= 0) & (cls == np.floor(cls))
+        if not is_poly:
+            valid &= (vals[:, 3] > 0) & (vals[:, 4] > 0)
+        fixed = np.zeros(len(rows), dtype=bool)
+
+        # pixel-scale only when clearly so: large values and nothing fractional in (0, 1)
+        pixel = valid & (coords.max(axis=1) > PIXEL_MIN) & ~((coords > 0) & (coords < 1)).any(axis=1)
+        if pixel.any() and normalize:
+            wh = size() if callable(size) else size
+            if wh:
+                scale = np.tile([wh[0], wh[1]], coords.shape[1] // 2)
+                coords[pixel] = coords[pixel] / scale
+                fixed |= pixel
+                counts["normalized"] += int(pixel.sum())
+            else:
+                counts["unresolved"] += int(pixel.sum())
+        elif pixel.any():
+            counts["unresolved"] += int(pixel.sum())
+
+        # normalized rows that drifted slightly out of range are clipped, never rescaled
+        outside = valid & ~fixed & ((coords < 0) | (coords > 1)).any(axis=1)
+        near = outside & ((coords >= -CLIP_TOL) & (coords <= 1 + CLIP_TOL)).all(axis=1)
+        if near.any():
+            coords[near] = np.clip(coords[near], 0.0, 1.0)
+            fixed |= near
+            counts["clipped"] += int(near.sum())
+        counts["unresolved"] += int((outside & ~near & ~pixel).sum())
+
+        if to_obb and n == 9:
+            obb, ok = polygons_to_obb(vals[:, 1:])
+            valid &= ok
+            counts["converted"] += int(valid.sum())
+            for j in np.flatnonzero(valid):
+                out[idx[j]] = _fmt(cls[j], obb[j])
+            changed = True
+        else:
+            for j in np.flatnonzero(valid):
+                out[idx[j]] = _fmt(cls[j], vals[j, 1:]) if fixed[j] else lines[idx[j]].strip()
+            changed |= bool(fixed.any())
+        dropped = int((~valid).sum())
+        counts["dropped"] += dropped
+        changed |= dropped > 0
+
+    if not changed:
+        return None, counts
+    return "\n".join(out[i] for i in sorted(out)) + ("\n" if out else ""), counts
+
+
+def process_file(label_path: str, image_path: str | None, image_wh, to_obb: bool, backup_dir: str | None,
+                 known_hash: str | None, normalize: bool = True):
+    """
+    Process one label file (runs in a worker process). Skips the work when the content
+    hash equals known_hash. image_wh is the cached image size; without it the size is
+    probed from the image header, and only if the file has pixel coordinates.
+    Returns (name, [size, mtime_ns, hash] | None, counts | None, probed (w, h) | None);
+    the record is None when rows stayed unresolved, so the next pass looks at the file again
+    (e.g. once its image arrives and the pixel rows can be normalized).
+    """
+    path = Path(label_path)
+    data = path.read_bytes()
+    digest = content_hash(data)
+    counts = None
+    probed = []
+
+    def size():
+        if image_wh or not image_path:
+            return image_wh
+        probed.append(probe_size(image_path))
+        return probed[0]
+
+    if digest != known_hash:
+        new_text, counts = process_text(data.decode("utf-8", errors="ignore"), size, to_obb, normalize)
+        if new_text is not None:
+            if backup_dir:
+                Path(backup_dir).mkdir(parents=True, exist_ok=True)
+                shutil.copy2(path, Path(backup_dir) / path.name)
+            data = new_text.encode("utf-8")
+            tmp = path.with_name(f".{path.name}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            digest = content_hash(data)
+            counts["fixed"] = 1
+    if counts and counts["unresolved"]:
+        return path.name, None, counts, (probed[0] if probed else None)
+    st = path.stat()
+    return path.name, [st.st_size, st.st_mtime_ns, digest], counts, (probed[0] if probed else None)
+
+
+def _load_cache() -> dict:
+    try:
+        data = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(data: dict):
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, CACHE_PATH)
+
+
+def process_folder(labels_dir, images_dir=None, to_obb: bool = False, backup_dir=None,
+                   names=None, workers: int | None = None, normalize: bool = True) -> dict:
+    """
+    Validate and normalize every changed label file of labels_dir.
+    names restricts the pass to some files (e.g. the ones a merge just wrote).
+    normalize=False only drops corrupt rows and clips near-range values (no pixel conversion).
+    Returns totals: files, skipped, fixed, rows, dropped, normalized, clipped, converted, unresolved.
+    """
+    labels_dir = Path(labels_dir)
+    mode = "obb" if to_obb else ("norm" if normalize else "clean")
+    key = f"{mode}|{labels_dir.resolve()}"
+    cache = _load_cache()
+    known = cache.get(key, {})
+
+    images = {}
+    if images_dir is not None and Path(images_dir).exists():
+        with os.scandir(images_dir) as it:
+            for e in it:
+                stem, ext = os.path.splitext(e.name)
+                if ext.lower() in IMAGE_EXTS:
+                    images.setdefault(stem, e.path)
+
+    jobs, present = [], set()
+    totals = {"files": 0, "skipped": 0, "fixed": 0, "rows": 0, "dropped": 0,
+              "normalized": 0, "clipped": 0, "converted": 0, "unresolved": 0}
+    if labels_dir.exists():
+        with os.scandir(labels_dir) as it:
+            for e in it:
+                if not e.name.endswith(".txt") or e.name == "classes.txt" or e.name.startswith("."):
+                    continue
+                present.add(e.name)
+                if names is not None and e.name not in names:
+                    continue
+                totals["files"] += 1
+                st = e.stat()
+                rec = known.get(e.name)
+                if rec and rec[0] == st.st_size and rec[1] == st.st_mtime_ns:
+                    totals["skipped"] += 1
+                    continue
+                image = images.get(e.name[:-4])
+                jobs.append((e.path, image, dimension_cache.cached(image) if image else None, to_obb,
+                             str(backup_dir) if backup_dir else None, rec[2] if rec else None, normalize))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) >= PARALLEL_MIN:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(process_file, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [process_file(*job) for job in jobs]
+
+    for job, (name, rec, counts, probed) in zip(jobs, results):
+        if rec is None:
+            known.pop(name, None)
+        else:
+            known[name] = rec
+        if probed:
+            dimension_cache.put(job[1], probed)
+        if counts is None:
+            totals["skipped"] += 1
+            continue
+        for k, v in counts.items():
+            totals[k] += v
+    for name in [n for n in known if n not in present]:
+        del known[name]
+    cache[key] = known
+    _save_cache(cache)
+    dimension_cache.save()
+    return totals
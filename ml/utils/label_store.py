@@ -0,0 +1,357 @@
+"""
+File: label_store.py
+
+Purpose:
+Columnar, memory-mapped copy of a YOLO label folder for fast analysis.
+The .txt files stay the interchange format; this store mirrors them as
+NumPy arrays so stats, pairing checks and class discovery do not open
+thousands of small files:
+- image_id  (rows,)     int32    index into the image stem list
+- class_id  (rows,)     int32
+- boxes     (rows, 4)   float32  cx cy w h (polygons: their bounding box)
+- offsets   (rows + 1,) int64    row i's raw values are coords[offsets[i]:offsets[i+1]]
+- coords    (values,)   float32  box, OBB or polygon values as written
+- image_offsets (images + 1,)    image j's rows are [image_offsets[j], image_offsets[j+1])
+Rows are sorted by image, so a per-image lookup is two array reads.
+
+refresh() re-parses only label files whose (size, mtime) changed; the arrays
+are rewritten into a new generation folder and published by replacing the
+manifest, so readers holding the previous memory maps are never disturbed.
+
+Reads/Writes:
+- a label folder (read only)
+- ML/data/label_store/<name>/
+
+Called by:
+- active_learning_pipeline.py (Step 6 pairing check)
+- BE/services/ml_service.py (staged box statistics, class discovery)
+"""
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+STORE_ROOT = ML_ROOT / "data" / "label_store"
+
+_ARRAYS = ("image_id", "class_id", "boxes", "offsets", "coords", "image_offsets")
+
+
+def parse_rows(text: str):
+    """
+    Rows of one label file as (class_id (k,), lengths (k,), coords (sum(lengths),)).
+    Rows are grouped by token count and converted in bulk; non-numeric rows and rows
+    whose class is negative or not an integer are skipped.
+    """
+    groups = {}
+    for i, line in enumerate(text.splitlines()):
+        toks = line.split()
+        if len(toks) >= 5:
+            groups.setdefault(len(toks), []).append((i, toks))
+    order, cls, lens, vals = [], [], [], []
+    for n, rows in groups.items():
+        try:
+            arr = np.array([t for _, t in rows]).astype(np.float64)
+        except ValueError:
+            good = []
+            for i, t in rows:
+                try:
+                    good.append((i, [float(x) for x in t]))
+                except ValueError:
+                    pass
+            if not good:
+                continue
+            rows = good
+            arr = np.array([t for _, t in good], dtype=np.float64)
+        ok = np.isfinite(arr).all(axis=1) & (arr[:, 0] >= 0) & (arr[:, 0] == np.floor(arr[:, 0]))
+        idx = [i for (i, _), keep in zip(rows, ok) if keep]
+        arr = arr[ok]
+        order.extend(idx)
+        cls.append(arr[:, 0].astype(np.int32))
+        lens.extend([n - 1] * len(arr))
+        vals.extend(arr[:, 1:])
+    if not order:
+        return np.zeros(0, np.int32), np.zeros(0, np.int64), np.zeros(0, np.float32)
+    perm = np.argsort(np.asarray(order), kind="stable")
+    cls = np.concatenate(cls)[perm]
+    lens = np.asarray(lens, dtype=np.int64)[perm]
+    coords = np.concatenate([vals[j] for j in perm]).astype(np.float32)
+    return cls, lens, coords
+
+
+def _gather(offsets: np.ndarray, coords: np.ndarray, rows: np.ndarray):
+    """coords of the selected rows (in the given order) and their new offsets."""
+    starts = offsets[:-1][rows]
+    lens = offsets[1:][rows] - starts
+    new_off = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lens, out=new_off[1:])
+    idx = np.arange(new_off[-1], dtype=np.int64) - np.repeat(new_off[:-1] - starts, lens)
+    return coords[idx], new_off
+
+
+def _boxes(offsets: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    """cx cy w h per row: box / OBB rows directly, polygons via min/max of their points."""
+    n = len(offsets) - 1
+    out = np.zeros((n, 4), dtype=np.float32)
+    if n == 0:
+        return out
+    lens = np.diff(offsets)
+    direct = lens <= 5
+    if direct.any():
+        rows = np.flatnonzero(direct)
+        out[rows] = coords[offsets[:-1][rows][:, None] + np.arange(4)]
+    poly = np.flatnonzero(~direct & (lens % 2 == 0))  # rows with an unpaired value keep a zero box
+    if len(poly):
+        pts, off = _gather(offsets, coords, poly)
+        owner = np.repeat(np.arange(len(poly)), np.diff(off) // 2)
+        xy = pts[: len(owner) * 2].reshape(-1, 2)
+        lo = np.full((len(poly), 2), np.inf, dtype=np.float32)
+        hi = np.full((len(poly), 2), -np.inf, dtype=np.float32)
+        np.minimum.at(lo, owner, xy)
+        np.maximum.at(hi, owner, xy)
+        out[poly, :2] = (lo + hi) / 2
+        out[poly, 2:] = hi - lo
+    return out
+
+
+class LabelStore:
+    def __init__(self, labels_dir: Path, name: str | None = None, root: Path = STORE_ROOT):
+        self.labels_dir = Path(labels_dir)
+        self.dir = Path(root) / (name or self.labels_dir.parent.parent.name or "labels")
+        self.manifest_path = self.dir / "manifest.json"
+        self._lock = threading.RLock()
+        self._gen = None  # (generation, folder) currently mapped
+        self._box_stats = None  # (generation, box_stats()) of the mapped arrays
+        self.stems = []
+        self.stamps = []
+        self._index = {}
+        self._empty()
+
+    def _empty(self):
+        self.image_id = np.zeros(0, np.int32)
+        self.class_id = np.zeros(0, np.int32)
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.offsets = np.zeros(1, np.int64)
+        self.coords = np.zeros(0, np.float32)
+        self.image_offsets = np.zeros(len(self.stems) + 1, np.int64)
+
+    # --- persistence ---
+
+    def load(self):
+        """Map the published generation (no-op if it is already mapped)."""
+        with self._lock:
+            try:
+                manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return
+            if self._gen and manifest.get("dir") == self._gen[1]:
+                return
+            gen_dir = self.dir / manifest["dir"]
+            try:
+                arrays = {}
+                for key in _ARRAYS:
+                    try:
+                        arrays[key] = np.load(gen_dir / f"{key}.npy", mmap_mode="r")
+                    except ValueError:  # empty arrays cannot be memory-mapped
+                        arrays[key] = np.load(gen_dir / f"{key}.npy")
+            except OSError:
+                return
+            self.stems, self.stamps = manifest["stems"], manifest["stamps"]
+            self._index = {s: i for i, s in enumerate(self.stems)}
+            for key, arr in arrays.items():
+                setattr(self, key, arr)
+            self._gen = (manifest["gen"], manifest["dir"])
+
+    def _publish(self):
+        gen = (self._gen[0] if self._gen else 0) + 1
+        # the pid keeps two processes publishing the same generation apart
+        gen_dir = self.dir / f"gen-{gen}-{os.getpid()}"
+        gen_dir.mkdir(parents=True, exist_ok=True)
+        for key in _ARRAYS:
+            np.save(gen_dir / f"{key}.npy", np.ascontiguousarray(getattr(self, key)))
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        manifest = {"gen": gen, "dir": gen_dir.name, "stems": self.stems, "stamps": self.stamps}
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+        self._gen = None
+        self.load()
+        for old in self.dir.glob("gen-*"):
+            if old.name != gen_dir.name:
+                shutil.rmtree(old, ignore_errors=True)  # still-mapped files (Windows) go next time
+
+    # --- incremental rebuild ---
+
+    def refresh(self) -> int:
+        """Diff the folder against the stored stamps (one os.scandir) and apply the changes."""
+        seen = {}
+        if self.labels_dir.exists():
+            with os.scandir(self.labels_dir) as it:
+                for e in it:
+                    if e.name.endswith(".txt") and e.name != "classes.txt" and not e.name.startswith("."):
+                        st = e.stat()
+                        seen[e.name[:-4]] = [st.st_size, st.st_mtime_ns]
+        with self._lock:
+            self.load()
+            changed = [s for s, stamp in seen.items()
+                       if s not in self._index or self.stamps[self._index[s]] != stamp]
+            removed = [s for s in self.stems if s not in seen]
+            if not changed and not removed:
+                return 0
+            self._apply({s: seen[s] for s in changed}, removed)
+            return len(changed) + len(removed)
+
+    def update(self, paths) -> int:
+        """Apply a known set of written (or deleted) label files without scanning the folder."""
+        changed, removed = {}, []
+        for p in map(Path, paths):
+            try:
+                st = p.stat()
+                changed[p.stem] = [st.st_size, st.st_mtime_ns]
+            except OSError:
+                removed.append(p.stem)
+        with self._lock:
+            self.load()
+            removed = [s for s in removed if s in self._index]
+            if changed or removed:
+                self._apply(changed, removed)
+        return len(changed) + len(removed)
+
+    def _apply(self, changed: dict, removed: list):
+        parsed = {}
+        for stem in changed:
+            try:
+                text = (self.labels_dir / f"{stem}.txt").read_text(encoding="utf-8", errors="ignore")
+            except OSError:
+                removed.append(stem)
+                continue
+            parsed[stem] = parse_rows(text)
+        changed = {s: v for s, v in changed.items() if s in parsed}
+
+        # image ids: removed stems disappear, the others keep their relative order, new ones append
+        drop = set(removed)
+        keep_ids = [i for i, s in enumerate(self.stems) if s not in drop]
+        remap = np.full(len(self.stems) + 1, -1, dtype=np.int64)
+        remap[keep_ids] = np.arange(len(keep_ids))
+        stems = [self.stems[i] for i in keep_ids]
+        stamps = [self.stamps[i] for i in keep_ids]
+        index = {s: i for i, s in enumerate(stems)}
+        for stem, stamp in changed.items():
+            if stem in index:
+                stamps[index[stem]] = stamp
+            else:
+                index[stem] = len(stems)
+                stems.append(stem)
+                stamps.append(stamp)
+
+        # rows of unchanged images survive, rows of changed / removed images are replaced
+        stale = np.asarray([self._index[s] for s in list(changed) + list(drop) if s in self._index], dtype=np.int64)
+        keep = ~np.isin(np.asarray(self.image_id, dtype=np.int64), stale)
+        rows = np.flatnonzero(keep)
+        kept_coords, kept_off = _gather(np.asarray(self.offsets), np.asarray(self.coords), rows)
+        image_id = [remap[np.asarray(self.image_id)[rows]].astype(np.int32)]
+        class_id = [np.asarray(self.class_id)[rows]]
+        boxes = [np.asarray(self.boxes)[rows]]
+        lens = [np.diff(kept_off)]
+        coords = [kept_coords]
+        for stem, (cls, ln, vals) in parsed.items():
+            image_id.append(np.full(len(cls), index[stem], dtype=np.int32))
+            class_id.append(cls)
+            off = np.zeros(len(ln) + 1, dtype=np.int64)
+            np.cumsum(ln, out=off[1:])
+            boxes.append(_boxes(off, vals))
+            lens.append(ln)
+            coords.append(vals)
+
+        image_id = np.concatenate(image_id)
+        order = np.argsort(image_id, kind="stable")
+        lens = np.concatenate(lens)
+        offsets = np.zeros(len(lens) + 1, dtype=np.int64)
+        np.cumsum(lens, out=offsets[1:])
+        self.coords, self.offsets = _gather(offsets, np.concatenate(coords), order)
+        self.image_id = image_id[order]
+        self.class_id = np.concatenate(class_id).astype(np.int32)[order]
+        self.boxes = np.concatenate(boxes).astype(np.float32)[order]
+        counts = np.bincount(self.image_id, minlength=len(stems))
+        self.image_offsets = np.zeros(len(stems) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.image_offsets[1:])
+        self.stems, self.stamps, self._index = stems, stamps, index
+        self._publish()
+
+    # --- queries ---
+
+    def __len__(self) -> int:
+        return len(self.class_id)
+
+    def rows_for(self, stem: str) -> list:
+        """[(class_id, [values...])] of one image, straight from the arrays."""
+        i = self._index.get(stem)
+        if i is None:
+            return []
+        lo, hi = self.image_offsets[i], self.image_offsets[i + 1]
+        return [
+            (int(self.class_id[r]), self.coords[self.offsets[r]:self.offsets[r + 1]].tolist())
+            for r in range(lo, hi)
+        ]
+
+    def nonempty_stems(self) -> list:
+        """Stems whose label file has at least one row (positives)."""
+        counts = np.diff(self.image_offsets)
+        return [self.stems[i] for i in np.flatnonzero(counts)]
+
+    def negatives(self) -> int:
+        return int((np.diff(self.image_offsets) == 0).sum())
+
+    def class_ids(self) -> list:
+        return np.unique(self.class_id).tolist()
+
+    def class_histogram(self) -> dict:
+        """{class_id: instances}."""
+        counts = np.bincount(self.class_id) if len(self.class_id) else np.zeros(0, np.int64)
+        return {int(c): int(n) for c, n in enumerate(counts) if n}
+
+    def images_per_class(self) -> dict:
+        """{class_id: images containing it}."""
+        if not len(self.class_id):
+            return {}
+        k = int(self.class_id.max()) + 1
+        pairs = np.unique(self.image_id.astype(np.int64) * k + self.class_id)
+        counts = np.bincount(pairs % k, minlength=k)
+        return {int(c): int(n) for c, n in enumerate(counts) if n}
+
+    def box_stats(self) -> dict:
+        """
+        Per class: instances and mean / median / p10 / p90 of box width, height, area and aspect (w/h).
+        Computed once per published generation; polling between label changes costs a lookup.
+        """
+        with self._lock:
+            cached = self._box_stats
+            if cached is not None and self._gen is not None and cached[0] == self._gen:
+                return cached[1]
+            out = self._compute_box_stats()
+            if self._gen is not None:
+                self._box_stats = (self._gen, out)
+            return out
+
+    def _compute_box_stats(self) -> dict:
+        out = {}
+        if not len(self.class_id):
+            return out
+        w, h = np.asarray(self.boxes[:, 2], np.float64), np.asarray(self.boxes[:, 3], np.float64)
+        metrics = {"w": w, "h": h, "area": w * h, "aspect": np.divide(w, h, out=np.zeros_like(w), where=h > 0)}
+        order = np.argsort(self.class_id, kind="stable")
+        cls_sorted = np.asarray(self.class_id)[order]
+        bounds = np.flatnonzero(np.diff(cls_sorted)) + 1
+        for group in np.split(order, bounds):
+            cid = int(self.class_id[group[0]])
+            stats = {"instances": int(len(group))}
+            for key, values in metrics.items():
+                v = values[group]
+                p10, p50, p90 = np.percentile(v, [10, 50, 90])
+                stats[key] = {"mean": round(float(v.mean()), 5), "median": round(float(p50), 5),
+                              "p10": round(float(p10), 5), "p90": round(float(p90), 5)}
+            out[cid] = stats
+        return out
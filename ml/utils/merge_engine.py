@@ -0,0 +1,316 @@
+"""
+File: merge_engine.py
+
+Purpose:
+Incremental merge of reviewed annotations into the staged training set
+(yolo_merged). Every directory involved is listed once into stem -> name
+maps; membership checks are set lookups instead of exists() probes per
+extension. A merge journal records directory mtimes, so a merge only touches:
+- originals, when the import folders changed since the last merge
+- the new reviews in active_labels / wrong_labels
+- label files written by the merge (validation pass, utils/label_processing.py)
+File link/copy operations run in a thread pool.
+
+Reads/Writes:
+- ML/data/yolo_merged/ (images linked from the blob store)
+- ML/data/merge_journal.json
+- ML/data/catalog.db, ML/data/staged_stats.json
+
+Called by:
+- boost_merge_labels.py
+"""
+
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.blob_store import blob_store
+from utils.dataset_catalog import catalog, label_class_counts
+from utils.label_processing import process_folder
+from utils.staged_stats import StagedStats
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+JOURNAL_PATH = ML_ROOT / "data" / "merge_journal.json"
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def list_dir(folder: Path, exts: set | None = None) -> dict:
+    """{stem: name} of the files in folder, from a single os.scandir."""
+    out = {}
+    if not folder.exists():
+        return out
+    with os.scandir(folder) as it:
+        for e in it:
+            if e.name.startswith("."):
+                continue  # temp / part files
+            stem, ext = os.path.splitext(e.name)
+            if exts is not None and ext.lower() not in exts:
+                continue
+            if e.is_file():
+                out[stem] = e.name
+    return out
+
+
+def _mtime_ns(folder: Path) -> int | None:
+    try:
+        return folder.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class MergeEngine:
+    def __init__(self, merged_root: Path, original_images: Path, original_labels: Path,
+                 queue_dir: Path, active_dir: Path, wrong_dir: Path, workers: int = 8,
+                 journal_path: Path = JOURNAL_PATH):
+        self.merged_root = Path(merged_root)
+        self.images_dir = self.merged_root / "images" / "train"
+        self.labels_dir = self.merged_root / "labels" / "train"
+        self.original_images = Path(original_images)
+        self.original_labels = Path(original_labels)
+        self.queue_dir = Path(queue_dir)
+        self.active_dir = Path(active_dir)
+        self.wrong_dir = Path(wrong_dir)
+        self.workers = max(1, workers)
+        self.journal_path = Path(journal_path)
+        self.journal = self._load_journal()
+        self._queue = None  # stem -> name, listed on first catalog miss
+        self.staged_rows = []
+        self.touched_images = []
+        self.touched_labels = []
+        self.counts = {"original": 0, "review": 0, "recovered": 0, "negative": 0, "fixed": 0, "missing": 0}
+
+    # --- journal ---
+
+    def _load_journal(self) -> dict:
+        try:
+            data = json.loads(self.journal_path.read_text(encoding="utf-8"))
+            if isinstance(data, dict):
+                return data
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_journal(self):
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.journal_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.journal), encoding="utf-8")
+        os.replace(tmp, self.journal_path)
+
+    # --- helpers ---
+
+    def _queued_image(self, stem: str):
+        """Review-queue image for a label stem as (path, sha256 | None): catalog first, listing second."""
+        row = catalog.find_stem(stem, ("queued", "reviewed", "negative"))
+        if row and row["path"] and Path(row["path"]).exists():
+            return Path(row["path"]), row["sha256"]
+        if self._queue is None:
+            self._queue = list_dir(self.queue_dir, IMAGE_EXTS)
+        name = self._queue.get(stem)
+        return (self.queue_dir / name, None) if name else (None, None)
+
+    def _run(self, fn, jobs: list) -> list:
+        """fn(*job) for every job on the thread pool; results keep job order, errors are returned."""
+        def call(job):
+            try:
+                return fn(*job)
+            except Exception as e:
+                return e
+
+        if len(jobs) <= 1:
+            return [call(j) for j in jobs]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(call, jobs))
+
+    def _stage(self, name: str, source: str, sha, label: Path | None):
+        self.staged_rows.append((name, {
+            "status": "staged", "label_source": source, "path": (self.images_dir / name).resolve(),
+            "sha256": sha, "class_counts": label_class_counts(label) if label else {},
+        }))
+        self.touched_images.append(self.images_dir / name)
+
+    # --- passes ---
+
+    def merge_originals(self, merged_images: dict, merged_labels: dict):
+        """
+        Link imported images (and their labels) that are not staged yet. Skipped when
+        neither the import folders nor the staged images folder changed since the last merge.
+        """
+        state = [_mtime_ns(self.original_images), _mtime_ns(self.original_labels)]
+        if state[0] is None or self.journal.get("originals") == state + [self._images_dir_before]:
+            self._originals_state = state
+            return
+        originals = list_dir(self.original_images)
+        labels = list_dir(self.original_labels, {".txt"})
+        image_jobs, label_jobs = [], []
+        for stem, name in originals.items():
+            if merged_images.get(stem) != name:
+                image_jobs.append((stem, name))
+            if stem in labels and stem not in merged_labels:
+                label_jobs.append((self.original_labels / labels[stem], self.labels_dir / labels[stem]))
+
+        results = self._run(shutil.copy, label_jobs)
+        for (src, dst), res in zip(label_jobs, results):
+            if not isinstance(res, Exception):
+                merged_labels[dst.stem] = dst.name
+                self.touched_labels.append(dst)
+        results = self._run(
+            lambda stem, name: blob_store.materialize(self.original_images / name, self.images_dir / name),
+            image_jobs,
+        )
+        failed = False
+        for (stem, name), sha in zip(image_jobs, results):
+            if isinstance(sha, Exception):
+                print(f"[WARN] Could not stage {name}: {sha}")
+                failed = True
+                continue
+            merged_images[stem] = name
+            label = self.labels_dir / f"{stem}.txt" if stem in merged_labels else None
+            self._stage(name, "labelstudio", sha, label)
+            self.counts["original"] += 1
+        if not failed:
+            self._originals_state = state
+
+    def merge_reviews(self, merged_images: dict, merged_labels: dict):
+        """Move approved labels and their queue images into the staged set."""
+        jobs = []
+        for stem, name in list_dir(self.active_dir, {".txt"}).items():
+            image, sha = self._queued_image(stem)
+            if image is None:
+                # label still goes in; the image may be recovered by a later merge
+                shutil.copy(self.active_dir / name, self.labels_dir / name)
+                merged_labels[stem] = name
+                self.touched_labels.append(self.labels_dir / name)
+                print(f"[WARN] No image found for {name} in {self.queue_dir}")
+                self.counts["missing"] += 1
+                continue
+            jobs.append((self.active_dir / name, image, sha))
+
+        def move(label: Path, image: Path, sha):
+            shutil.copy(label, self.labels_dir / label.name)
+            sha = blob_store.materialize(image, self.images_dir / image.name, sha)
+            image.unlink()
+            label.unlink()
+            return sha
+
+        for (label, image, _), sha in zip(jobs, self._run(move, jobs)):
+            if isinstance(sha, Exception):
+                print(f"[WARN] Could not merge {label.name}: {sha}")
+                continue
+            merged_labels[label.stem] = label.name
+            merged_images[image.stem] = image.name
+            self.touched_labels.append(self.labels_dir / label.name)
+            self._stage(image.name, "review", sha, self.labels_dir / label.name)
+            self.counts["review"] += 1
+
+    def recover_orphans(self, merged_images: dict, merged_labels: dict):
+        """Reunite staged labels that have no staged image with their queue image (set difference)."""
+        jobs = []
+        for stem in merged_labels.keys() - merged_images.keys():
+            image, sha = self._queued_image(stem)
+            if image is not None:
+                jobs.append((stem, image, sha))
+
+        def move(stem, image: Path, sha):
+            sha = blob_store.materialize(image, self.images_dir / image.name, sha)
+            image.unlink()
+            return sha
+
+        for (stem, image, _), sha in zip(jobs, self._run(move, jobs)):
+            if isinstance(sha, Exception):
+                continue
+            print(f"[RECOVERY] Reuniting orphan label {stem}.txt with image.")
+            merged_images[stem] = image.name
+            self._stage(image.name, "review", sha, self.labels_dir / merged_labels[stem])
+            self.counts["recovered"] += 1
+
+    def merge_negatives(self, merged_images: dict, merged_labels: dict):
+        """Images marked wrong become negative samples: staged image + empty label."""
+        jobs = []
+        for stem, name in list_dir(self.wrong_dir, {".txt"}).items():
+            empty = self.labels_dir / name
+            empty.write_text("")
+            merged_labels[stem] = name
+            self.touched_labels.append(empty)
+            image, sha = self._queued_image(stem)
+            jobs.append((self.wrong_dir / name, image, sha))
+
+        def move(wrong: Path, image: Path | None, sha):
+            if image is not None:
+                dest = self.images_dir / image.name
+                if not dest.exists():
+                    sha = blob_store.materialize(image, dest, sha)
+                try:
+                    image.unlink()
+                except OSError:
+                    pass
+            wrong.unlink()
+            return sha
+
+        for (wrong, image, _), sha in zip(jobs, self._run(move, jobs)):
+            if isinstance(sha, Exception) or image is None:
+                continue
+            merged_images[image.stem] = image.name
+            self._stage(image.name, "negative", sha, None)
+            self.counts["negative"] += 1
+
+    def sanitize(self):
+        """
+        Drop corrupt rows from the label files changed since the last merge and clip values that
+        drifted just outside [0, 1] (utils/label_processing.py). Pixel coordinates are left to
+        normalize_folder: the merge never rescales labels.
+        When the labels folder was untouched outside merges, that is exactly the files written
+        by this one; otherwise the whole folder is checked (unchanged files are still skipped).
+        """
+        full = self.journal.get("labels_dir") != self._labels_dir_before
+        names = None if full else {p.name for p in self.touched_labels}
+        if names == set():
+            return False
+        totals = process_folder(
+            self.labels_dir, backup_dir=self.labels_dir / "backup_pre_norm", names=names, normalize=False
+        )
+        self.counts["fixed"] += totals["fixed"]
+        return full
+
+    # --- entry point ---
+
+    def run(self) -> dict:
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        self.labels_dir.mkdir(parents=True, exist_ok=True)
+        self._labels_dir_before = _mtime_ns(self.labels_dir)
+        self._images_dir_before = _mtime_ns(self.images_dir)
+        self._originals_state = None
+        merged_images = list_dir(self.images_dir, IMAGE_EXTS)
+        merged_labels = list_dir(self.labels_dir, {".txt"})
+
+        self.merge_originals(merged_images, merged_labels)
+        self.merge_reviews(merged_images, merged_labels)
+        self.recover_orphans(merged_images, merged_labels)
+        self.merge_negatives(merged_images, merged_labels)
+        # one transaction: the catalog never shows a half-applied merge
+        catalog.upsert_many(self.staged_rows)
+        full = self.sanitize()
+
+        self._update_stats(full=full or not self.journal.get("labels_dir"))
+        self.journal["labels_dir"] = _mtime_ns(self.labels_dir)
+        # an unchanged staged images folder proves no flush/reset happened since this merge
+        self.journal["originals"] = (
+            self._originals_state + [_mtime_ns(self.images_dir)] if self._originals_state else None
+        )
+        self._save_journal()
+        return dict(self.counts, images=len(merged_images), labels=len(merged_labels))
+
+    def _update_stats(self, full: bool):
+        """Feed only the touched files to the staged statistics (full reconcile after a full pass)."""
+        stats = StagedStats(self.merged_root)
+        if full:
+            stats.reconcile_from_disk()
+            return
+        stats.load()
+        for path in self.touched_images:
+            stats.update_image(path)
+        for path in self.touched_labels:
+            stats.update_label(path)
+        stats.save()
@@ -0,0 +1,154 @@
+"""
+File: model_registry.py
+
+Purpose:
+Small persistent index of trained model versions. Records version id,
+weights path, task type, metrics and which version is active, so the
+backend and pipeline resolve the current model in O(1) instead of
+scanning runs/ for the newest best.pt.
+
+Reads/Writes:
+- ML/runs/detect/registry.json
+
+Called by:
+- active_learning_pipeline.py (run completes, run archived)
+- BE/services/runs_catalog.py, utils/rollback_model.py (rollback)
+- BE/services/ml_service.py, manual_review.py (resolve active model)
+- calibrate_imgsz.py (recommended inference imgsz)
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+REGISTRY_PATH = ML_ROOT / "runs" / "detect" / "registry.json"
+
+
+def load_registry(path: Path = REGISTRY_PATH) -> dict:
+    """Returns {"active": id | None, "versions": {id: entry}}; empty if missing or unreadable."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if isinstance(data, dict) and isinstance(data.get("versions"), dict):
+            return data
+    except Exception:
+        pass
+    return {"active": None, "versions": {}}
+
+
+def _save(data: dict, path: Path = REGISTRY_PATH):
+    """Write via a temp file + rename so readers never see a half-written index."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_run_metrics(run_dir: Path) -> dict:
+    """Last row of results.csv as {column: float}, skipping non-numeric values."""
+    csv_path = Path(run_dir) / "results.csv"
+    if not csv_path.exists():
+        return {}
+    try:
+        with csv_path.open("r", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        out = {}
+        for k, v in (rows[-1] if rows else {}).items():
+            try:
+                out[k.strip()] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+    except Exception:
+        return {}
+
+
+def register_model(weights: Path, task: str = "detect", metrics: dict | None = None,
+                   source: str = "train", activate: bool = True, path: Path = REGISTRY_PATH) -> dict:
+    """Record a completed run's weights as a new version (and make it active by default)."""
+    data = load_registry(path)
+    weights = Path(weights).resolve()
+    version_id = "v" + datetime.now().strftime("%Y%m%d_%H%M%S")
+    while version_id in data["versions"]:
+        version_id += "_"
+    entry = {
+        "id": version_id,
+        "path": str(weights),
+        "task": task,
+        "metrics": metrics or {},
+        "source": source,
+        "status": "current",
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+    data["versions"][version_id] = entry
+    if activate:
+        previous = data["versions"].get(data.get("active") or "")
+        if previous and previous["status"] == "current":
+            previous["status"] = "superseded"
+        data["active"] = version_id
+    _save(data, path)
+    return entry
+
+
+def relocate(old_dir: Path, new_dir: Path, status: str = "archived", path: Path = REGISTRY_PATH) -> int:
+    """Rewrite entries whose weights lived under old_dir after that run folder was moved."""
+    data = load_registry(path)
+    old_dir, new_dir = Path(old_dir).resolve(), Path(new_dir).resolve()
+    moved = 0
+    for entry in data["versions"].values():
+        p = Path(entry["path"])
+        try:
+            rel = p.relative_to(old_dir)
+        except ValueError:
+            continue
+        entry["path"] = str(new_dir / rel)
+        entry["status"] = status
+        moved += 1
+    if moved:
+        _save(data, path)
+    return moved
+
+
+def activate(version_id: str, path: Path = REGISTRY_PATH) -> dict | None:
+    """Point the active pointer at an existing version."""
+    data = load_registry(path)
+    entry = data["versions"].get(version_id)
+    if entry is None:
+        return None
+    data["active"] = version_id
+    _save(data, path)
+    return entry
+
+
+def update_entry(version_id: str, path: Path = REGISTRY_PATH, **fields) -> dict | None:
+    """Attach extra metadata (e.g. a quantization report) to an existing version."""
+    data = load_registry(path)
+    entry = data["versions"].get(version_id)
+    if entry is None:
+        return None
+    entry.update(fields)
+    _save(data, path)
+    return entry
+
+
+def active_entry(path: Path = REGISTRY_PATH) -> dict | None:
+    """The active version's entry, or None if nothing is registered or its weights are gone."""
+    data = load_registry(path)
+    entry = data["versions"].get(data.get("active") or "")
+    if entry and Path(entry["path"]).exists():
+        return entry
+    return None
+
+
+def active_model_path(path: Path = REGISTRY_PATH) -> Path | None:
+    entry = active_entry(path)
+    return Path(entry["path"]) if entry else None
+
+
+def recommended_imgsz(default: int, path: Path = REGISTRY_PATH) -> int:
+    """Inference resolution chosen by calibrate_imgsz.py for the active version, else default."""
+    entry = active_entry(path)
+    return int((entry or {}).get("recommendedImgsz") or default)
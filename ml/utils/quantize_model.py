@@ -0,0 +1,162 @@
+"""
+File: quantize_model.py
+
+Purpose:
+Post-training INT8 quantization of the exported ONNX model for CPU serving.
+"dynamic" quantizes weights only; "static" also calibrates activation ranges
+on a sample of training images. The quantized file is written next to the
+FP32 export as best.int8.onnx and evaluated against it on the training set,
+so each deployment can decide if the latency win is worth the accuracy cost.
+
+Reads from:
+- <run>/weights/best.onnx (FP32 export)
+- ML/data/yolo_merged/images/train (calibration + evaluation)
+
+Writes to:
+- <run>/weights/best.int8.onnx
+- <run>/weights/quantization.json (accuracy / latency report)
+
+Called by:
+- active_learning_pipeline.py (--quantize)
+"""
+
+import json
+import random
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def int8_path(weights: Path) -> Path:
+    """best.pt -> best.int8.onnx (the artifact the 'onnx-int8' backend serves)."""
+    return Path(weights).with_suffix(".int8.onnx")
+
+
+def _sample_images(image_dir: Path, count: int, seed: int = 0) -> list:
+    images = sorted(p for p in Path(image_dir).glob("*") if p.suffix.lower() in IMAGE_EXTS)
+    random.Random(seed).shuffle(images)
+    return images[:count]
+
+
+def _preprocess(path: Path, imgsz: int):
+    """Letterbox to imgsz x imgsz, BGR->RGB, NCHW float32 in [0, 1] (same as ultralytics)."""
+    img = cv2.imread(str(path))
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    r = imgsz / max(h, w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    x = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(x)
+
+
+def _calibration_reader(input_name: str, images: list, imgsz: int):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(images)
+
+        def get_next(self):
+            for path in self._it:
+                x = _preprocess(path, imgsz)
+                if x is not None:
+                    return {input_name: x}
+            return None
+
+    return _Reader()
+
+
+def _copy_metadata(src: Path, dst: Path):
+    """Carry the ultralytics metadata (names, imgsz, task, stride) over to the quantized graph."""
+    import onnx
+
+    meta = {p.key: p.value for p in onnx.load(str(src), load_external_data=False).metadata_props}
+    model = onnx.load(str(dst))
+    existing = {p.key for p in model.metadata_props}
+    for k, v in meta.items():
+        if k not in existing:
+            model.metadata_props.add(key=k, value=v)
+    onnx.save(model, str(dst))
+
+
+def quantize(onnx_fp32: Path, out_path: Path, mode: str = "dynamic",
+             calib_dir: Path | None = None, imgsz: int = 960, samples: int = 64) -> Path:
+    """Write an INT8 copy of onnx_fp32 to out_path using dynamic or static quantization."""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    onnx_fp32, out_path = Path(onnx_fp32), Path(out_path)
+    if mode == "dynamic":
+        quantize_dynamic(str(onnx_fp32), str(out_path), weight_type=QuantType.QUInt8)
+    elif mode == "static":
+        import onnxruntime as ort
+
+        images = _sample_images(calib_dir, samples)
+        if not images:
+            raise ValueError(f"No calibration images found in {calib_dir}")
+        sess = ort.InferenceSession(str(onnx_fp32), providers=["CPUExecutionProvider"])
+        reader = _calibration_reader(sess.get_inputs()[0].name, images, imgsz)
+        quantize_static(
+            str(onnx_fp32), str(out_path), reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    else:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    _copy_metadata(onnx_fp32, out_path)
+    return out_path
+
+
+def _evaluate(model_path: Path, data_yaml: Path, imgsz: int, task: str) -> dict:
+    """mAP on the dataset yaml (val split == train split in this project) plus mean latency."""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_path), task=task).val(
+        data=str(data_yaml), imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False
+    )
+    return {
+        "mAP50": round(float(metrics.box.map50), 4),
+        "mAP50-95": round(float(metrics.box.map), 4),
+        "msPerImage": round(float(metrics.speed.get("inference", 0.0)), 2),
+    }
+
+
+def quantize_and_report(weights: Path, data_yaml: Path, calib_dir: Path, mode: str = "dynamic",
+                        imgsz: int = 960, task: str = "detect", samples: int = 64) -> dict:
+    """
+    Quantize weights' ONNX export and compare INT8 vs FP32 on the training set.
+    The report is saved as quantization.json next to the weights and returned.
+    """
+    weights = Path(weights)
+    fp32 = weights.with_suffix(".onnx")
+    if not fp32.exists():
+        raise FileNotFoundError(f"ONNX export not found: {fp32}")
+
+    t0 = time.perf_counter()
+    int8 = quantize(fp32, int8_path(weights), mode=mode, calib_dir=calib_dir, imgsz=imgsz, samples=samples)
+    report = {
+        "mode": mode,
+        "artifact": str(int8),
+        "calibrationImages": samples if mode == "static" else 0,
+        "quantizeSeconds": round(time.perf_counter() - t0, 2),
+        "sizeMB": {
+            "fp32": round(fp32.stat().st_size / 1e6, 2),
+            "int8": round(int8.stat().st_size / 1e6, 2),
+        },
+    }
+    fp32_m = _evaluate(fp32, data_yaml, imgsz, task)
+    int8_m = _evaluate(int8, data_yaml, imgsz, task)
+    report["fp32"], report["int8"] = fp32_m, int8_m
+    report["delta"] = {k: round(int8_m[k] - fp32_m[k], 4) for k in fp32_m}
+
+    (weights.parent / "quantization.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return report
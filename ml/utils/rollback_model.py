@@ -1,6 +1,8 @@
 from pathlib import Path
 import shutil, sys
 
+from model_registry import register_model, relocate
+
 ARCHIVE = Path("runs/detect/archive")
 CURRENT = Path("runs/detect/train")
 
@@ -21,6 +23,8 @@ if __name__ == "__main__":
     if CURRENT.exists():
         ts = name + "_prev"
         shutil.move(str(CURRENT), str(ARCHIVE / ts))
+        relocate(CURRENT, ARCHIVE / ts)
         print(f"archived current to: {ARCHIVE/ts}")
     shutil.copytree(src, CURRENT)  # copy whole run back to 'train'
+    register_model(CURRENT / "weights" / "best.pt", source=f"rollback:{name}")
     print(f"rolled back to: {src}")
@@ -0,0 +1,285 @@
+"""
+File: staged_stats.py
+
+Purpose:
+Incrementally maintained statistics of the staged training set
+(yolo_merged/images/train + labels/train): per-class instance counts,
+images per class, negative samples and box-size histograms.
+Each label file's contribution is stored with its size/mtime, so writers
+update only the files they touched and reconcile() re-parses only files
+whose mtime changed. Totals are kept up to date, so summary() is O(classes).
+
+Reads/Writes:
+- ML/data/yolo_merged/ (scanned with os.scandir)
+- ML/data/staged_stats.json
+
+Called by:
+- boost_merge_labels.py (after merging)
+- BE/services/ml_service.py (accept_batch, flush_staged, staged-stats endpoint)
+"""
+
+import json
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+ML_ROOT = Path(__file__).resolve().parents[1]
+STAGED_ROOT = ML_ROOT / "data" / "yolo_merged"
+STATS_PATH = ML_ROOT / "data" / "staged_stats.json"
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+# box size = sqrt(w * h) in normalized image units
+SIZE_BINS = [0.02, 0.05, 0.1, 0.2, 0.4]
+SIZE_LABELS = ["<0.02", "0.02-0.05", "0.05-0.1", "0.1-0.2", "0.2-0.4", ">=0.4"]
+
+
+def _size_bin(size: float) -> int:
+    for i, edge in enumerate(SIZE_BINS):
+        if size < edge:
+            return i
+    return len(SIZE_BINS)
+
+
+def parse_label(text: str) -> dict:
+    """{class_id: [instances, hist...]} for one YOLO label file (box, OBB or polygon rows)."""
+    out = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        try:
+            cls = str(int(float(parts[0])))  # sanitized labels may store "0.0"
+            values = [float(x) for x in parts[1:]]
+        except ValueError:
+            continue
+        if len(values) == 4:
+            w, h = values[2], values[3]
+        else:
+            xs, ys = values[0::2], values[1::2]
+            w, h = max(xs) - min(xs), max(ys) - min(ys)
+        row = out.setdefault(cls, [0] + [0] * len(SIZE_LABELS))
+        row[0] += 1
+        row[1 + _size_bin(math.sqrt(max(w, 0.0) * max(h, 0.0)))] += 1
+    return out
+
+
+class StagedStats:
+    def __init__(self, root: Path = STAGED_ROOT, path: Path = STATS_PATH):
+        self.images_dir = Path(root) / "images" / "train"
+        self.labels_dir = Path(root) / "labels" / "train"
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.labels = {}  # stem -> [size, mtime_ns, {class: [instances, hist...]}]
+        self.images = {}  # name -> [size, mtime_ns]
+        self.image_stems = Counter()
+        self.instances = Counter()
+        self.images_per_class = Counter()
+        self.hist = {}  # class -> hist list
+        self.positive = 0  # images whose label has at least one instance
+
+    # --- persistence ---
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.reconcile_from_disk()
+
+    def reconcile_from_disk(self) -> int:
+        """Load the persisted records, then reconcile them with the folders (startup path)."""
+        with self._lock:
+            self.load()
+            return self.reconcile()
+
+    def load(self):
+        """Rebuild totals from the persisted per-file records (no label parsing)."""
+        with self._lock:
+            self._reset()
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            for name, rec in (data.get("images") or {}).items():
+                self._add_image(name, rec)
+            for stem, rec in (data.get("labels") or {}).items():
+                self._add_label(stem, rec)
+            self._loaded = True
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({"images": self.images, "labels": self.labels})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    # --- bookkeeping (callers hold the lock) ---
+
+    def _is_positive(self, stem: str) -> bool:
+        rec = self.labels.get(stem)
+        return self.image_stems[stem] > 0 and rec is not None and bool(rec[2])
+
+    def _add_image(self, name: str, rec):
+        stem = os.path.splitext(name)[0]
+        before = self._is_positive(stem)
+        if name not in self.images:
+            self.image_stems[stem] += 1
+        self.images[name] = list(rec)
+        self.positive += self._is_positive(stem) - before
+
+    def _drop_image(self, name: str):
+        if self.images.pop(name, None) is None:
+            return
+        stem = os.path.splitext(name)[0]
+        before = self._is_positive(stem)
+        self.image_stems[stem] -= 1
+        if self.image_stems[stem] <= 0:
+            del self.image_stems[stem]
+        self.positive += self._is_positive(stem) - before
+
+    def _add_label(self, stem: str, rec):
+        self._drop_label(stem)
+        before = self._is_positive(stem)
+        size, mtime_ns, per_class = rec
+        self.labels[stem] = [size, mtime_ns, per_class]
+        for cls, row in per_class.items():
+            self.instances[cls] += row[0]
+            self.images_per_class[cls] += 1
+            h = self.hist.setdefault(cls, [0] * len(SIZE_LABELS))
+            for i, n in enumerate(row[1:]):
+                h[i] += n
+        self.positive += self._is_positive(stem) - before
+
+    def _drop_label(self, stem: str):
+        before = self._is_positive(stem)
+        rec = self.labels.pop(stem, None)
+        if rec is None:
+            return
+        for cls, row in rec[2].items():
+            self.instances[cls] -= row[0]
+            self.images_per_class[cls] -= 1
+            h = self.hist[cls]
+            for i, n in enumerate(row[1:]):
+                h[i] -= n
+            if self.instances[cls] <= 0 and self.images_per_class[cls] <= 0:
+                del self.instances[cls], self.images_per_class[cls], self.hist[cls]
+        self.positive += self._is_positive(stem) - before
+
+    # --- write-through updates ---
+
+    def update_label(self, label_path: Path):
+        """Re-read one label file that was just written (or drop it if it is gone)."""
+        label_path = Path(label_path)
+        with self._lock:
+            self.ensure_loaded()
+            try:
+                st = label_path.stat()
+                per_class = parse_label(label_path.read_text(encoding="utf-8", errors="ignore"))
+            except OSError:
+                self._drop_label(label_path.stem)
+                return
+            self._add_label(label_path.stem, [st.st_size, st.st_mtime_ns, per_class])
+
+    def update_image(self, image_path: Path):
+        """Record (or forget, if missing) one image in the staged images folder."""
+        image_path = Path(image_path)
+        with self._lock:
+            self.ensure_loaded()
+            try:
+                st = image_path.stat()
+            except OSError:
+                self._drop_image(image_path.name)
+                return
+            self._add_image(image_path.name, [st.st_size, st.st_mtime_ns])
+
+    def clear(self):
+        """The staged set was wiped (flush)."""
+        with self._lock:
+            self._reset()
+            self._loaded = True
+        self.save()
+
+    def reconcile(self) -> int:
+        """
+        One os.scandir pass over images and labels; only files whose size/mtime
+        changed are re-parsed. Returns the number of changed entries.
+        """
+        changed = 0
+        with self._lock:
+            self._loaded = True
+            seen = {}
+            if self.images_dir.exists():
+                with os.scandir(self.images_dir) as it:
+                    for e in it:
+                        if e.is_file() and os.path.splitext(e.name)[1].lower() in IMAGE_EXTS:
+                            st = e.stat()
+                            seen[e.name] = [st.st_size, st.st_mtime_ns]
+            for name in [n for n in self.images if n not in seen]:
+                self._drop_image(name)
+                changed += 1
+            for name, rec in seen.items():
+                if self.images.get(name) != rec:
+                    self._add_image(name, rec)
+                    changed += 1
+
+            seen = {}
+            if self.labels_dir.exists():
+                with os.scandir(self.labels_dir) as it:
+                    for e in it:
+                        if e.is_file() and e.name.endswith(".txt"):
+                            seen[e.name[:-4]] = e
+            for stem in [s for s in self.labels if s not in seen]:
+                self._drop_label(stem)
+                changed += 1
+            for stem, e in seen.items():
+                st = e.stat()
+                old = self.labels.get(stem)
+                if old is not None and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+                    continue
+                try:
+                    with open(e.path, "r", encoding="utf-8", errors="ignore") as f:
+                        per_class = parse_label(f.read())
+                except OSError:
+                    continue
+                self._add_label(stem, [st.st_size, st.st_mtime_ns, per_class])
+                changed += 1
+        if changed:
+            self.save()
+        return changed
+
+    # --- query ---
+
+    def summary(self, class_names: list | None = None) -> dict:
+        """Totals maintained on write; no filesystem access."""
+        with self._lock:
+            self.ensure_loaded()
+            names = class_names or []
+
+            def name_of(cls):
+                i = int(cls) if cls.isdigit() else -1
+                return names[i] if 0 <= i < len(names) else cls
+
+            per_class = {
+                cls: {
+                    "name": name_of(cls),
+                    "instances": self.instances[cls],
+                    "images": self.images_per_class[cls],
+                    "sizeHist": dict(zip(SIZE_LABELS, self.hist[cls])),
+                }
+                for cls in sorted(self.instances, key=lambda c: (len(c), c))
+            }
+            overall = [sum(col) for col in zip(*self.hist.values())] if self.hist else [0] * len(SIZE_LABELS)
+            return {
+                "images": len(self.images),
+                "labels": len(self.labels),
+                "classes": len(per_class),
+                "instances": sum(self.instances.values()),
+                "negatives": len(self.images) - self.positive,
+                "perClass": per_class,
+                "sizeHist": dict(zip(SIZE_LABELS, overall)),
+            }
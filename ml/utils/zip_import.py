@@ -0,0 +1,200 @@
+"""
+File: zip_import.py
+
+Purpose:
+Streaming import of a Label Studio YOLO export. Members are decompressed
+straight from the ZIP (a path or any seekable file object, e.g. the upload
+itself) into their final place in data/yolo_dataset; there is no extract
+folder and no second copy. Members whose CRC and size match the file
+already in place are skipped. Members are decompressed in parallel (zlib
+releases the GIL) and progress is reported while the import runs.
+
+Layout expected in the ZIP (at any depth, first match wins):
+- images/<file>        -> <dataset>/images/train/
+- labels/<file>.txt    -> <dataset>/labels/train/
+- classes.txt, notes.json -> <dataset>/
+
+Reads/Writes:
+- <dataset>/images/train, <dataset>/labels/train (images linked into the blob store)
+- <dataset>/.import_manifest.json (CRC/size of what previous imports wrote)
+- ML/data/catalog.db (imported images)
+
+Called by:
+- import_yolo_dataset_from_zip.py (CLI / pipeline)
+- BE/services/ml_service.py (project init, straight from the upload)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .blob_store import blob_store
+from .dataset_catalog import catalog
+
+CHUNK = 1024 * 1024
+META_FILES = ("classes.txt", "notes.json")
+
+
+def _folder_prefix(names: list, folder: str) -> str | None:
+    """Shallowest '<...>/folder/' prefix among the member names."""
+    best = None
+    for name in names:
+        parts = name.split("/")
+        if folder in parts[:-1]:
+            prefix = "/".join(parts[: parts.index(folder) + 1]) + "/"
+            if best is None or prefix.count("/") < best.count("/"):
+                best = prefix
+    return best
+
+
+def plan(zf: zipfile.ZipFile, dataset_root: Path) -> list:
+    """[(ZipInfo, destination)] for every member that belongs in the dataset."""
+    infos = [i for i in zf.infolist() if not i.is_dir()]
+    names = [i.filename for i in infos]
+    img_prefix = _folder_prefix(names, "images")
+    lbl_prefix = _folder_prefix(names, "labels")
+    if img_prefix is None or lbl_prefix is None:
+        raise ValueError("Missing 'images/' or 'labels/' in the ZIP.")
+
+    images_dir = dataset_root / "images" / "train"
+    labels_dir = dataset_root / "labels" / "train"
+    out, meta = [], {}
+    for info in infos:
+        name = info.filename
+        base = name.rsplit("/", 1)[-1]
+        if not base or base.startswith("."):
+            continue
+        # direct children only, like the old folder glob; basenames keep zip-slip paths out
+        if name.startswith(img_prefix) and "/" not in name[len(img_prefix):]:
+            out.append((info, images_dir / base))
+        elif name.startswith(lbl_prefix) and "/" not in name[len(lbl_prefix):] and base.endswith(".txt"):
+            out.append((info, labels_dir / base))
+        elif base in META_FILES and (base not in meta or name.count("/") < meta[base][0].filename.count("/")):
+            meta[base] = (info, dataset_root / base)
+    return out + list(meta.values())
+
+
+class ZipImporter:
+    def __init__(self, source, dataset_root: Path, workers: int = 4, progress=print):
+        self.source = source
+        self.dataset_root = Path(dataset_root)
+        self.images_dir = self.dataset_root / "images" / "train"
+        self.workers = max(1, workers)
+        self.progress = progress or (lambda msg: None)
+        self.manifest_path = self.dataset_root / ".import_manifest.json"
+        self._lock = threading.Lock()
+        self._done = self._done_bytes = 0
+        self._last_report = 0.0
+
+    # --- manifest of what previous imports wrote ---
+
+    def _load_manifest(self) -> dict:
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, data: dict):
+        self.dataset_root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def _unchanged(self, info: zipfile.ZipInfo, dest: Path, known) -> bool:
+        """Same size and CRC as the member? Trusts the manifest while the file's stamp is unchanged."""
+        try:
+            st = dest.stat()
+        except OSError:
+            return False
+        if st.st_size != info.file_size:
+            return False
+        if known and known[:3] == [info.file_size, info.CRC, st.st_mtime_ns]:
+            return True
+        crc = 0
+        with open(dest, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK), b""):
+                crc = zlib.crc32(chunk, crc)
+        return crc == info.CRC
+
+    # --- work ---
+
+    def _extract(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo, dest: Path):
+        """Decompress one member into dest (temp file + rename); images are hashed and deduplicated."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.part")
+        digest = hashlib.sha256() if dest.parent == self.images_dir else None
+        try:
+            with zf.open(info) as src, open(tmp, "wb") as out:
+                for chunk in iter(lambda: src.read(CHUNK), b""):
+                    out.write(chunk)
+                    if digest:
+                        digest.update(chunk)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        if digest:
+            blob_store.adopt(dest, digest.hexdigest())
+
+    def _report(self, total: int, total_bytes: int, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_report < 1.0:
+            return
+        self._last_report = now
+        pct = 100.0 * self._done_bytes / total_bytes if total_bytes else 100.0
+        self.progress(f"PROGRESS {self._done}/{total} files, {self._done_bytes / 1e6:.1f}/{total_bytes / 1e6:.1f} MB ({pct:.0f}%)")
+
+    def run(self) -> dict:
+        with zipfile.ZipFile(self.source) as zf:
+            jobs = plan(zf, self.dataset_root)
+            manifest = self._load_manifest()
+            total = len(jobs)
+            total_bytes = sum(info.file_size for info, _ in jobs)
+            counts = {"written": 0, "skipped": 0, "failed": 0}
+
+            def one(job):
+                info, dest = job
+                key = str(dest.relative_to(self.dataset_root)).replace(os.sep, "/")
+                status = "skipped"
+                try:
+                    if not self._unchanged(info, dest, manifest.get(key)):
+                        self._extract(zf, info, dest)
+                        status = "written"
+                    st = dest.stat()
+                    record = [info.file_size, info.CRC, st.st_mtime_ns]
+                except Exception as e:
+                    self.progress(f"[WARN] Could not import {info.filename}: {e}")
+                    status, record = "failed", None
+                with self._lock:
+                    counts[status] += 1
+                    if record:
+                        manifest[key] = record
+                    self._done += 1
+                    self._done_bytes += info.file_size
+                    self._report(total, total_bytes)
+
+            # ZipFile reads through a shared, locked file handle; decompression runs in parallel
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(one, jobs))
+            self._report(total, total_bytes, force=True)
+
+        self._save_manifest(manifest)
+        labels_dir = self.dataset_root / "labels" / "train"
+        counts["registered"] = catalog.sync_folder(
+            self.images_dir.resolve(), "imported", labels_dir, label_source="labelstudio"
+        )
+        counts["files"] = total
+        return counts
+
+
+def import_labelstudio_zip(source, dataset_root: Path, workers: int = 4, progress=print) -> dict:
+    """Import a Label Studio YOLO export (path or seekable file object) into dataset_root."""
+    return ZipImporter(source, dataset_root, workers=workers, progress=progress).run()
@@ -0,0 +1,51 @@
+"""
+Shared test setup.
+
+ml/ scripts import their helpers as `utils.x` (cwd=ml) and the backend imports
+the same folder as `ML.` (case-insensitive checkouts); both are made importable
+here. Fixtures point the ML singletons (catalog, blob store, caches) at a temp
+folder so tests never touch ML/data.
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+ML_DIR = ROOT / "ml"
+
+for path in (str(ROOT), str(ML_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+if "ML" not in sys.modules and importlib.util.find_spec("ML") is None:
+    # case-sensitive filesystems: expose ml/ under the name the backend imports
+    spec = importlib.util.spec_from_file_location("ML", ML_DIR / "__init__.py",
+                                                  submodule_search_locations=[str(ML_DIR)])
+    sys.modules["ML"] = importlib.util.module_from_spec(spec)
+
+
+@pytest.fixture
+def ml_data(tmp_path, monkeypatch):
+    """
+    Temp ML/data: catalog, blob store, label cache and dimension cache live under tmp_path/data.
+    Patched under both import names (utils.x for ml scripts, ML.utils.x for the backend).
+    """
+    data = tmp_path / "data"
+    for pkg in ("utils", "ML.utils"):
+        label_processing = importlib.import_module(f"{pkg}.label_processing")
+        blob_store = importlib.import_module(f"{pkg}.blob_store").blob_store
+        catalog = importlib.import_module(f"{pkg}.dataset_catalog").catalog
+        dimension_cache = importlib.import_module(f"{pkg}.image_dims").dimension_cache
+
+        monkeypatch.setattr(label_processing, "CACHE_PATH", data / "label_cache.json")
+        monkeypatch.setattr(dimension_cache, "path", data / "image_dims.json")
+        monkeypatch.setattr(dimension_cache, "_entries", None)
+        monkeypatch.setattr(catalog, "path", data / "catalog.db")
+        monkeypatch.setattr(catalog, "_local", threading.local())
+        monkeypatch.setattr(blob_store, "root", data / "blobs")
+    return data
@@ -0,0 +1,45 @@
+import os
+import threading
+import time
+
+from utils.blob_store import BlobStore
+
+
+def test_gc_keeps_fresh_blobs_and_collects_old_unreferenced_ones(tmp_path):
+    store = BlobStore(tmp_path / "blobs", gc_grace_s=60)
+    kept = store.write_bytes(tmp_path / "kept.jpg", b"kept")
+    fresh = store.write_bytes(tmp_path / "fresh.jpg", b"fresh")
+    old = store.write_bytes(tmp_path / "old.jpg", b"old")
+    (tmp_path / "fresh.jpg").unlink()
+    (tmp_path / "old.jpg").unlink()
+    stamp = time.time() - 120
+    for sha in (kept, old):
+        os.utime(store.blob_path(sha), (stamp, stamp))
+
+    assert store.gc() == 1
+    assert store.has(kept) and store.has(fresh) and not store.has(old)
+
+
+def test_gc_never_removes_a_blob_a_writer_is_about_to_link(tmp_path):
+    store = BlobStore(tmp_path / "blobs", gc_grace_s=0)
+    stop = threading.Event()
+    errors = []
+
+    def collect():
+        while not stop.is_set():
+            store.gc()
+
+    collector = threading.Thread(target=collect)
+    collector.start()
+    try:
+        for i in range(200):
+            dest = tmp_path / "queue" / f"{i}.jpg"
+            try:
+                store.write_bytes(dest, b"same bytes")
+                dest.unlink()  # leaves the blob unreferenced for the next round
+            except OSError as e:
+                errors.append(e)
+    finally:
+        stop.set()
+        collector.join(5)
+    assert errors == []
@@ -0,0 +1,28 @@
+import struct
+import time
+
+from utils.image_dims import DimensionCache, probe_size
+
+
+def _png(path, w, h):
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", w, h) + b"\x08\x02\x00\x00\x00")
+
+
+def test_png_header_size(tmp_path):
+    _png(tmp_path / "a.png", 640, 480)
+    assert tuple(probe_size(tmp_path / "a.png")) == (640, 480)
+
+
+def test_puts_are_batched_into_one_timed_save(tmp_path):
+    cache = DimensionCache(tmp_path / "dims.json")
+    for i in range(3):
+        _png(tmp_path / f"{i}.png", 10 + i, 20)
+        assert cache.get(tmp_path / f"{i}.png") == (10 + i, 20)
+        cache.save_soon(delay=0.1)
+    assert not cache.path.exists()  # nothing written per call
+
+    deadline = time.monotonic() + 5
+    while not cache.path.exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    reloaded = DimensionCache(cache.path)
+    assert [reloaded.cached(tmp_path / f"{i}.png") for i in range(3)] == [(10, 20), (11, 20), (12, 20)]
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from BE.services.ml_service import InferenceBatcher, letterbox_bucket
+
+
+class Handle:
+    def __init__(self, version):
+        self.version = version
+
+
+class Recorder:
+    """run_batch stand-in: records every batch and answers each image with (image, conf)."""
+
+    def __init__(self, gate=None, fail=False):
+        self.batches = []
+        self.gate = gate
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, handle, images, conf, imgsz):
+        if self.gate:
+            self.gate.wait(5)
+        with self._lock:
+            self.batches.append((handle.version, imgsz, list(images), conf))
+        if self.fail:
+            raise RuntimeError("forward failed")
+        return [(image, conf) for image in images]
+
+
+def _submit_all(batcher, requests):
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        futures = list(pool.map(lambda r: batcher.submit(*r), requests))
+    return [f.result(timeout=5) for f in futures]
+
+
+def test_letterbox_bucket_matches_ultralytics_padding():
+    assert letterbox_bucket(480, 640, 640) == (480, 640)
+    assert letterbox_bucket(1000, 1000, 640) == (640, 640)
+    assert letterbox_bucket(3000, 4000, 960) == (736, 960)
+
+
+def test_concurrent_requests_share_batches_and_get_their_own_results():
+    run = Recorder()
+    batcher = InferenceBatcher(run, max_batch=4, max_wait_ms=200)
+    handle = Handle("v1")
+    requests = [(handle, f"img{i}", 0.25, (640, 640), 640) for i in range(8)]
+
+    results = _submit_all(batcher, requests)
+
+    assert results == [(f"img{i}", 0.25) for i in range(8)]
+    assert sum(len(b[2]) for b in run.batches) == 8
+    assert len(run.batches) < 8  # micro-batched, not one forward pass per request
+    assert all(len(b[2]) <= 4 for b in run.batches)
+
+
+def test_batches_never_mix_buckets_versions_or_imgsz():
+    run = Recorder()
+    batcher = InferenceBatcher(run, max_batch=16, max_wait_ms=200)
+    old, new = Handle("v1"), Handle("v2")
+    requests = [
+        (old, "a", 0.25, (640, 640), 640),
+        (old, "b", 0.25, (480, 640), 640),
+        (new, "c", 0.25, (640, 640), 640),
+        (old, "d", 0.25, (640, 640), 960),
+        (old, "e", 0.25, (640, 640), 640),
+    ]
+    _submit_all(batcher, requests)
+
+    key_of = {r[1]: (r[0].version, r[3], r[4]) for r in requests}
+    assert sorted(img for b in run.batches for img in b[2]) == ["a", "b", "c", "d", "e"]
+    for version, imgsz, images, _ in run.batches:
+        assert {key_of[img] for img in images} == {(version, key_of[images[0]][1], imgsz)}
+
+
+def test_batch_runs_at_the_loosest_conf():
+    run = Recorder()
+    batcher = InferenceBatcher(run, max_batch=2, max_wait_ms=500)
+    handle = Handle("v1")
+    _submit_all(batcher, [(handle, "a", 0.5, (640, 640), 640), (handle, "b", 0.1, (640, 640), 640)])
+    assert [b[3] for b in run.batches] == [0.1]
+
+
+def test_a_failed_forward_pass_fails_every_caller_in_the_batch():
+    batcher = InferenceBatcher(Recorder(fail=True), max_batch=4, max_wait_ms=100)
+    handle = Handle("v1")
+    futures = [batcher.submit(handle, f"img{i}", 0.25, (640, 640), 640) for i in range(3)]
+    for fut in futures:
+        with pytest.raises(RuntimeError, match="forward failed"):
+            fut.result(timeout=5)
@@ -0,0 +1,115 @@
+import os
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.label_processing import process_folder, process_text
+
+SIZE = (4000, 3000)
+
+
+def _values(text):
+    return [float(v) for v in text.split()[1:]]
+
+
+def test_slightly_out_of_range_box_is_clipped_not_rescaled():
+    text, counts = process_text("0 1.000001 0.5 0.2 0.2\n", SIZE)
+    assert _values(text) == [1.0, 0.5, 0.2, 0.2]
+    assert counts["clipped"] == 1 and counts["normalized"] == 0
+
+
+def test_slightly_out_of_range_polygon_is_clipped_not_rescaled():
+    text, counts = process_text("0 0.98 0.10 1.0004 0.12 0.5 0.5 0.4 0.4\n", SIZE)
+    assert _values(text) == [0.98, 0.1, 1.0, 0.12, 0.5, 0.5, 0.4, 0.4]
+    assert counts["normalized"] == 0
+
+
+def test_pixel_rows_are_normalized_by_image_size():
+    text, counts = process_text("0 2000 1500 400 300\n", SIZE)
+    assert _values(text) == [0.5, 0.5, 0.1, 0.1]
+    assert counts["normalized"] == 1
+
+
+def test_mixed_scale_row_is_left_alone():
+    text, counts = process_text("0 0.5 0.5 200 300\n", SIZE)
+    assert text is None
+    assert counts["unresolved"] == 1
+
+
+def test_pixel_rows_are_kept_without_normalize():
+    text, counts = process_text("0 2000 1500 400 300\n", SIZE, normalize=False)
+    assert text is None
+    assert counts["unresolved"] == 1
+
+
+def test_valid_file_is_unchanged():
+    text, counts = process_text("0 0.5 0.5 0.2 0.2\n1 0.1 0.1 0.05 0.05\n", SIZE)
+    assert text is None
+    assert counts["rows"] == 2 and counts["dropped"] == 0
+
+
+def test_corrupt_rows_are_dropped():
+    text, counts = process_text("0 0.5 0.5 0.2 0.2\nx 0.5 0.5 0.2 0.2\n0 0.5 0.5 0 0.2\n0 0.5 0.5\n", SIZE)
+    assert text == "0 0.5 0.5 0.2 0.2\n"
+    assert counts["dropped"] == 3
+
+
+def test_polygon_to_obb():
+    square = "0 0.4 0.4 0.6 0.4 0.6 0.6 0.4 0.6\n"
+    text, counts = process_text(square, SIZE, to_obb=True)
+    assert counts["converted"] == 1
+    assert _values(text) == pytest.approx([0.5, 0.5, 0.2, 0.2, 0.0])
+
+
+def test_process_folder_skips_unchanged_files(ml_data, tmp_path):
+    labels = tmp_path / "labels"
+    labels.mkdir()
+    (labels / "a.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    (labels / "b.txt").write_text("0 1.000001 0.5 0.2 0.2\nbad\n")
+
+    first = process_folder(labels, workers=1, normalize=False)
+    assert first["files"] == 2 and first["fixed"] == 1 and first["dropped"] == 1
+    assert (labels / "b.txt").read_text() == "0 1.000000 0.500000 0.200000 0.200000\n"
+
+    second = process_folder(labels, workers=1, normalize=False)
+    assert second["skipped"] == 2 and second["fixed"] == 0
+
+    (labels / "a.txt").write_text("0 0.5 0.5 0.2 0.2\n0 0.5 0.5\n")
+    stamp = os.stat(labels / "a.txt").st_mtime_ns
+    os.utime(labels / "a.txt", ns=(stamp + 10**9, stamp + 10**9))
+    third = process_folder(labels, workers=1, normalize=False)
+    assert third["fixed"] == 1 and third["skipped"] == 1
+
+
+def test_pixel_file_is_normalized_once_its_image_arrives(ml_data, tmp_path):
+    labels, images = tmp_path / "labels", tmp_path / "images"
+    labels.mkdir()
+    images.mkdir()
+    (labels / "a.txt").write_text("0 2000 1500 400 300\n")
+
+    first = process_folder(labels, images, workers=1)
+    assert first["unresolved"] == 1 and first["fixed"] == 0
+
+    (images / "a.png").write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR"
+                                   + struct.pack(">II", *SIZE) + b"\x08\x02\x00\x00\x00")
+    second = process_folder(labels, images, workers=1)
+    assert second["normalized"] == 1 and second["skipped"] == 0
+    assert _values((labels / "a.txt").read_text()) == [0.5, 0.5, 0.1, 0.1]
+
+
+def test_parallel_pass_matches_serial_pass(ml_data, tmp_path):
+    rows = ["0 0.5 0.5 0.2 0.2\n", "0 1.000001 0.5 0.2 0.2\n", "junk\n0 0.1 0.1 0.05 0.05\n"]
+    results = []
+    for workers in (1, 2):
+        labels = tmp_path / f"labels{workers}"
+        labels.mkdir()
+        for i in range(80):  # above PARALLEL_MIN: the process pool path
+            (labels / f"{i}.txt").write_text(rows[i % 3])
+        totals = process_folder(labels, workers=workers, normalize=False)
+        results.append((totals, {p.name: p.read_text() for p in labels.iterdir()}))
+
+    (serial, serial_files), (parallel, parallel_files) = results
+    assert parallel == serial and parallel_files == serial_files
+    assert serial["fixed"] == 53 and serial["dropped"] == 26
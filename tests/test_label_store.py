@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.label_store import LabelStore, parse_rows
+
+
+@pytest.fixture
+def labels(tmp_path):
+    folder = tmp_path / "labels" / "train"
+    folder.mkdir(parents=True)
+    return folder
+
+
+def _store(labels, tmp_path):
+    return LabelStore(labels, name="staged", root=tmp_path / "store")
+
+
+def test_box_stats_are_cached_per_generation(labels, tmp_path, monkeypatch):
+    (labels / "a.txt").write_text("0 0.5 0.5 0.2 0.4\n")
+    store = _store(labels, tmp_path)
+    store.refresh()
+
+    calls = []
+    compute = store._compute_box_stats
+    monkeypatch.setattr(store, "_compute_box_stats", lambda: calls.append(1) or compute())
+    first = store.box_stats()
+    assert store.box_stats() is first
+    assert len(calls) == 1
+    assert first[0]["w"]["mean"] == pytest.approx(0.2)
+
+    (labels / "b.txt").write_text("0 0.5 0.5 0.6 0.4\n")
+    store.update([labels / "b.txt"])
+    assert store.box_stats()[0]["instances"] == 2
+    assert len(calls) == 2
+
+
+def test_negative_and_fractional_class_rows_are_skipped(labels, tmp_path):
+    cls, lens, _ = parse_rows("-1 0.5 0.5 0.1 0.1\n1.5 0.5 0.5 0.1 0.1\n2 0.5 0.5 0.1 0.1\n")
+    assert cls.tolist() == [2] and lens.tolist() == [4]
+
+    (labels / "a.txt").write_text("-1 0.5 0.5 0.1 0.1\n0 0.5 0.5 0.2 0.2\n")
+    store = _store(labels, tmp_path)
+    store.refresh()
+    assert store.class_histogram() == {0: 1}
+    assert store.images_per_class() == {0: 1}
+    assert list(store.box_stats()) == [0]
+
+
+def _write(labels, stem, text):
+    path = labels / f"{stem}.txt"
+    path.write_text(text)
+    st = path.stat()
+    # a rewrite within one timestamp tick must still look changed
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    return path
+
+
+def _snapshot(store):
+    return {s: store.rows_for(s) for s in store.stems}, store.class_histogram(), store.negatives()
+
+
+def test_incremental_refresh_matches_a_full_rebuild(labels, tmp_path):
+    _write(labels, "a", "0 0.5 0.5 0.2 0.2\n1 0.1 0.1 0.05 0.05\n")
+    _write(labels, "b", "2 0.3 0.3 0.1 0.1 30\n")
+    _write(labels, "c", "")
+    store = _store(labels, tmp_path)
+    assert store.refresh() == 3
+
+    assert store.refresh() == 0  # nothing changed: no parsing, no new generation
+    gen = store._gen
+
+    _write(labels, "a", "1 0.6 0.6 0.2 0.2\n")  # changed
+    (labels / "b.txt").unlink()  # removed
+    _write(labels, "d", "0 0.1 0.1 0.3 0.1 0.3 0.3 0.1 0.3\n")  # added polygon
+    assert store.refresh() == 3
+    assert store._gen != gen
+
+    fresh = LabelStore(labels, name="fresh", root=tmp_path / "store")
+    fresh.refresh()
+    assert _snapshot(store) == _snapshot(fresh)
+    assert store.rows_for("a") == [(1, pytest.approx([0.6, 0.6, 0.2, 0.2]))]
+    assert store.rows_for("b") == []
+    assert sorted(store.nonempty_stems()) == ["a", "d"]
+    assert store.negatives() == 1
+    assert store.class_histogram() == {0: 1, 1: 1}
+    # polygon rows are summarized by their bounding box
+    assert store.boxes[store.image_offsets[store._index["d"]]].tolist() == pytest.approx([0.2, 0.2, 0.2, 0.2])
+
+
+def test_update_applies_known_paths_without_scanning(labels, tmp_path):
+    store = _store(labels, tmp_path)
+    written = _write(labels, "a", "0 0.5 0.5 0.2 0.2\n")
+    _write(labels, "unlisted", "1 0.5 0.5 0.2 0.2\n")
+    assert store.update([written]) == 1
+    assert store.stems == ["a"]
+
+    written.unlink()
+    assert store.update([written]) == 1
+    assert store.stems == []
+
+
+def test_published_generation_is_shared_with_other_readers(labels, tmp_path):
+    _write(labels, "a", "0 0.5 0.5 0.2 0.2\n")
+    writer = _store(labels, tmp_path)
+    writer.refresh()
+
+    reader = _store(labels, tmp_path)
+    reader.load()
+    assert reader.stems == ["a"] and reader.rows_for("a") == writer.rows_for("a")
+    assert reader.refresh() == 0  # the stamps in the manifest are current
+
+    _write(labels, "b", "1 0.5 0.5 0.2 0.2\n")
+    writer.refresh()
+    held = reader.class_id  # a reader keeps its arrays until it reloads
+    reader.load()
+    assert len(held) == 1 and reader.class_histogram() == {0: 1, 1: 1}
@@ -0,0 +1,135 @@
+import functools
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from utils import merge_engine
+from utils.merge_engine import MergeEngine
+from utils.staged_stats import StagedStats
+
+
+def _bump_mtime(folder):
+    """Make a folder change visible to the journal even within one filesystem timestamp tick."""
+    st = folder.stat()
+    os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def layout(tmp_path, ml_data, monkeypatch):
+    monkeypatch.setattr(merge_engine, "StagedStats",
+                        functools.partial(StagedStats, path=ml_data / "staged_stats.json"))
+    dirs = {
+        "merged": tmp_path / "yolo_merged",
+        "orig_images": tmp_path / "yolo_dataset" / "images" / "train",
+        "orig_labels": tmp_path / "yolo_dataset" / "labels" / "train",
+        "queue": tmp_path / "test_images",
+        "active": tmp_path / "active_labels",
+        "wrong": tmp_path / "wrong_labels",
+    }
+    for key, path in dirs.items():
+        if key != "merged":
+            path.mkdir(parents=True)
+    dirs["journal"] = ml_data / "merge_journal.json"
+    return dirs
+
+
+def _engine(d):
+    return MergeEngine(d["merged"], d["orig_images"], d["orig_labels"], d["queue"], d["active"], d["wrong"],
+                       workers=4, journal_path=d["journal"])
+
+
+def _staged(d, kind):
+    folder = d["merged"] / kind / "train"
+    return sorted(p.name for p in folder.iterdir() if not p.name.startswith(".") and p.is_file())
+
+
+def test_first_merge_stages_originals_reviews_and_negatives(layout):
+    d = layout
+    (d["orig_images"] / "o1.jpg").write_bytes(b"o1")
+    (d["orig_labels"] / "o1.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    (d["queue"] / "r1.jpg").write_bytes(b"r1")
+    (d["active"] / "r1.txt").write_text("1 0.4 0.4 0.1 0.1\n")
+    (d["queue"] / "n1.jpg").write_bytes(b"n1")
+    (d["wrong"] / "n1.txt").write_text("")
+
+    counts = _engine(d).run()
+
+    assert counts["original"] == 1 and counts["review"] == 1 and counts["negative"] == 1
+    assert _staged(d, "images") == ["n1.jpg", "o1.jpg", "r1.jpg"]
+    assert _staged(d, "labels") == ["n1.txt", "o1.txt", "r1.txt"]
+    assert (d["merged"] / "labels" / "train" / "n1.txt").read_text() == ""
+    # reviewed files left the queue and the review folders
+    assert not any(d["queue"].iterdir()) and not any(d["active"].iterdir()) and not any(d["wrong"].iterdir())
+
+
+def test_journal_skips_unchanged_originals_and_picks_up_new_ones(layout, monkeypatch):
+    d = layout
+    (d["orig_images"] / "o1.jpg").write_bytes(b"o1")
+    (d["orig_labels"] / "o1.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    _engine(d).run()
+
+    listed = []
+    real_list_dir = merge_engine.list_dir
+    monkeypatch.setattr(merge_engine, "list_dir",
+                        lambda folder, exts=None: listed.append(folder) or real_list_dir(folder, exts))
+    assert _engine(d).run()["original"] == 0
+    assert d["orig_images"] not in listed  # the journal proved the import folders unchanged
+
+    (d["orig_images"] / "o2.jpg").write_bytes(b"o2")
+    (d["orig_labels"] / "o2.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    _bump_mtime(d["orig_images"])
+    _bump_mtime(d["orig_labels"])
+    assert _engine(d).run()["original"] == 1
+    assert _staged(d, "images") == ["o1.jpg", "o2.jpg"]
+
+
+def test_flushed_staged_folder_invalidates_the_journal(layout):
+    d = layout
+    (d["orig_images"] / "o1.jpg").write_bytes(b"o1")
+    (d["orig_labels"] / "o1.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    _engine(d).run()
+
+    # a flush / reset empties yolo_merged without touching the import folders
+    staged_images = d["merged"] / "images" / "train"
+    (staged_images / "o1.jpg").unlink()
+    _bump_mtime(staged_images)
+
+    assert _engine(d).run()["original"] == 1
+    assert _staged(d, "images") == ["o1.jpg"]
+
+
+def test_review_waits_for_its_image_and_merges_once_it_arrives(layout):
+    d = layout
+    (d["active"] / "r1.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    first = _engine(d).run()
+    assert first["missing"] == 1 and _staged(d, "images") == []
+
+    (d["queue"] / "r1.jpg").write_bytes(b"r1")
+    second = _engine(d).run()
+    assert second["review"] == 1
+    assert _staged(d, "images") == ["r1.jpg"]
+
+
+def test_orphan_staged_label_is_reunited_with_its_queue_image(layout):
+    d = layout
+    labels = d["merged"] / "labels" / "train"
+    labels.mkdir(parents=True)
+    (labels / "r2.txt").write_text("0 0.5 0.5 0.2 0.2\n")  # e.g. left by an interrupted merge
+    (d["queue"] / "r2.jpg").write_bytes(b"r2")
+
+    assert _engine(d).run()["recovered"] == 1
+    assert _staged(d, "images") == ["r2.jpg"]
+    assert not (d["queue"] / "r2.jpg").exists()
+
+
+def test_merge_drops_corrupt_rows_but_never_rescales(layout):
+    d = layout
+    (d["queue"] / "r1.jpg").write_bytes(b"r1")
+    (d["active"] / "r1.txt").write_text("0 0.5 0.5 0.2 0.2\nbad row\n0 400 300 50 60\n")
+
+    _engine(d).run()
+
+    merged = (d["merged"] / "labels" / "train" / "r1.txt").read_text().splitlines()
+    assert merged == ["0 0.5 0.5 0.2 0.2", "0 400 300 50 60"]
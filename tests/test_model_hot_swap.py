@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from BE.services.ml_service import BackendUnavailable, MLService
+from BE.services.model_pool import ModelHandle, ModelPool
+
+
+class FakeModel:
+    pass
+
+
+def _handle(version, replicas=2, artifact=None):
+    pool = ModelPool(size=replicas)
+    pool.load(FakeModel)
+    return ModelHandle(version, None, artifact, FakeModel(), pool, imgsz=640)
+
+
+@pytest.fixture
+def service():
+    return MLService()
+
+
+def test_in_flight_request_finishes_on_the_old_version(service):
+    old, new = _handle("v1"), _handle("v2")
+    service._install(old)
+
+    with service.acquire_model() as held:
+        service._install(new)
+        assert held is old
+        assert old.model is not None and old.pool.loaded == 2  # not freed under the request
+        with held.pool.checkout(timeout=1) as replica:
+            assert isinstance(replica, FakeModel)
+        with service.acquire_model() as current:
+            assert current is new
+
+    assert old.refs == 0
+    assert old.model is None and old.pool.loaded == 0
+    assert new.refs == 1  # only the service's own reference
+    with pytest.raises(RuntimeError):
+        old.acquire()
+
+
+def test_released_handles_are_freed_exactly_once_under_concurrent_swaps(service):
+    handles = [_handle(f"v{i}") for i in range(30)]
+    service._install(handles[0])
+    errors = []
+    stop = threading.Event()
+
+    def request_loop():
+        while not stop.is_set():
+            try:
+                with service.acquire_model() as handle:
+                    # a handle in use is never torn down
+                    assert handle.model is not None and handle.pool.loaded
+                    with handle.pool.checkout(timeout=1):
+                        pass
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    workers = [threading.Thread(target=request_loop) for _ in range(8)]
+    for t in workers:
+        t.start()
+    for handle in handles[1:]:
+        service._install(handle)
+    stop.set()
+    for t in workers:
+        t.join(5)
+
+    assert errors == []
+    assert all(h.refs == 0 and h.model is None for h in handles[:-1])
+    assert handles[-1].refs == 1 and handles[-1].model is not None
+
+
+def test_retiring_the_model_reports_not_ready(service):
+    service._install(_handle("v1"))
+    assert service.readiness()["modelVersion"] == "v1"
+    service._install(None)
+    assert service.readiness()["ready"] is False
+
+
+def test_reported_backend_is_the_one_that_loaded(service, tmp_path):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"pt")
+    service.backend = "onnx-int8"
+    artifact = service._serving_artifact(weights)  # no export: falls back to the .pt
+    service._install(_handle("v1", artifact=artifact))
+    assert service.serving_backend == "torch"
+
+    (tmp_path / "best.int8.onnx").write_bytes(b"onnx")
+    artifact = service._serving_artifact(weights)
+    service._install(_handle("v2", artifact=artifact))
+    assert service.serving_backend == "onnx-int8"
+    assert MLService.backend_of(tmp_path / "best.onnx") == "onnx"
+
+
+def test_explicit_backend_without_export_fails_and_keeps_the_current_one(service, tmp_path, monkeypatch):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"pt")
+    monkeypatch.setattr(service, "_load_model_locked",
+                        lambda strict=False: service._serving_artifact(weights, strict))
+    service.backend = "torch"
+    with pytest.raises(BackendUnavailable):
+        service.load_model(backend="onnx")
+    assert service.backend == "torch"
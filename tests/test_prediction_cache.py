@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from BE.services import ml_service as ml_service_module
+from BE.services.model_pool import ModelHandle, ModelPool
+from BE.services.prediction_cache import PredictionCache
+
+
+def test_concurrent_misses_compute_once():
+    cache = PredictionCache(max_bytes=1 << 20)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return [{"confidence": 0.9}]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_compute, "k", compute) for _ in range(8)]
+        time.sleep(0.1)  # let every caller reach the in-flight future
+        release.set()
+        results = [f.result(timeout=5) for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == [{"confidence": 0.9}] for r in results)
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["coalesced"] == 7
+
+
+def test_failed_compute_reaches_every_waiter_and_is_not_cached():
+    cache = PredictionCache(max_bytes=1 << 20)
+    release = threading.Event()
+
+    def boom():
+        release.wait(5)
+        raise ValueError("bad image")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(cache.get_or_compute, "k", boom) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+        for f in futures:
+            with pytest.raises(ValueError):
+                f.result(timeout=5)
+
+    assert cache.get_or_compute("k", lambda: ["retried"]) == ["retried"]
+
+
+def test_lru_eviction_by_bytes():
+    cache = PredictionCache(max_bytes=40)
+    for key in ("a", "b", "c"):
+        cache.get_or_compute(key, lambda key=key: [key * 8])  # 12 bytes serialized
+    cache.get_or_compute("a", lambda: pytest.fail("a should still be cached"))
+    cache.get_or_compute("d", lambda: ["d" * 8])  # evicts b, the least recently used
+
+    recomputed = []
+    cache.get_or_compute("b", lambda: recomputed.append(1) or ["b" * 8])
+    assert recomputed == [1]
+    assert cache.stats()["bytes"] <= 40
+
+
+class FakeModel:
+    pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    svc = ml_service_module.MLService()
+    calls = []
+
+    def fake_predict(handle, image, conf, imgsz):
+        calls.append((handle.version, conf))
+        return [{"confidence": c} for c in (0.05, 0.3, 0.8) if c >= conf]
+
+    monkeypatch.setattr(ml_service_module, "decode_image", lambda data: data)
+    monkeypatch.setattr(svc, "_predict_image", fake_predict)
+    svc.calls = calls
+    svc.install = lambda version: svc._install(
+        ModelHandle(version, None, None, FakeModel(), _pool(), imgsz=640)
+    )
+    svc.install("v1")
+    return svc
+
+
+def _pool():
+    pool = ModelPool(size=1)
+    pool.load(FakeModel)
+    return pool
+
+
+def test_different_conf_values_are_answered_from_one_floor_prediction(service):
+    high, version = service.predict_bytes_versioned(b"img", conf=0.5)
+    low, _ = service.predict_bytes_versioned(b"img", conf=0.1)
+
+    assert version == "v1"
+    assert [d["confidence"] for d in high] == [0.8]
+    assert [d["confidence"] for d in low] == [0.3, 0.8]
+    assert service.calls == [("v1", ml_service_module.PREDICT_CACHE_FLOOR_CONF)]
+
+
+def test_model_swap_invalidates_cached_predictions(service):
+    service.predict_bytes_versioned(b"img", conf=0.25)
+    service.install("v2")
+    _, version = service.predict_bytes_versioned(b"img", conf=0.25)
+
+    assert version == "v2"
+    assert [v for v, _ in service.calls] == ["v1", "v2"]
@@ -0,0 +1,70 @@
+import json
+import time
+
+from BE.services.queue_index import ReviewQueueIndex
+
+
+def _stored(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_write_through_changes_are_persisted_without_the_thread(tmp_path):
+    queue = tmp_path / "queue"
+    queue.mkdir()
+    store = tmp_path / "index.json"
+    index = ReviewQueueIndex(queue, store)
+
+    (queue / "a.jpg").write_bytes(b"a")
+    index.add("a.jpg", sha256="aa")
+    assert _stored(store)["a.jpg"][2] == "aa"
+
+    (queue / "a.jpg").unlink()
+    index.remove("a.jpg")
+    assert "a.jpg" not in _stored(store)
+
+    reloaded = ReviewQueueIndex(queue, store)
+    assert len(reloaded) == 0
+
+
+def test_maintenance_thread_debounces_saves_and_rescans(tmp_path):
+    queue = tmp_path / "queue"
+    queue.mkdir()
+    store = tmp_path / "index.json"
+    index = ReviewQueueIndex(queue, store, rescan_s=0.2, save_delay=0.05)
+    index.start()
+
+    for name in ("a.jpg", "b.jpg"):
+        (queue / name).write_bytes(name.encode())
+        index.add(name, sha256=name)
+    assert _wait_for(lambda: store.exists() and set(_stored(store)) == {"a.jpg", "b.jpg"})
+
+    # a file dropped in by another process shows up with the next rescan, no prefetcher involved
+    (queue / "c.png").write_bytes(b"c")
+    assert _wait_for(lambda: "c.png" in _stored(store))
+    assert index.page()["total"] == 3
+
+
+def test_filtered_page_that_ends_the_matches_has_no_next_cursor(tmp_path):
+    queue = tmp_path / "queue"
+    queue.mkdir()
+    for name in ("a.jpg", "b.png", "c.jpg", "d.png"):
+        (queue / name).write_bytes(name.encode())
+    index = ReviewQueueIndex(queue, tmp_path / "index.json")
+
+    first = index.page(limit=1, ext="jpg")
+    assert [i["filename"] for i in first["items"]] == ["a.jpg"] and first["next_cursor"] == "a.jpg"
+
+    last = index.page(cursor=first["next_cursor"], limit=1, ext="jpg")
+    assert [i["filename"] for i in last["items"]] == ["c.jpg"]
+    assert last["next_cursor"] is None  # d.png follows, but does not match
+
+    assert index.page(limit=4)["next_cursor"] is None
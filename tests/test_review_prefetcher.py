@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from BE.services.queue_index import ReviewQueueIndex
+from BE.services.review_prefetcher import ReviewPrefetcher
+
+
+class FakeService:
+    def __init__(self, version):
+        self.model_version = version
+        self.last_foreground = 0.0
+        self.predicted = []
+
+    def add_model_listener(self, listener):
+        pass
+
+    def predict_bytes_versioned(self, data, conf, background=True):
+        self.predicted.append(data)
+        return [{"confidence": 0.5}], self.model_version
+
+
+@pytest.fixture
+def prefetcher(tmp_path):
+    queue = tmp_path / "queue"
+    queue.mkdir()
+    index = ReviewQueueIndex(queue, tmp_path / "index.json")
+    pf = ReviewPrefetcher(FakeService("v2"), index, queue_dir=queue, store_dir=tmp_path / "predictions")
+    pf.store_dir.mkdir()
+    return pf
+
+
+def _sidecar(pf, name, version, stamp=None, conf=0.3):
+    if stamp is None:
+        st = (pf.queue_dir / name).stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+    entry = {"stamp": stamp, "version": version, "detections": [{"confidence": conf}]}
+    (pf.store_dir / f"{name}.json").write_text(json.dumps(entry))
+
+
+def test_seeding_ignores_sidecars_of_other_models_and_replaced_files(prefetcher):
+    pf = prefetcher
+    for name in ("current.jpg", "old_model.jpg", "replaced.jpg"):
+        (pf.queue_dir / name).write_bytes(name.encode())
+    _sidecar(pf, "current.jpg", "v2")
+    _sidecar(pf, "old_model.jpg", "v1")
+    _sidecar(pf, "replaced.jpg", "v2", stamp=[1, 1])
+
+    pf._load_ranking(pf.index.snapshot(), "v2")
+    assert [item["filename"] for item in pf.ranking.top(10)] == ["current.jpg"]
+
+    pf._pass()  # re-scores the stale ones with the active model
+    assert sorted(pf.service.predicted) == [b"old_model.jpg", b"replaced.jpg"]
+    assert len(pf.ranking) == 3
+
+
+def test_model_swap_reseeds_the_ranking(prefetcher):
+    pf = prefetcher
+    (pf.queue_dir / "a.jpg").write_bytes(b"a")
+    _sidecar(pf, "a.jpg", "v2")
+    pf._pass()
+    assert "a.jpg" in pf.ranking and pf.service.predicted == []
+
+    old_score = pf.ranking.score_of("a.jpg")
+
+    pf.service.model_version = "v3"
+    pf._pass()
+    assert pf.service.predicted == [b"a"]
+    assert pf.ranking.score_of("a.jpg") != old_score  # scored by v3, not the stale v2 sidecar
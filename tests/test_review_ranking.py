@@ -0,0 +1,52 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from BE.services.review_ranking import ReviewRanking, uncertainty_scores
+
+FLOOR_NOISE = [0.011, 0.012, 0.015]  # what every cached prediction carries down to the cache floor
+
+
+def _dets(*confs):
+    return [{"confidence": c} for c in confs]
+
+
+PROFILES = {
+    "confident.jpg": _dets(0.97, 0.95, *FLOOR_NOISE),
+    "borderline.jpg": _dets(0.45, 0.9, *FLOOR_NOISE),
+    "mostly_sure.jpg": _dets(0.8, *FLOOR_NOISE),
+}
+
+
+@pytest.mark.parametrize("method", ["least_confidence", "entropy"])
+def test_floor_detections_do_not_saturate_the_ranking(method):
+    ranking = ReviewRanking(method, min_conf=0.25)
+    ranking.rebuild(PROFILES)
+    order = [item["filename"] for item in ranking.top(3)]
+    assert order == ["borderline.jpg", "mostly_sure.jpg", "confident.jpg"]
+    scores = [item["score"] for item in ranking.top(3)]
+    assert len(set(scores)) == 3
+
+
+def test_without_the_cut_floor_noise_dominates():
+    ranking = ReviewRanking("least_confidence", min_conf=0.0)
+    ranking.rebuild(PROFILES)
+    assert {item["score"] for item in ranking.top(3)} == {0.989}
+
+
+def test_update_matches_rebuild():
+    rebuilt = ReviewRanking("entropy", min_conf=0.25)
+    rebuilt.rebuild(PROFILES)
+    updated = ReviewRanking("entropy", min_conf=0.25)
+    for name, dets in PROFILES.items():
+        updated.update(name, dets)
+    assert updated.top(3) == rebuilt.top(3)
+
+    updated.remove("borderline.jpg")
+    assert [item["filename"] for item in updated.top(3)] == ["mostly_sure.jpg", "confident.jpg"]
+
+
+def test_images_without_detections_above_the_cut_score_zero():
+    scores = uncertainty_scores(np.array([0.02, 0.6]), np.array([0, 1]), 2, min_conf=0.25)
+    assert scores[0].tolist() == [0.0, 0.0, 0.0]
+    assert scores[1, 0] == pytest.approx(0.4)
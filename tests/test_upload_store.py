@@ -0,0 +1,19 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+
+from BE.services.upload_store import save_uploads
+
+
+def _upload(name, data):
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def test_duplicate_names_in_one_batch_are_rejected(tmp_path):
+    files = [_upload("leaf.jpg", b"first"), _upload("other.jpg", b"x"), _upload("leaf.jpg", b"second")]
+    results = asyncio.run(save_uploads(files, tmp_path / "queue", dedupe=False))
+
+    assert [r["status"] for r in results] == ["ok", "ok", "error"]
+    assert "duplicate" in results[2]["error"]
+    assert (tmp_path / "queue" / "leaf.jpg").read_bytes() == b"first"